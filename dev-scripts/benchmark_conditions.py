@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+
+Compares the time that it takes to compile conditional statements without
+and with the condition cache. The statements are those from
+opensesame_unittest/syntax.py, plus a long statement with many symbols.
+
+Usage: python dev-scripts/benchmark_conditions.py [repetitions]
+"""
+
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libopensesame.py3compat import *
+from libopensesame.syntax import syntax
+
+CONDITIONS = [
+	u'[width] > 100',
+	u'always',
+	u'NEVER',
+	u'[width] = 1024',
+	u'[width] = 1024 and [height] == 768',
+	u'=var.width > 100',
+	u'"yes" = yes',
+	u'yes = \'yes\'',
+	u'"y\'es" = \'y"es\'',
+	u'("a b c" = abc) or (x != 10) and ([width] == 100)',
+	u' or '.join([u'[cond] = cond%d' % i for i in range(50)]),
+	]
+
+def bench(fnc, repeat, number):
+
+	return min(timeit.repeat(fnc, number=number, repeat=repeat)) \
+		* 1000000 / number
+
+def main(repeat=5, number=1000):
+
+	s = syntax(None)
+	print(u'%-40s %14s %14s %8s' % (u'condition', u'uncached (us)',
+		u'cached (us)', u'speedup'))
+	for cnd in CONDITIONS:
+		t_slow = bench(lambda: s._compile_cond(cnd), repeat, number)
+		t_fast = bench(lambda: s.compile_cond(cnd), repeat, number)
+		label = cnd if len(cnd) <= 40 else cnd[:37] + u'...'
+		print(u'%-40s %14.2f %14.2f %7.1fx' % (label, t_slow, t_fast,
+			t_slow / t_fast))
+
+if __name__ == u'__main__':
+	main(*[int(arg) for arg in sys.argv[1:2]])
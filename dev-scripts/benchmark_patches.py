@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+
+Compares the time that it takes to generate Gabor and noise patches with the
+NumPy engine and with the pixel-by-pixel fallback. The generators are called
+directly, so that the canvas cache does not affect the results.
+
+Usage: python dev-scripts/benchmark_patches.py [repetitions]
+"""
+
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libopensesame.py3compat import *
+from openexp._canvas import canvas
+
+SIZES = [32, 64, 128, 256]
+ENVS = [u'g', u'l', u'c', u'r']
+
+def bench(fnc, repeat):
+
+	return min(timeit.repeat(fnc, number=1, repeat=repeat)) * 1000
+
+def main(repeat=3):
+
+	if canvas.numpy is None:
+		print(u'NumPy is not available, only the fallback can be used')
+		return
+	print(u'%-8s %-4s %-5s %12s %12s %8s' % (u'patch', u'env', u'size',
+		u'pixel (ms)', u'numpy (ms)', u'speedup'))
+	for size in SIZES:
+		for env in ENVS:
+			gabor_args = 45, .05, env, size, 12, 0, u'white', u'black', u'avg'
+			noise_args = env, size, 12, u'white', u'black', u'avg'
+			for name, slow, fast, args in [
+				(u'gabor', canvas._gabor_pixelwise, canvas._gabor_numpy,
+					gabor_args),
+				(u'noise', canvas._noise_patch_pixelwise,
+					canvas._noise_patch_numpy, noise_args)
+				]:
+				t_slow = bench(lambda: slow(*args), repeat)
+				t_fast = bench(lambda: fast(*args), repeat)
+				print(u'%-8s %-4s %-5d %12.2f %12.2f %7.1fx' % (name, env, size,
+					t_slow, t_fast, t_slow / t_fast))
+
+if __name__ == u'__main__':
+	main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+
+Compares the timestamp accuracy and CPU usage of polling for responses
+(as get_key() and get_button_press() used to do) and of waiting for
+responses.
+
+- keyboard: key presses are posted to the PyGame event queue by a separate
+  thread, and collected with a polling loop or with wait_event() from
+  openexp._keyboard.legacy.
+- serial: bytes are written to a pipe, which stands in for a serial port,
+  and collected with a polling loop or with a response_buffer.
+
+The latency is the difference between the time at which a response was
+generated and the timestamp that was returned. The CPU usage is the CPU time
+of the process divided by the duration of the response windows.
+
+Usage: python dev-scripts/benchmark_response.py [trials]
+"""
+
+import os
+import random
+import select
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(u'SDL_VIDEODRIVER', u'dummy')
+from libopensesame.py3compat import *
+from libopensesame.response_buffer import response_buffer
+from openexp._keyboard.legacy import wait_event
+import pygame
+
+try:
+	cpu_time = time.process_time
+except AttributeError:
+	cpu_time = time.clock
+
+class ms_clock(object):
+
+	def time(self):
+
+		return 1000. * time.time()
+
+clock = ms_clock()
+
+def respond(fnc):
+
+	"""
+	Calls fnc after a random delay, and returns a list that will contain the
+	time at which fnc was called.
+	"""
+
+	t = []
+	def _respond():
+		time.sleep(random.uniform(.1, .3))
+		t.append(clock.time())
+		fnc()
+	threading.Thread(target=_respond).start()
+	return t
+
+def poll_key():
+
+	while True:
+		for event in pygame.event.get():
+			if event.type == pygame.KEYDOWN:
+				return clock.time()
+
+def wait_key():
+
+	while True:
+		event = wait_event(1000)
+		if event.type == pygame.KEYDOWN:
+			return clock.time()
+
+def post_key():
+
+	pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a,
+		unicode=u'a', mod=0))
+
+def serial_read(fd, timeout):
+
+	if not select.select([fd], [], [], timeout)[0]:
+		return None
+	return os.read(fd, 1)
+
+def bench(name, collect, generate, trials):
+
+	latencies = []
+	wall = 0
+	cpu = 0
+	for i in range(trials):
+		t0 = clock.time()
+		c0 = cpu_time()
+		t_response = respond(generate)
+		t1 = collect()
+		cpu += cpu_time() - c0
+		wall += (clock.time() - t0) / 1000
+		latencies.append(t1 - t_response[0])
+	print(u'%-20s %10.3f %10.3f %10.1f' % (name,
+		sum(latencies) / len(latencies), max(latencies), 100 * cpu / wall))
+
+def main(trials=20):
+
+	pygame.init()
+	pygame.display.set_mode((100, 100))
+	print(u'%-20s %10s %10s %10s' % (u'method', u'mean (ms)', u'max (ms)',
+		u'CPU (%)'))
+	pygame.event.clear()
+	bench(u'keyboard, polling', poll_key, post_key, trials)
+	pygame.event.clear()
+	bench(u'keyboard, waiting', wait_key, post_key, trials)
+	r, w = os.pipe()
+	write = lambda: os.write(w, b'\x01')
+	def poll_serial():
+		while True:
+			if serial_read(r, 0) is not None:
+				return clock.time()
+	bench(u'serial, polling', poll_serial, write, trials)
+	buf = response_buffer(lambda: serial_read(r, .05), clock)
+	buf.start()
+	bench(u'serial, buffer', lambda: buf.get()[1], write, trials)
+	buf.stop()
+
+if __name__ == u'__main__':
+	main(*[int(arg) for arg in sys.argv[1:2]])
@@ -23,6 +23,7 @@ import os
 import time
 from PyQt4 import QtGui, QtCore
 from libopensesame import debug, misc
+from libopensesame.autosave_store import autosave_store
 from libqtopensesame.misc import _
 from libqtopensesame.extensions import base_extension
 from libqtopensesame.misc.config import cfg
@@ -30,17 +31,33 @@ from libqtopensesame.misc.config import cfg
 class automatic_backup(base_extension):
 
 	"""
-	desc:
+	desc: |
 		An extension that periodically saves the experiment.
+
+		Backups are saved as snapshots in an `autosave_store`, in the `store`
+		subfolder of the backup folder, so that files from the file pool are
+		not copied again on every autosave. When the backup folder is opened,
+		all snapshots are written to the backup folder as regular .osexp
+		files, so that the user can pick one.
 	"""
 
 	def activate(self):
 
 		"""
 		desc:
-			Opens the autosave folder.
+			Writes the backups that have not been written yet as .osexp
+			files, and opens the autosave folder.
 		"""
 
+		for name in self.store.snapshots():
+			path = os.path.join(self.autosave_folder, u'%s.osexp' % name)
+			if os.path.exists(path):
+				continue
+			try:
+				self.store.materialize(name, path)
+			except Exception as e:
+				debug.msg(u'failed to write %s: %s' % (path, e),
+					reason=u'warning')
 		if os.name == u"nt":
 			os.startfile(self.autosave_folder)
 		elif os.name == u"posix":
@@ -61,9 +78,15 @@ class automatic_backup(base_extension):
 		self.autosave_folder = os.path.join(self.main_window.home_folder,
 			u".opensesame", u"backup")
 
+		self.store = autosave_store(os.path.join(self.autosave_folder,
+			u'store'))
+
 		# Remove expired backups
+		self.store.remove_expired(cfg.autosave_max_age)
 		for path in os.listdir(self.autosave_folder):
 			_path = os.path.join(self.autosave_folder, path)
+			if os.path.isdir(_path):
+				continue
 			t = os.path.getctime(_path)
 			age = (time.time() - t)/(60*60*24)
 			if age > cfg.autosave_max_age:
@@ -123,13 +146,18 @@ class automatic_backup(base_extension):
 		"""
 
 		if self.main_window.unsaved_changes:
-			path = os.path.join(self.autosave_folder,
-				u'%s.osexp' % str(time.ctime()).replace(u':',
-				u'_'))
+			# The names are sortable, so that the most recent snapshot is
+			# last. The microseconds and the process id make sure that
+			# backups from multiple instances of OpenSesame do not overwrite
+			# each other.
+			t = time.time()
+			name = u'%s.%06d %d' % (
+				time.strftime(u'%Y-%m-%d %H_%M_%S', time.localtime(t)),
+				int(t % 1 * 1000000), os.getpid())
 			try:
 				self.main_window.get_ready()
-				self.experiment.save(path, overwrite=True, update_path=False)
-				debug.msg(u"saving backup as %s" % path)
+				self.store.save(self.experiment, name)
+				debug.msg(u"saving backup as %s" % name)
 			except:
 				pass
 		self.start_autosave_timer()
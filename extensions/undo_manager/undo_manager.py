@@ -20,6 +20,7 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 from libopensesame.py3compat import *
 from libqtopensesame.extensions import base_extension, suspend_events
 from libqtopensesame.misc import _
+from libqtopensesame.misc.config import cfg
 from PyQt4.QtGui import QMenu, QToolBar
 from undo_stack import undo_stack
 import difflib
@@ -163,7 +164,7 @@ class undo_manager(base_extension):
 		key1, state1 = self.stack.peek(-1)
 		key2, state2 = self.stack.peek(-2)
 		if key1 == key2 == u'__experiment__' and state1 == state2:
-			self.stack.history = self.stack.history[:-2]
+			self.stack.discard(2)
 			return True
 		return False
 
@@ -235,7 +236,12 @@ class undo_manager(base_extension):
 		self.console.write(u'\x1b[0m')
 		self.console.write(u'\nFull stack:\n\n')
 		for i, (item, script) in enumerate(self.stack.history[::-1]):
-			self.console.write(u'%d - %s\n' % (i, item))
+			self.console.write(u'%d - %s (%.1f kB)\n' % (i, item,
+				len(script)/1024.))
+		self.console.write(
+			u'\nMemory: %.1f of %d MB (%.1f MB uncompressed)\n' % (
+			self.stack.size()/1048576., cfg.max_undo_memory,
+			self.stack.uncompressed_size()/1048576.))
 
 	# All these events simply undo by restoring the complete experiment state.
 	# This is crude, but works for now.
@@ -20,9 +20,22 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 from libopensesame.py3compat import *
 from libqtopensesame.misc.config import cfg
 import time
+import zlib
 
 class undo_stack(object):
 
+	"""
+	desc: |
+		A stack of (key, state) tuples, where the key is an item name or
+		'__experiment__', and the state is a script.
+
+		States in `history` and `future` are stored zlib-compressed, and are
+		decompressed by `peek()`, `undo()`, and `redo()`. Instead of a
+		maximum number of states, there is a maximum memory footprint, which
+		is set in megabytes with `cfg.max_undo_memory`. When the footprint of
+		the history exceeds this, the oldest states are discarded.
+	"""
+
 	def __init__(self):
 
 		self.current = {}
@@ -37,7 +50,8 @@ class undo_stack(object):
 
 		self.future = []
 		if key == u'__experiment__':
-			self.history.append( (u'__experiment__', state) )
+			self.history.append( (u'__experiment__', self.compress(state)) )
+			self.trim()
 			return
 		timestamp = time.time()
 		if key in self.current:
@@ -47,10 +61,96 @@ class undo_stack(object):
 			if _timestamp >= timestamp-1:
 				self.current[key] = state, timestamp
 				return
-			self.history.append( (key, self.current[key][0]) )
+			self.history.append( (key, self.compress(self.current[key][0])) )
 		self.current[key] = state, timestamp
-		if len(self.history) > cfg.max_undo_history:
-			self.history = self.history[-cfg.max_undo_history:]
+		self.trim()
+
+	def trim(self):
+
+		"""
+		desc:
+			Discards the oldest states until the history fits in the memory
+			budget. The most recent state, or before-after pair of
+			experiment states, is always kept.
+		"""
+
+		budget = cfg.max_undo_memory * 1024 * 1024
+		size = self.size()
+		while self.history and size > budget:
+			# Experiment states come in before-after pairs, which are
+			# discarded together.
+			n = 2 if self.history[0][0] == u'__experiment__' else 1
+			if len(self.history) <= n:
+				break
+			size -= sum(len(state) for key, state in self.history[:n])
+			self.history = self.history[n:]
+
+	def discard(self, n=1):
+
+		"""
+		desc:
+			Discards the most recent states.
+
+		keywords:
+			n:
+				desc:	The number of states to discard.
+				type:	int
+		"""
+
+		self.history = self.history[:-n]
+
+	def size(self):
+
+		"""
+		returns:
+			desc:	The size of the compressed states in the history and the
+					future in bytes.
+			type:	int
+		"""
+
+		return sum(len(state) for key, state in self.history + self.future)
+
+	def uncompressed_size(self):
+
+		"""
+		returns:
+			desc:	The size of the states in the history and the future in
+					bytes, when they are not compressed.
+			type:	int
+		"""
+
+		return sum(len(self.decompress(state)) \
+			for key, state in self.history + self.future)
+
+	def compress(self, state):
+
+		"""
+		arguments:
+			state:
+				desc:	A state.
+				type:	unicode
+
+		returns:
+			desc:	A compressed state.
+			type:	bytes
+		"""
+
+		return zlib.compress(safe_encode(state, enc=u'utf-8'))
+
+	def decompress(self, state):
+
+		"""
+		arguments:
+			state:
+				desc:	A compressed state.
+				type:	bytes
+
+		returns:
+			desc:	A state.
+			type:	unicode
+		"""
+
+		return safe_decode(zlib.decompress(state), enc=u'utf-8')
 
 	def can_undo(self):
 
@@ -74,8 +174,9 @@ class undo_stack(object):
 			_key, _state = l1.pop()
 			if _key != u'__experiment__':
 				return None, None
-			return _key, _state
-		l2.append( (key, self.current[key][0]) )
+			return _key, self.decompress(_state)
+		state = self.decompress(state)
+		l2.append( (key, self.compress(self.current[key][0])) )
 		self.current[key] = state, time.time()
 		return key, state
 
@@ -91,4 +192,5 @@ class undo_stack(object):
 
 		if len(self.history) == 0:
 			return None, None
-		return self.history[i]
+		key, state = self.history[i]
+		return key, self.decompress(state)
@@ -0,0 +1,386 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+
+This module can also be used to turn a snapshot into an .osexp file:
+
+	python -m libopensesame.autosave_store [store folder] [snapshot] [.osexp]
+"""
+
+from libopensesame.py3compat import *
+from libopensesame import debug, osexp
+from libopensesame.exceptions import osexception
+import hashlib
+import io
+import json
+import os
+import time
+
+class autosave_store(object):
+
+	"""
+	desc: |
+		Stores snapshots of an experiment such that files from the file pool
+		are only written once.
+
+		Each pool file is stored as a blob, named after the SHA-1 hash of its
+		contents, in the `blobs` subfolder. Each snapshot is a JSON manifest
+		in the `snapshots` subfolder, which contains the script and the hash,
+		size, and modification time of each pool file. A pool file is only
+		hashed again when its size or modification time differs from the
+		previous snapshot, and only copied when there is no blob with the
+		same hash. Therefore, saving a snapshot takes time in proportion to
+		what changed, rather than to the size of the file pool.
+
+		A snapshot can be turned into a regular .osexp file with
+		`materialize()`.
+	"""
+
+	def __init__(self, folder):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			folder:
+				desc:	The folder of the store, which is created if it doesn't
+						exist.
+				type:	unicode
+		"""
+
+		self.folder = folder
+		self.blob_folder = os.path.join(folder, u'blobs')
+		self.snapshot_folder = os.path.join(folder, u'snapshots')
+		for _folder in (self.blob_folder, self.snapshot_folder):
+			if not os.path.exists(_folder):
+				os.makedirs(_folder)
+		self._files = None
+
+	def snapshots(self):
+
+		"""
+		returns:
+			desc:	A list of snapshot names, from old to new.
+			type:	list
+		"""
+
+		return sorted(os.path.splitext(fname)[0] \
+			for fname in os.listdir(self.snapshot_folder) \
+			if fname.endswith(u'.json'))
+
+	def save(self, experiment, name=None):
+
+		"""
+		desc:
+			Saves a snapshot of an experiment.
+
+		arguments:
+			experiment:
+				desc:	The experiment.
+				type:	experiment
+
+		keywords:
+			name:
+				desc:	The name of the snapshot, or `None` to use the current
+						time.
+				type:	[unicode, NoneType]
+
+		returns:
+			desc:	The name of the snapshot.
+			type:	unicode
+		"""
+
+		if name is None:
+			name = u'%.6f' % time.time()
+		if self._files is None:
+			self._files = self._last_files()
+		pool_folder = experiment.pool.folder()
+		files = {}
+		for fname in os.listdir(pool_folder):
+			path = os.path.join(pool_folder, fname)
+			if not os.path.isfile(path):
+				continue
+			st = os.stat(path)
+			old = self._files.get(fname, None)
+			if old is not None and old[u'size'] == st.st_size and \
+				old[u'mtime'] == st.st_mtime and \
+				os.path.exists(self.blob_path(old[u'hash'])):
+				files[fname] = old
+				continue
+			files[fname] = {
+				u'hash' : self._add_blob(path),
+				u'size' : st.st_size,
+				u'mtime' : st.st_mtime
+				}
+		self._files = files
+		manifest = {
+			u'script' : experiment.to_string(),
+			u'files' : files,
+			u'time' : time.time()
+			}
+		self._write(os.path.join(self.snapshot_folder, u'%s.json' % name),
+			safe_encode(json.dumps(manifest), enc=u'utf-8'))
+		return name
+
+	def manifest(self, name):
+
+		"""
+		arguments:
+			name:
+				desc:	The name of a snapshot.
+				type:	unicode
+
+		returns:
+			desc:	The manifest of the snapshot.
+			type:	dict
+		"""
+
+		path = os.path.join(self.snapshot_folder, u'%s.json' % name)
+		if not os.path.exists(path):
+			raise osexception(u'Snapshot %s does not exist' % name)
+		with io.open(path, encoding=u'utf-8') as fd:
+			return json.load(fd)
+
+	def materialize(self, name, path):
+
+		"""
+		desc:
+			Writes a snapshot as a regular .osexp file, which can be opened
+			like any other experiment.
+
+		arguments:
+			name:
+				desc:	The name of a snapshot.
+				type:	unicode
+			path:
+				desc:	The path of the .osexp file.
+				type:	unicode
+
+		returns:
+			desc:	The path of the .osexp file.
+			type:	unicode
+		"""
+
+		manifest = self.manifest(name)
+		# Without pool files, the experiment is saved as plain text, just like
+		# experiment.save() does.
+		if not manifest[u'files']:
+			self._write(path, safe_encode(manifest[u'script'], enc=u'utf-8'))
+			return path
+		files = [(fname, self.blob_path(entry[u'hash'])) \
+			for fname, entry in sorted(manifest[u'files'].items())]
+		osexp.write(path, manifest[u'script'], files,
+			level=osexp.compresslevel(files))
+		return path
+
+	def remove(self, name):
+
+		"""
+		desc:
+			Removes a snapshot. Blobs are removed by `collect_garbage()`.
+
+		arguments:
+			name:
+				desc:	The name of a snapshot.
+				type:	unicode
+		"""
+
+		os.remove(os.path.join(self.snapshot_folder, u'%s.json' % name))
+
+	def remove_expired(self, max_age):
+
+		"""
+		desc:
+			Removes snapshots that are older than a maximum age, and the
+			blobs that are no longer used.
+
+		arguments:
+			max_age:
+				desc:	The maximum age in days.
+				type:	[int, float]
+		"""
+
+		for name in self.snapshots():
+			path = os.path.join(self.snapshot_folder, u'%s.json' % name)
+			age = (time.time() - os.path.getmtime(path))/(60*60*24)
+			if age > max_age:
+				debug.msg(u'removing snapshot %s' % name)
+				self.remove(name)
+		self.collect_garbage()
+
+	def collect_garbage(self, grace_period=3600):
+
+		"""
+		desc:
+			Removes all blobs that are not used by any snapshot. The store may
+			be shared with other processes, which add blobs before they write
+			the snapshot that uses them. Therefore, temporary files and recent
+			blobs are never removed.
+
+		keywords:
+			grace_period:
+				desc:	The minimum age of a blob that is removed, in seconds.
+				type:	[int, float]
+		"""
+
+		used = set()
+		for name in self.snapshots():
+			try:
+				manifest = self.manifest(name)
+			except Exception as e:
+				# A corrupt manifest may refer to any blob, so don't remove
+				# anything.
+				debug.msg(u'failed to read snapshot %s: %s' % (name, e),
+					reason=u'warning')
+				return
+			used |= set(entry[u'hash'] \
+				for entry in manifest[u'files'].values())
+		now = time.time()
+		for prefix in os.listdir(self.blob_folder):
+			folder = os.path.join(self.blob_folder, prefix)
+			if not os.path.isdir(folder):
+				continue
+			for blob in os.listdir(folder):
+				if blob in used or blob.endswith(u'.tmp'):
+					continue
+				path = os.path.join(folder, blob)
+				try:
+					if now - os.path.getmtime(path) < grace_period:
+						continue
+					os.remove(path)
+				except OSError:
+					# The blob may have been removed by another process
+					pass
+		self._files = None
+
+	def blob_path(self, _hash):
+
+		"""
+		arguments:
+			_hash:
+				desc:	The SHA-1 hash of a blob.
+				type:	unicode
+
+		returns:
+			desc:	The path to the blob.
+			type:	unicode
+		"""
+
+		return os.path.join(self.blob_folder, _hash[:2], _hash)
+
+	def _last_files(self):
+
+		"""
+		visible: False
+
+		returns:
+			desc:	The pool files of the most recent readable snapshot, or an
+					empty dict if there are no snapshots.
+			type:	dict
+		"""
+
+		for name in reversed(self.snapshots()):
+			try:
+				return self.manifest(name)[u'files']
+			except Exception as e:
+				debug.msg(u'failed to read snapshot %s: %s' % (name, e),
+					reason=u'warning')
+		return {}
+
+	def _add_blob(self, path):
+
+		"""
+		visible: False
+
+		desc:
+			Adds a file as a blob, unless a blob with the same contents already
+			exists. The file is hashed while it is copied, so that the hash
+			always matches the contents of the blob, even if the file changes
+			in the meantime.
+
+		arguments:
+			path:
+				desc:	The path to a file.
+				type:	unicode
+
+		returns:
+			desc:	The SHA-1 hash of the file.
+			type:	unicode
+		"""
+
+		# Copy to a temporary file first, so that there are never incomplete
+		# blobs. The name of the blob is only known after copying.
+		h = hashlib.sha1()
+		tmp_path = os.path.join(self.blob_folder, u'%d.tmp' % os.getpid())
+		with open(path, u'rb') as src, open(tmp_path, u'wb') as dst:
+			while True:
+				chunk = src.read(1048576)
+				if not chunk:
+					break
+				h.update(chunk)
+				dst.write(chunk)
+		_hash = h.hexdigest()
+		blob_path = self.blob_path(_hash)
+		if os.path.exists(blob_path):
+			os.remove(tmp_path)
+			return _hash
+		if not os.path.exists(os.path.dirname(blob_path)):
+			os.makedirs(os.path.dirname(blob_path))
+		try:
+			os.rename(tmp_path, blob_path)
+		except OSError:
+			# Another process may have added the same blob in the meantime
+			if not os.path.exists(blob_path):
+				raise
+			os.remove(tmp_path)
+		return _hash
+
+	def _write(self, path, data):
+
+		"""
+		visible: False
+
+		desc:
+			Writes data to a temporary file, and then renames it, so that the
+			file is never incomplete.
+
+		arguments:
+			path:
+				desc:	The path to write to.
+				type:	unicode
+			data:
+				desc:	The data.
+				type:	bytes
+		"""
+
+		tmp_path = u'%s.%d.tmp' % (path, os.getpid())
+		with open(tmp_path, u'wb') as fd:
+			fd.write(data)
+		if os.path.exists(path):
+			os.remove(path)
+		os.rename(tmp_path, path)
+
+if __name__ == u'__main__':
+
+	import sys
+	if len(sys.argv) != 4:
+		print(u'Usage: python -m libopensesame.autosave_store [store folder] [snapshot] [.osexp]')
+		sys.exit(1)
+	store = autosave_store(safe_decode(sys.argv[1]))
+	print(store.materialize(safe_decode(sys.argv[2]),
+		safe_decode(sys.argv[3])))
@@ -0,0 +1,292 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame.exceptions import osexception
+from libopensesame.loop_matrix import auto_type, is_expression
+import array
+import csv
+import os
+
+# Files with these extensions are tab separated, and all other files are comma
+# separated.
+TSV_EXTENSIONS = [u'.tsv', u'.tab']
+BOM = b'\xef\xbb\xbf'
+
+class design_file(object):
+
+	"""
+	desc: |
+		A cycle table that is read from a UTF-8 encoded CSV or TSV file, which
+		has the variable names on the first row and one row per cycle.
+
+		The file is not loaded into memory. Instead, the file is scanned once,
+		and only the offset of each row is kept. Rows are read from the file
+		when they are needed. A design file can be used in place of a
+		`loop_matrix` to run a loop.
+	"""
+
+	def __init__(self, path):
+
+		"""
+		desc:
+			Constructor. Only the first row is read here; the rest of the file
+			is scanned when the number of rows or a row is first needed.
+
+		arguments:
+			path:
+				desc:	The path to the file.
+				type:	unicode
+		"""
+
+		if not os.path.exists(path):
+			raise osexception(u'Design file %s does not exist' % path)
+		self.path = path
+		self.delimiter = u'\t' if os.path.splitext(path)[1].lower() \
+			in TSV_EXTENSIONS else u','
+		self._fd = open(path, u'rb')
+		self._code = {}
+		self._offsets = None
+		self._pos = 0
+		try:
+			header = self._read_record(0)
+		except csv.Error as e:
+			raise osexception(
+				u'Failed to read the first row of design file %s: %s' \
+				% (path, e))
+		self.columns = [column.strip() for column in header]
+		self._data_offset = self._pos
+
+	def __len__(self):
+
+		"""
+		visible: False
+
+		returns:
+			desc:	The number of rows, i.e. cycles.
+			type:	int
+		"""
+
+		self._index()
+		return len(self._offsets)
+
+	def close(self):
+
+		"""
+		desc:
+			Closes the file.
+		"""
+
+		self._fd.close()
+
+	def row(self, row):
+
+		"""
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number.
+				type:	int
+
+		returns:
+			desc:	A dict with the defined cells of the row.
+			type:	dict
+		"""
+
+		return dict((column, val) for column, val, expression \
+			in self.cells(row))
+
+	def cells(self, row):
+
+		"""
+		desc:
+			Iterates through the defined cells of a row. Cells that are
+			missing because a row is shorter than the first row are undefined.
+
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number.
+				type:	int
+
+		returns:
+			desc:	A generator of (column, value, expression) tuples, where
+					expression indicates whether the value is a Python
+					expression.
+			type:	generator
+		"""
+
+		self._index()
+		if row >= len(self._offsets):
+			return
+		try:
+			cells = self._read_record(self._offsets[row])
+		except csv.Error as e:
+			raise self._error(row, e)
+		for column, val in zip(self.columns, cells):
+			val = auto_type(val)
+			yield column, val, is_expression(val)
+
+	def compiled(self, expression):
+
+		"""
+		desc:
+			Compiles a Python expression from a cell. Each expression is only
+			compiled once.
+
+		arguments:
+			expression:
+				desc:	The value of a cell, including the leading '='.
+				type:	[str, unicode]
+
+		returns:
+			desc:	A code object.
+			type:	code
+		"""
+
+		code = self._code.get(expression, None)
+		if code is None:
+			code = compile(expression[1:], u'<loop>', u'eval')
+			self._code[expression] = code
+		return code
+
+	def _index(self):
+
+		"""
+		visible: False
+
+		desc:
+			Scans the file once, and stores the offset of each row. Empty
+			lines are skipped. Rows are split by the csv module, so that
+			quoted cells may span multiple lines.
+		"""
+
+		if self._offsets is not None:
+			return
+		self._offsets = array.array(u'q' if py3 else b'l')
+		offset = self._data_offset
+		reader = self._reader(offset)
+		while True:
+			try:
+				row = next(reader)
+			except StopIteration:
+				break
+			except csv.Error as e:
+				row = len(self._offsets)
+				self._offsets = None
+				raise self._error(row, e)
+			if len(row) > 1 or (row and row[0].strip()):
+				self._offsets.append(offset)
+			# The reader doesn't read ahead, so the next row starts where the
+			# lines of this row end.
+			offset = self._pos
+
+	def _lines(self, offset):
+
+		"""
+		visible: False
+
+		desc:
+			Iterates through the lines of the file, and keeps track of the
+			position after the last line in `_pos`. A BOM at the start of the
+			file is skipped.
+
+		arguments:
+			offset:
+				desc:	The position from which to read.
+				type:	int
+
+		returns:
+			desc:	A generator of lines, which are unicode in Python 3 and
+					bytes in Python 2, because of the csv module.
+			type:	generator
+		"""
+
+		self._fd.seek(offset)
+		self._pos = offset
+		for line in self._fd:
+			if self._pos == 0 and line.startswith(BOM):
+				self._pos += len(BOM)
+				line = line[len(BOM):]
+			self._pos += len(line)
+			yield safe_decode(line) if py3 else line
+
+	def _reader(self, offset):
+
+		"""
+		visible: False
+
+		arguments:
+			offset:
+				desc:	The position from which to read.
+				type:	int
+
+		returns:
+			desc:	A csv reader.
+			type:	reader
+		"""
+
+		if py3:
+			return csv.reader(self._lines(offset), delimiter=self.delimiter)
+		return csv.reader(self._lines(offset),
+			delimiter=safe_str(self.delimiter))
+
+	def _read_record(self, offset):
+
+		"""
+		visible: False
+
+		desc:
+			Reads a row from a position in the file. A row may span multiple
+			lines when a quoted cell contains a newline.
+
+		arguments:
+			offset:
+				desc:	The position of the row.
+				type:	int
+
+		returns:
+			desc:	A list of cells.
+			type:	list
+		"""
+
+		row = next(self._reader(offset), [])
+		if py3:
+			return row
+		return [safe_decode(cell) for cell in row]
+
+	def _error(self, row, exception):
+
+		"""
+		visible: False
+
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number, that could not be read.
+				type:	int
+			exception:
+				desc:	The exception raised by the csv module.
+				type:	Exception
+
+		returns:
+			desc:	An exception that describes the problem.
+			type:	osexception
+		"""
+
+		return osexception(
+			u'Failed to read row %d (not counting the header) of design file %s: %s' \
+			% (row+1, self.path, exception))
@@ -23,15 +23,11 @@ from libopensesame.file_pool_store import file_pool_store
 from libopensesame.python_workspace import python_workspace
 from libopensesame.syntax import syntax
 from libopensesame.exceptions import osexception
-from libopensesame import misc, item, debug, metadata
+from libopensesame import misc, item, debug, metadata, osexp
 from libopensesame.item_stack import item_stack_singleton
 from libopensesame.py3compat import *
 import os
-import pickle
-import shutil
 import time
-import tarfile
-import tempfile
 import warnings
 
 class experiment(item.item):
@@ -118,6 +114,11 @@ class experiment(item.item):
 		self.resources = resources
 		self.paused = False
 		self.output_channel = None
+		self._workspace_encoder = None
+		self.var_channel = None
+		self.heartbeat = None
+		self.profiler = None
+		self.frame_timing = None
 
 		# Set default variables
 		self.var.start = u'experiment'
@@ -199,6 +200,31 @@ class experiment(item.item):
 			DeprecationWarning)
 		return self.pool.fallback_folder()
 
+	@property
+	def stimulus_cache(self):
+
+		"""
+		desc:
+			The cache for generated stimuli, such as Gabor patches. Its `hits`,
+			`misses`, `evictions`, and `regenerations` properties can be used
+			to evaluate how effective the cache is.
+		"""
+
+		from openexp._canvas.stimulus_cache import canvas_cache
+		return canvas_cache
+
+	@property
+	def image_cache(self):
+
+		"""
+		desc:
+			The cache for images that have been decoded from file. It has the
+			same properties as [stimulus_cache].
+		"""
+
+		from openexp._canvas.stimulus_cache import image_cache
+		return image_cache
+
 	def get_file(self, path):
 
 		"""Deprecated."""
@@ -334,12 +360,22 @@ class experiment(item.item):
 			if get_next:
 				line = next(s, None)
 
-	def transmit_workspace(self, **extra):
+	def transmit_workspace(self, full=False, **extra):
 
 		"""
 		desc:
 			Sends the current workspace through the output channel. If there is
-			no output channel, this function does nothing.
+			no output channel, this function does nothing. Only the globals that
+			changed since the previous transmission are sent; see
+			libopensesame.workspace_delta. If there is a var channel, the `var`
+			object is only sent when `full` is True, because the launch process
+			otherwise reads the variables from the var channel.
+
+		keywords:
+			full:
+				desc:	Indicates whether all globals should be sent, rather
+						than only those that changed.
+				type:	bool
 
 		keyword-dict:
 			extra:	Any extra items in the workspace dict to be sent.
@@ -347,14 +383,22 @@ class experiment(item.item):
 
 		if self.output_channel is None:
 			return
-		d = self.python_workspace._globals.copy()
-		d.update(extra)
-		for key, value in d.copy().items():
-			try:
-				pickle.dumps(value)
-			except:
-				del d[key]
-		self.output_channel.put(d)
+		if self._workspace_encoder is None:
+			from libopensesame.workspace_delta import workspace_encoder
+			self._workspace_encoder = workspace_encoder(
+				max_value_size=self.var.get(u'heartbeat_max_value_size',
+				100000),
+				max_payload_size=self.var.get(u'heartbeat_max_payload_size',
+				1000000),
+				refresh_interval=self.var.get(u'heartbeat_refresh_interval',
+				10))
+		# The var channel may already be closed when the full workspace is sent
+		# at the end of the experiment, so then `var` is included.
+		exclude = (u'var',) if self.var_channel is not None and not full \
+			else ()
+		self.output_channel.put(self._workspace_encoder.encode(
+			self.python_workspace._globals, full=full, exclude=exclude,
+			**extra))
 
 	def set_output_channel(self, output_channel):
 
@@ -372,6 +416,26 @@ class experiment(item.item):
 			raise osexception(u'Invalid output_channel: %s' % output_channel)
 		self.output_channel = output_channel
 
+	def set_var_channel(self, path):
+
+		"""
+		desc:
+			Sets a var channel, through which heartbeats share the experimental
+			variables with the launch process. The workspace is then sent
+			through the output channel less often; see
+			libopensesame.heartbeat.
+
+		arguments:
+			path:
+				desc:	The path to a file that was created as a var channel by
+						the launch process.
+				type:	[str, unicode]
+		"""
+
+		from libopensesame.var_channel import var_channel
+		self.var_channel = var_channel(path)
+		self.cleanup_functions.append(self.var_channel.close)
+
 	def run(self):
 
 		"""Runs the experiment."""
@@ -384,12 +448,14 @@ class experiment(item.item):
 		self.running = True
 		self.init_random()
 		self.init_display()
+		self.init_image_cache()
 		self.init_clock()
 		self.init_sound()
 		self.init_log()
 		self.python_workspace.init_globals()
 		self.reset_feedback()
 		self.init_heartbeat()
+		self.init_profiler()
 		print(u"experiment.run(): experiment started at %s" % time.ctime())
 
 		if self.var.start in self.items:
@@ -420,7 +486,7 @@ class experiment(item.item):
 		from openexp.keyboard import keyboard
 
 		self.paused = True
-		self.transmit_workspace(__pause__=True)
+		self.transmit_workspace(full=True, __pause__=True)
 		pause_canvas = canvas(self)
 		pause_canvas.text(
 			u'The experiment has been paused<br /><br />'
@@ -441,7 +507,7 @@ class experiment(item.item):
 				time.sleep(.25)
 		finally:
 			self.paused = False
-			self.transmit_workspace(__pause__=False)
+			self.transmit_workspace(full=True, __pause__=False)
 		pause_keyboard.show_virtual_keyboard(False)
 
 	def cleanup(self):
@@ -459,14 +525,22 @@ class experiment(item.item):
 
 		from openexp import sampler, canvas
 		self.running = False
+		if self.heartbeat is not None and len(self.heartbeat.beat_times) > 0:
+			debug.msg(u'%d heartbeats, max duration = %.2f ms' % (
+				len(self.heartbeat.beat_times),
+				max(t[1] for t in self.heartbeat.beat_times)))
+		# Closing the log also writes any buffered data to disk
 		try:
-			self._log.flush()
-			os.fsync(self._log)
 			self._log.close()
-		except:
-			pass
+		except Exception as e:
+			debug.msg(u'failed to close log: %s' % e, reason=u'warning')
+		self.end_profiler()
 		sampler.close_sound(self)
 		canvas.close_display(self)
+		debug.msg(u'stimulus cache: %s' % self.stimulus_cache.stats())
+		debug.msg(u'image cache: %s' % self.image_cache.stats())
+		self.stimulus_cache.clear()
+		self.image_cache.clear()
 		self.cleanup()
 
 	def to_string(self):
@@ -515,9 +589,16 @@ class experiment(item.item):
 	def save(self, path, overwrite=False, update_path=True):
 
 		"""
-		desc:
+		desc: |
 			Saves the experiment to file.
 
+			The compression of the archive depends on the `osexp_compression`
+			variable: 'best', 'fast', 'none', or 'auto' (default), which uses
+			fast compression when most of the file pool consists of files that
+			are already compressed, such as videos and sounds. Archives
+			without compression cannot be opened by versions of OpenSesame
+			that don't support them.
+
 		arguments:
 			path:
 				desc:	The target file to save to.
@@ -549,37 +630,13 @@ class experiment(item.item):
 			self.experiment_path = os.path.dirname(path)
 			return path
 		debug.msg(u'saving as .tar.gz archive (with file pool)')
-		# Write the script to a text file
-		script = self.to_string()
-		script_path = os.path.join(self.pool.folder(), u'script.opensesame')
-		with open(script_path, u'w') as fd:
-			fd.write(safe_str(script))
-		# Create the archive in a a temporary folder and move it afterwards.
-		# This hack is needed, because tarfile fails on a Unicode path.
-		tmp_path = tempfile.mktemp(suffix=u'.osexp')
-		tar = tarfile.open(tmp_path, u'w:gz')
-		tar.add(script_path, u'script.opensesame')
-		os.remove(script_path)
-		# We also create a temporary pool folder, where all the filenames are
-		# Unicode sanitized to ASCII format. Again, this is necessary to deal
-		# with poor Unicode support in .tar.gz.
-		tmp_pool = tempfile.mkdtemp(suffix=u'.opensesame.pool')
-		for fname in os.listdir(self.pool.folder()):
-			sname = self.syntax.to_ascii(fname)
-			shutil.copyfile(os.path.join(self.pool.folder(), fname),
-				os.path.join(tmp_pool, sname))
-		tar.add(tmp_pool, u'pool', True)
-		tar.close()
-		# Move the file to the intended location
-		shutil.move(tmp_path, path)
+		files = [(fname, os.path.join(self.pool.folder(), fname)) \
+			for fname in os.listdir(self.pool.folder())]
+		level = osexp.compresslevel(files, self.var.get(u'osexp_compression',
+			u'auto', osexp.COMPRESSION_MODES))
+		osexp.write(path, self.to_string(), files, level=level)
 		if update_path:
 			self.experiment_path = os.path.dirname(path)
-		# Clean up the temporary pool folder
-		try:
-			shutil.rmtree(tmp_pool)
-			debug.msg(u'Removed temporary pool folder: %s' % tmp_pool)
-		except:
-			debug.msg(u'Failed to remove temporary pool folder: %s' % tmp_pool)
 		return path
 
 	def open(self, src):
@@ -608,43 +665,16 @@ class experiment(item.item):
 			debug.msg(u'opening from unicode string')
 			self.experiment_path = None
 			return safe_decode(src, errors=u'replace')
-		try:
-			tar = tarfile.open(src, u'r:gz')
-		except tarfile.ReadError:
-			# If the file wasn't a .tar.gz, then it must be a plain-text file
+		# If the file is a .tar.gz archive (or an uncompressed .tar archive),
+		# extract the pool to the pool folder and return the contents of
+		# opensesame.script.
+		script = osexp.read(src, self.pool.folder())
+		if script is None:
+			# If the file wasn't an archive, then it must be a plain-text file
 			debug.msg(u"opening plain-text experiment")
 			with open(src, universal_newline_mode) as fd:
 				return safe_decode(fd.read())
-		debug.msg(u"opening .tar.gz archive")
-		# If the file is a .tar.gz archive, extract the pool to the pool folder
-		# and return the contents of opensesame.script.
-		tar = tarfile.open(src, u'r:gz')
-		for name in tar.getnames():
-			# Here, all paths except name are Unicode. In addition, fname is
-			# Unicode from_asciid, because the files as saved are Unicode
-			# sanitized (see save()).
-			uname = safe_decode(name)
-			folder, fname = os.path.split(uname)
-			fname = self._syntax.from_ascii(fname)
-			if folder == u"pool":
-				# NOTE: When merging into `ising`, this needs to be ported to
-				# the py3compat system, and Python 3 compatibility needs to be
-				# checked.
-				debug.msg(u"extracting '%s'" % uname)
-				pool_folder = safe_str(self.pool.folder(),
-					enc=misc.filesystem_encoding())
-				from_name = safe_str(os.path.join(self.pool.folder(), uname),
-					enc=misc.filesystem_encoding())
-				to_name = safe_str(os.path.join(self.pool.folder(), fname),
-					enc=misc.filesystem_encoding())
-				tar.extract(name, pool_folder)
-				os.rename(from_name, to_name)
-				os.rmdir(os.path.join(self.pool.folder(), folder))
-		script_path = os.path.join(self.pool.folder(), u"script.opensesame")
-		tar.extract(u"script.opensesame", self.pool.folder())
-		with open(script_path, universal_newline_mode) as fd:
-			script = safe_decode(fd.read())
-		os.remove(script_path)
+		debug.msg(u"opened .tar.gz archive")
 		self.experiment_path = os.path.dirname(src)
 		return script
 
@@ -687,9 +717,70 @@ class experiment(item.item):
 			self.heartbeat = None
 			return
 		from libopensesame.heartbeat import heartbeat
-		self.heartbeat = heartbeat(self, interval=self.heartbeat_interval)
+		self.heartbeat = heartbeat(self, interval=self.heartbeat_interval,
+			workspace_interval=self.var.get(
+			u'heartbeat_workspace_interval', 5))
 		self.heartbeat.start()
 
+	def init_profiler(self):
+
+		"""
+		desc:
+			Initializes the item profiler, if the `profile_items` variable is
+			'yes'.
+		"""
+
+		if self.var.get(u'profile_items', u'no', [u'yes', u'no']) == u'no':
+			self.profiler = None
+			item_stack_singleton.profiler = None
+			return
+		from libopensesame.item_profiler import item_profiler
+		self.profiler = item_profiler(self.clock)
+		item_stack_singleton.profiler = self.profiler
+
+	def end_profiler(self):
+
+		"""
+		desc:
+			Detaches the item profiler, and writes its report and trace next
+			to the logfile.
+		"""
+
+		if self.profiler is None:
+			return
+		item_stack_singleton.profiler = None
+		path = self.logfile_sibling(u'-profile.txt')
+		try:
+			self.profiler.write(path, self.logfile_sibling(u'-trace.json'))
+		except Exception as e:
+			debug.msg(u'failed to write profile: %s' % e, reason=u'warning')
+		else:
+			debug.msg(u'item profile written to %s' % path)
+
+	def logfile_sibling(self, suffix):
+
+		"""
+		desc:
+			Gets the path of a file next to the logfile, such as a report.
+
+		arguments:
+			suffix:
+				desc:	A suffix that replaces the extension of the logfile,
+						such as '-report.txt'.
+				type:	unicode
+
+		returns:
+			desc:	A path.
+			type:	unicode
+		"""
+
+		# Relative logfile paths are relative to the experiment folder, just
+		# like in the log backends.
+		path = os.path.splitext(self.logfile)[0]
+		if os.path.basename(path) == path and self.experiment_path is not None:
+			path = os.path.join(self.experiment_path, path)
+		return path + suffix
+
 	def init_random(self):
 
 		"""
@@ -727,9 +818,36 @@ class experiment(item.item):
 		"""Initializes the canvas backend."""
 
 		from openexp import canvas
+		from openexp._canvas.stimulus_cache import DEFAULT_SIZE
+		# The stimulus-cache size is specified in megabytes
+		self.stimulus_cache.max_bytes = int(1024**2 * self.var.get(
+			u'stimulus_cache_size', DEFAULT_SIZE))
+		self.stimulus_cache.reset_counters()
 		canvas.init_display(self)
 		self.python_workspace[u'win'] = self.window
 
+	def init_image_cache(self):
+
+		"""
+		desc:
+			Initializes the image cache, and decodes the images from the file
+			pool into it, so that they don't need to be decoded during the
+			experiment. Preloading can be disabled by setting the
+			`preload_images` variable to 'no'.
+		"""
+
+		from openexp import canvas
+		from openexp._canvas.stimulus_cache import DEFAULT_SIZE
+		# The image-cache size is specified in megabytes
+		self.image_cache.max_bytes = int(1024**2 * self.var.get(
+			u'image_cache_size', DEFAULT_SIZE))
+		self.image_cache.reset_counters()
+		if self.var.get(u'preload_images', u'yes', [u'yes', u'no']) == u'no':
+			return
+		n = canvas.preload_images(self,
+			[self.pool[fname] for fname in self.pool.files()])
+		debug.msg(u'preloaded %d images' % n)
+
 	def init_clock(self):
 
 		"""Initializes the clock backend."""
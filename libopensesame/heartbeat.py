@@ -26,10 +26,17 @@ class heartbeat(threading.Thread):
 	"""
 	desc:
 		A thread that sends regular heartbeats to the launch process (if any).
-		A heartbeat is a transfer of the experiment workspace.
+		A heartbeat is a transfer of the experiment workspace. If the
+		experiment has a var channel, each heartbeat writes the experimental
+		variables to the channel instead, and the workspace is only
+		transferred every `workspace_interval` heartbeats.
+
+		For each heartbeat, a (timestamp, duration) tuple is added to
+		`beat_times`, so that you can check how much time heartbeats take
+		from the experiment.
 	"""
 
-	def __init__(self, exp, interval=1):
+	def __init__(self, exp, interval=1, workspace_interval=5):
 
 		"""
 		desc:
@@ -44,12 +51,19 @@ class heartbeat(threading.Thread):
 			interval:
 				desc:	The heartbeat interval in seconds.
 				type:	[float, int]
+			workspace_interval:
+				desc:	The number of heartbeats after which the workspace is
+						transferred, if the experiment has a var channel.
+				type:	int
 		"""
 
 		super(heartbeat, self).__init__()
 		self.exp = exp
 		self.interval = interval
+		self.workspace_interval = max(1, workspace_interval)
+		self.count = 0
 		self.lock = threading.Lock()
+		self.beat_times = []
 
 	def run(self):
 
@@ -70,5 +84,12 @@ class heartbeat(threading.Thread):
 		"""
 
 		self.lock.acquire()
-		self.exp.transmit_workspace(__heartbeat__=True)
+		t0 = self.exp.clock.time()
+		if self.exp.var_channel is not None:
+			self.exp.var_channel.write_vars(self.exp.var)
+		if self.exp.var_channel is None or \
+			self.count % self.workspace_interval == 0:
+			self.exp.transmit_workspace(__heartbeat__=True)
+		self.count += 1
+		self.beat_times.append( (t0, self.exp.clock.time()-t0) )
 		self.lock.release()
@@ -44,6 +44,10 @@ class inline_script(item.item):
 		self.var._prepare = u''
 		self.var._run = u''
 		self._var_info = None
+		# Compiled scripts by phase, as (script, bytecode) tuples
+		self._bytecode = {}
+		self.bytecode_hits = 0
+		self.bytecode_misses = 0
 
 	def prepare(self):
 
@@ -58,32 +62,51 @@ class inline_script(item.item):
 		# 'self' must always be registered, otherwise we get confusions between
 		# the various inline_script items.
 		self.experiment.python_workspace[u'self'] = self
-		# Compile prepare script
+		self.cprepare = self.compile_script(u'prepare')
+		self.crun = self.compile_script(u'run')
+		# Run prepare script
 		try:
-			self.cprepare = self.experiment.python_workspace._compile(
-				self.var.get(u'_prepare', _eval=False))
+			self.experiment.python_workspace._exec(self.cprepare)
 		except osexception:
 			raise
 		except Exception as e:
-			raise osexception(u'Failed to compile inline script',
+			raise osexception(u'Error while executing inline script',
 				line_offset=-1, item=self.name, phase=u'prepare', exception=e)
-		# Compile run script
+
+	def compile_script(self, phase):
+
+		"""
+		desc:
+			Compiles the script for a phase. The bytecode is re-used for as
+			long as the script doesn't change, so that the scripts are not
+			compiled again every time that the item is prepared. The number of
+			times that bytecode was re-used and compiled is counted in
+			`bytecode_hits` and `bytecode_misses`.
+
+		arguments:
+			phase:
+				desc:	The phase, i.e. 'prepare' or 'run'.
+				type:	str
+
+		returns:
+			desc:	The compiled script.
+			type:	code
+		"""
+
+		script = self.var.get(u'_%s' % phase, _eval=False)
+		if phase in self._bytecode and self._bytecode[phase][0] == script:
+			self.bytecode_hits += 1
+			return self._bytecode[phase][1]
+		self.bytecode_misses += 1
 		try:
-			self.crun = self.experiment.python_workspace._compile(
-				self.var.get(u'_run', _eval=False))
+			bytecode = self.experiment.python_workspace._compile_cached(script)
 		except osexception:
 			raise
 		except Exception as e:
 			raise osexception(u'Failed to compile inline script',
-				line_offset=-1, item=self.name, phase=u'run', exception=e)
-		# Run prepare script
-		try:
-			self.experiment.python_workspace._exec(self.cprepare)
-		except osexception:
-			raise
-		except Exception as e:
-			raise osexception(u'Error while executing inline script',
-				line_offset=-1, item=self.name, phase=u'prepare', exception=e)
+				line_offset=-1, item=self.name, phase=phase, exception=e)
+		self._bytecode[phase] = script, bytecode
+		return bytecode
 
 	def run(self):
 
@@ -0,0 +1,194 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+import io
+import json
+import math
+
+class item_profiler(object):
+
+	"""
+	desc: |
+		Measures how long the prepare and run phases of items take. The
+		profiler is attached to the item stack, and timestamps each push and
+		pop with the experiment clock.
+
+		For each phase of each item, the inclusive time is the time from push
+		to pop, and the self time is the inclusive time minus the inclusive
+		time of the items that were executed in between (such as the items in
+		a sequence or loop).
+
+		Enable the profiler by setting the `profile_items` variable to 'yes'.
+		When the experiment ends, a report is written to
+		`[logfile]-profile.txt`, and all phases are written as events in the
+		Chrome trace format to `[logfile]-trace.json`, which can be opened in
+		chrome://tracing and most flame-graph viewers.
+	"""
+
+	def __init__(self, clock):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			clock:
+				desc:	The experiment clock.
+				type:	clock
+		"""
+
+		self.clock = clock
+		# A list of (item, phase, start time, inclusive time, self time, depth)
+		# tuples, in the order in which the phases ended.
+		self.events = []
+		self._stack = []
+
+	def push(self, item, phase):
+
+		"""
+		desc:
+			Marks the start of a phase.
+
+		arguments:
+			item:
+				desc:	The item name.
+				type:	str
+			phase:
+				desc:	The phase, typically 'prepare' or 'run'.
+				type:	str
+		"""
+
+		self._stack.append([item, phase, self.clock.time(), 0])
+
+	def pop(self):
+
+		"""
+		desc:
+			Marks the end of the most recently started phase.
+		"""
+
+		t1 = self.clock.time()
+		if not self._stack:
+			return
+		item, phase, t0, child_time = self._stack.pop()
+		duration = t1 - t0
+		self.events.append( (item, phase, t0, duration, duration-child_time,
+			len(self._stack)) )
+		if self._stack:
+			self._stack[-1][3] += duration
+
+	def stats(self):
+
+		"""
+		returns:
+			desc: |
+				A dict with (item, phase) tuples as keys, and dicts with the
+				following keys as values: count, mean, p95, max, inclusive
+				(total inclusive time), and self (total self time). Times are
+				in milliseconds.
+			type:	dict
+		"""
+
+		durations = {}
+		self_times = {}
+		for item, phase, t0, duration, self_time, depth in self.events:
+			key = item, phase
+			durations.setdefault(key, []).append(duration)
+			self_times[key] = self_times.get(key, 0) + self_time
+		stats = {}
+		for key, l in durations.items():
+			l.sort()
+			stats[key] = {
+				u'count' : len(l),
+				u'mean' : sum(l) / len(l),
+				# Nearest-rank percentile
+				u'p95' : l[int(math.ceil(.95 * len(l))) - 1],
+				u'max' : l[-1],
+				u'inclusive' : sum(l),
+				u'self' : self_times[key]
+				}
+		return stats
+
+	def report(self):
+
+		"""
+		returns:
+			desc:	A plain-text table with the statistics of each phase of
+					each item, sorted by total self time.
+			type:	unicode
+		"""
+
+		stats = self.stats()
+		lines = [u'%-30s %-8s %8s %10s %10s %10s %12s %12s' % (u'item',
+			u'phase', u'count', u'mean', u'p95', u'max', u'inclusive',
+			u'self')]
+		for key in sorted(stats, key=lambda key: -stats[key][u'self']):
+			s = stats[key]
+			lines.append(
+				u'%-30s %-8s %8d %10.2f %10.2f %10.2f %12.2f %12.2f' % (
+				key[0], key[1], s[u'count'], s[u'mean'], s[u'p95'], s[u'max'],
+				s[u'inclusive'], s[u'self']))
+		lines.append(u'')
+		lines.append(u'All times are in milliseconds.')
+		return u'\n'.join(lines) + u'\n'
+
+	def trace(self):
+
+		"""
+		returns:
+			desc:	The phases as a dict in the Chrome trace format, in which
+					times are in microseconds.
+			type:	dict
+		"""
+
+		return {
+			u'traceEvents' : [{
+				u'name' : item,
+				u'cat' : phase,
+				u'ph' : u'X',
+				u'ts' : 1000 * t0,
+				u'dur' : 1000 * duration,
+				u'pid' : 0,
+				u'tid' : 0,
+				u'args' : {u'self' : self_time}
+				} for item, phase, t0, duration, self_time, depth \
+				in self.events],
+			u'displayTimeUnit' : u'ms'
+			}
+
+	def write(self, report_path, trace_path):
+
+		"""
+		desc:
+			Writes the report and the trace.
+
+		arguments:
+			report_path:
+				desc:	The path of the report.
+				type:	unicode
+			trace_path:
+				desc:	The path of the trace.
+				type:	unicode
+		"""
+
+		with io.open(report_path, u'w', encoding=u'utf-8') as fd:
+			fd.write(self.report())
+		with io.open(trace_path, u'w', encoding=u'utf-8') as fd:
+			fd.write(safe_decode(json.dumps(self.trace())))
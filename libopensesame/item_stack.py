@@ -23,7 +23,8 @@ class item_stack(object):
 
 	"""
 	desc:
-		Keeps track of which item is currently active.
+		Keeps track of which item is currently active. If a `profiler` is
+		set, such as an `item_profiler`, it is notified of each push and pop.
 	"""
 
 	def __init__(self):
@@ -33,6 +34,7 @@ class item_stack(object):
 			Constructor.
 		"""
 
+		self.profiler = None
 		self.clear()
 
 	def clear(self):
@@ -57,6 +59,8 @@ class item_stack(object):
 		"""
 
 		self.l.append( (item, phase) )
+		if self.profiler is not None:
+			self.profiler.push(item, phase)
 
 	def pop(self):
 
@@ -69,6 +73,8 @@ class item_stack(object):
 			type:	str
 		"""
 
+		if self.profiler is not None:
+			self.profiler.pop()
 		return self.l.pop()
 
 	def __str__(self):
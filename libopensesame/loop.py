@@ -20,10 +20,22 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 from libopensesame.exceptions import osexception
 from libopensesame import item, debug
 from libopensesame.py3compat import *
+from libopensesame.loop_matrix import loop_matrix, auto_type, BLOCK_START, \
+	BLOCK_END
+from libopensesame.design_file import design_file
 import openexp.keyboard
+import re
 from random import *
 from math import *
 
+# Matches setcycle lines with a simple double-quoted value, as written by older
+# versions, so that they can be parsed without shlex.
+re_setcycle = re.compile(r'^\s*setcycle\s+(\d+)\s+(\w+)\s+"([^"\\]*)"\s*$')
+# Loop tables with at most this many cells are saved as setcycle lines, which
+# older versions can read. Larger tables are saved as a matrix block, which is
+# more compact and faster to parse, but which older versions ignore.
+MAX_SETCYCLE_CELLS = 10000
+
 class loop(item.item):
 
 	"""A loop item runs a single other item multiple times"""
@@ -38,10 +50,13 @@ class loop(item.item):
 		self.var.repeat = 1
 		self.var.skip = 0
 		self.var.offset = u'no'
-		self.matrix = {}
+		self.matrix = loop_matrix()
 		self.var.order = u'random'
 		self.var.item = u''
 		self.var.break_if = u'never'
+		self.var.source = u'table'
+		self.var.source_file = u''
+		self._design_file = None
 
 	def from_string(self, string):
 
@@ -57,7 +72,24 @@ class loop(item.item):
 		self.reset()
 		if string is None:
 			return
+		block = None
 		for i in string.split(u'\n'):
+			# Collect the lines of a matrix block, which are parsed all at once
+			if block is not None:
+				if i.strip() == BLOCK_END:
+					self.matrix.parse_block(block)
+					block = None
+				elif i != u'':
+					block.append(i[1:] if i[:1] == u'\t' else i)
+				continue
+			if i.strip() == BLOCK_START:
+				block = []
+				continue
+			m = re_setcycle.match(i)
+			if m is not None:
+				self.matrix.set(int(m.group(1)), m.group(2),
+					auto_type(m.group(3)))
+				continue
 			self.parse_variable(i)
 			# Extract the item to run
 			i = self.syntax.split(i.strip())
@@ -65,19 +97,11 @@ class loop(item.item):
 				if i[0] == u'run' and len(i) > 1:
 					self.var.item = i[1]
 				if i[0] == u'setcycle' and len(i) > 3:
-					cycle = int(i[1])
-					var = i[2]
-					val = i[3]
-					try:
-						if int(val) == float(val):
-							val = int(val)
-						else:
-							val = float(val)
-					except:
-						pass
-					if cycle not in self.matrix:
-						self.matrix[cycle] = {}
-					self.matrix[cycle][var] = val
+					self.matrix.set(int(i[1]), i[2], auto_type(i[3]))
+		if block is not None:
+			raise osexception(
+				u'Missing __end__ for the matrix block in loop item %s' \
+				% self.name)
 
 	def run(self):
 
@@ -92,18 +116,44 @@ class loop(item.item):
 		else:
 			self._break_if = None
 
+		# The cycles are taken from the loop table, or from a design file in
+		# the file pool, of which only the row offsets are kept in memory
+		if self.var.source == u'file':
+			self._design_file = design_file(
+				self.experiment.pool[self.var.source_file])
+			cycles = len(self._design_file)
+		else:
+			cycles = self.var.cycles
+		try:
+			self.run_cycles(cycles)
+		finally:
+			if self._design_file is not None:
+				self._design_file.close()
+				self._design_file = None
+		# Give the log the opportunity to write buffered data
+		self.log.end_block()
+
+	def run_cycles(self, cycles):
+
+		"""
+		Runs the cycles in the order that is specified by the repeat, order,
+		skip, and offset variables.
+
+		Arguments:
+		cycles		--	The number of cycles.
+		"""
+
 		# First generate a list of cycle numbers
 		l = []
 		# Walk through all complete repeats
 		whole_repeats = int(self.var.repeat)
 		for j in range(whole_repeats):
-			for i in range(self.var.cycles):
-				l.append(i)
+			l += range(cycles)
 
 		# Add the leftover repeats
 		partial_repeats = self.var.repeat - whole_repeats
 		if partial_repeats > 0:
-			all_cycles = range(self.var.cycles)
+			all_cycles = range(cycles)
 			_sample = sample(all_cycles, int(len(all_cycles) * partial_repeats))
 			for i in _sample:
 				l.append(i)
@@ -132,9 +182,11 @@ class loop(item.item):
 				u"Could not find item '%s', which is called by loop item '%s'" \
 				% (self.var.item, self.name))
 
-		# And run!
+		# And run! Cycles are taken from the end of the list, because removing
+		# the first element of a long list is slow.
+		l.reverse()
 		while len(l) > 0:
-			cycle = l.pop(0)
+			cycle = l.pop()
 			self.apply_cycle(cycle)
 			if self._break_if is not None:
 				self.python_workspace[u'self'] = self
@@ -144,7 +196,7 @@ class loop(item.item):
 			self.experiment.items.execute(self.var.item)
 			if self.experiment.var.repeat_cycle:
 				debug.msg(u'repeating cycle %d' % cycle)
-				l.append(cycle)
+				l.insert(0, cycle)
 				if self.var.order == u'random':
 					shuffle(l)
 
@@ -157,18 +209,19 @@ class loop(item.item):
 		cycle 		--	The cycle nr.
 		"""
 
-		# If the cycle is not defined, we don't have to do anything
-		if cycle not in self.matrix:
-			return
-		# Otherwise apply all variables from the cycle
-		for var in self.matrix[cycle]:
-			val = self.matrix[cycle][var]
+		# Apply all variables from the cycle. Cells that are not defined are
+		# skipped.
+		if self._design_file is not None:
+			matrix = self._design_file
+		else:
+			matrix = self.matrix
+		for var, val, expression in matrix.cells(cycle):
 			# By starting with an "=" sign, users can incorporate a
 			# Python statement, for example to call functions from
 			# the random or math module
-			if isinstance(val, basestring) and len(val) > 1 and val[0] == "=":
+			if expression:
 				try:
-					val = eval(val[1:])
+					val = eval(matrix.compiled(val))
 				except Exception as e:
 					raise osexception( \
 						u"Failed to evaluate '%s' in loop item '%s': %s" \
@@ -186,12 +239,41 @@ class loop(item.item):
 		"""
 
 		s = super(loop, self).to_string()
-		for i in self.matrix:
-			for var in self.matrix[i]:
-				s += u'\tsetcycle %d %s "%s"\n' % (i, var, self.matrix[i][var])
+		if self._fits_setcycle():
+			for row in range(len(self.matrix)):
+				for var, val, expression in self.matrix.cells(row):
+					val = safe_decode(val).replace(u'\\', u'\\\\').replace(
+						u'"', u'\\"')
+					s += u'\tsetcycle %d %s "%s"\n' % (row, var, val)
+		else:
+			lines = self.matrix.to_block()
+			s += u'\t' + u'\n\t'.join(lines) + u'\n'
 		s += u'\trun %s\n' % self.var.item
 		return s
 
+	def _fits_setcycle(self):
+
+		"""
+		visible: False
+
+		desc:
+			Checks whether the loop table can be saved as setcycle lines,
+			which is the case for small tables without line breaks in the
+			cells.
+
+		returns:
+			type:	bool
+		"""
+
+		if len(self.matrix) * len(self.matrix.columns) > MAX_SETCYCLE_CELLS:
+			return False
+		for row in range(len(self.matrix)):
+			for var, val, expression in self.matrix.cells(row):
+				val = safe_decode(val)
+				if u'\n' in val or u'\r' in val:
+					return False
+		return True
+
 	def var_info(self):
 
 		"""
@@ -202,12 +284,17 @@ class loop(item.item):
 		"""
 
 		l = item.item.var_info(self)
-		var_list = {}
-		for i in self.matrix:
-			for var in self.matrix[i]:
-				if var not in var_list:
-					var_list[var] = []
-				var_list[var].append(safe_decode(self.matrix[i][var]))
-		for var in var_list:
-			l.append( (var, u'[' + u', '.join(var_list[var]) + u']'))
+		if self.var.source == u'file':
+			# The values are not listed, because the file may be large
+			try:
+				f = design_file(self.experiment.pool[self.var.source_file])
+			except osexception:
+				return l
+			f.close()
+			for var in f.columns:
+				l.append( (var, u'[from %s]' % self.var.source_file) )
+			return l
+		for var in self.matrix.columns:
+			l.append( (var, u'[' + u', '.join(safe_decode(val) \
+				for val in self.matrix.column(var) if val is not None) + u']'))
 		return l
@@ -0,0 +1,592 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame.exceptions import osexception
+import array
+
+# Marks the start and end of a matrix block in the definition of a loop item
+BLOCK_START = u'__matrix__'
+BLOCK_END = u'__end__'
+# Cells that are not defined, i.e. cells for which the variable is not set
+MISSING = None
+MISSING_CELL = u'\\N'
+EMPTY_CELL = u'""'
+ESCAPES = {u'\\' : u'\\', u't' : u'\t', u'n' : u'\n', u'r' : u'\r',
+	u'"' : u'"', u'_' : u'_'}
+
+def auto_type(val):
+
+	"""
+	desc:
+		Converts a value from a loop definition to an int if possible, and
+		otherwise returns it unchanged. This is how values from `setcycle`
+		lines have always been typed.
+
+	arguments:
+		val:
+			desc:	A value.
+			type:	unicode
+
+	returns:
+		desc:	The typed value.
+		type:	[int, unicode]
+	"""
+
+	try:
+		return int(val)
+	except:
+		return val
+
+def is_expression(val):
+
+	"""
+	arguments:
+		val:
+			desc:	A value.
+
+	returns:
+		desc:	True if the value is a Python expression, i.e. a string that
+				starts with '='.
+		type:	bool
+	"""
+
+	return isinstance(val, basestring) and len(val) > 1 and val[0] == u'='
+
+def encode_cell(val):
+
+	"""
+	desc:
+		Encodes a value as a cell in a matrix block. Missing values are encoded
+		as `\\N`, empty strings as `""`, and backslashes, tabs, and newlines
+		are escaped. Like in multiline variables, `__end__` is escaped as
+		`\\__end__`, so that it doesn't end the block.
+
+	arguments:
+		val:
+			desc:	A value.
+
+	returns:
+		desc:	The cell.
+		type:	unicode
+	"""
+
+	if val is MISSING:
+		return MISSING_CELL
+	val = safe_decode(val)
+	if val == u'':
+		return EMPTY_CELL
+	if val == EMPTY_CELL:
+		return u'\\"\\"'
+	if u'\\' in val or u'\t' in val or u'\n' in val or u'\r' in val or \
+		BLOCK_END in val:
+		val = val.replace(u'\\', u'\\\\').replace(u'\t', u'\\t') \
+			.replace(u'\n', u'\\n').replace(u'\r', u'\\r') \
+			.replace(BLOCK_END, u'\\' + BLOCK_END)
+	return val
+
+def decode_cell(cell):
+
+	"""
+	desc:
+		Decodes a cell from a matrix block. This is the inverse of
+		`encode_cell()`, except that values are not typed.
+
+	arguments:
+		cell:
+			desc:	A cell.
+			type:	unicode
+
+	returns:
+		desc:	The value.
+		type:	[unicode, NoneType]
+	"""
+
+	if cell == MISSING_CELL:
+		return MISSING
+	if cell == EMPTY_CELL:
+		return u''
+	if u'\\' not in cell:
+		return cell
+	l = []
+	i = 0
+	while i < len(cell):
+		ch = cell[i]
+		if ch == u'\\' and i+1 < len(cell) and cell[i+1] in ESCAPES:
+			l.append(ESCAPES[cell[i+1]])
+			i += 2
+			continue
+		l.append(ch)
+		i += 1
+	return u''.join(l)
+
+class loop_matrix(object):
+
+	"""
+	desc: |
+		The table of a loop item, stored per column rather than per cycle.
+
+		Columns in which all values are ints are stored as an `array.array`,
+		and other columns as a list in which identical strings are shared. For
+		each column, a `bytearray` flags the rows that contain a Python
+		expression (i.e. values that start with '='), so that values don't need
+		to be checked when a cycle is applied. Expressions are compiled once and
+		the code is cached.
+
+		In a script, the matrix is stored as a block of tab-separated values,
+		with the variable names on the first line and one line per cycle:
+
+			__matrix__
+			word	frequency	correct_response
+			cat	120	z
+			dog	98	z
+			__end__
+
+		Scripts in which the matrix is defined with `setcycle` lines can still
+		be read, and small matrices are still written that way, because older
+		versions ignore matrix blocks; see `loop.to_string()`.
+	"""
+
+	def __init__(self):
+
+		"""
+		desc:
+			Constructor, which creates an empty matrix.
+		"""
+
+		self._columns = []
+		self._data = {}
+		self._expressions = {}
+		self._code = {}
+		self._rows = 0
+
+	def __len__(self):
+
+		"""
+		visible: False
+
+		returns:
+			desc:	The number of rows, i.e. cycles.
+			type:	int
+		"""
+
+		return self._rows
+
+	@property
+	def columns(self):
+
+		"""
+		returns:
+			desc:	A list of column names, i.e. variables, in the order in
+					which they were added.
+			type:	list
+		"""
+
+		return list(self._columns)
+
+	def get(self, row, column, default=MISSING):
+
+		"""
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number.
+				type:	int
+			column:
+				desc:	The column name.
+				type:	[str, unicode]
+
+		keywords:
+			default:
+				desc:	The value that is returned when the cell is undefined.
+
+		returns:
+			desc:	The value of the cell.
+		"""
+
+		if column not in self._data or row >= self._rows:
+			return default
+		val = self._data[column][row]
+		if val is MISSING:
+			return default
+		return val
+
+	def set(self, row, column, val):
+
+		"""
+		desc:
+			Sets the value of a cell. The column is created, and rows are
+			added, if necessary.
+
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number.
+				type:	int
+			column:
+				desc:	The column name.
+				type:	[str, unicode]
+			val:
+				desc:	The value.
+		"""
+
+		if row >= self._rows:
+			self.resize(row+1)
+		if column not in self._data:
+			self.add_column(column)
+		data = self._data[column]
+		if isinstance(data, array.array):
+			if isinstance(val, int) and not isinstance(val, bool):
+				try:
+					data[row] = val
+					return
+				except OverflowError:
+					pass
+			data = self._data[column] = data.tolist()
+		data[row] = val
+		self._expressions[column][row] = is_expression(val)
+
+	def row(self, row):
+
+		"""
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number.
+				type:	int
+
+		returns:
+			desc:	A dict with the defined cells of the row.
+			type:	dict
+		"""
+
+		return dict((column, val) for column, val, expression \
+			in self.cells(row))
+
+	def cells(self, row):
+
+		"""
+		desc:
+			Iterates through the defined cells of a row.
+
+		arguments:
+			row:
+				desc:	The row, i.e. cycle number.
+				type:	int
+
+		returns:
+			desc:	A generator of (column, value, expression) tuples, where
+					expression indicates whether the value is a Python
+					expression.
+			type:	generator
+		"""
+
+		if row >= self._rows:
+			return
+		for column in self._columns:
+			val = self._data[column][row]
+			if val is MISSING:
+				continue
+			yield column, val, self._expressions[column][row] == 1
+
+	def column(self, column):
+
+		"""
+		arguments:
+			column:
+				desc:	The column name.
+				type:	[str, unicode]
+
+		returns:
+			desc:	A list of all values in the column, in which undefined
+					cells are `None`.
+			type:	list
+		"""
+
+		return list(self._data[column])
+
+	def compiled(self, expression):
+
+		"""
+		desc:
+			Compiles a Python expression from a cell. Each expression is only
+			compiled once.
+
+		arguments:
+			expression:
+				desc:	The value of a cell, including the leading '='.
+				type:	[str, unicode]
+
+		returns:
+			desc:	A code object.
+			type:	code
+		"""
+
+		code = self._code.get(expression, None)
+		if code is None:
+			code = compile(expression[1:], u'<loop>', u'eval')
+			self._code[expression] = code
+		return code
+
+	def add_column(self, column, default=MISSING):
+
+		"""
+		desc:
+			Adds a column, or fills the undefined cells of an existing column.
+
+		arguments:
+			column:
+				desc:	The column name.
+				type:	[str, unicode]
+
+		keywords:
+			default:
+				desc:	The value of the cells.
+		"""
+
+		if column not in self._data:
+			self._columns.append(column)
+			self._data[column] = [MISSING] * self._rows
+			self._expressions[column] = bytearray(self._rows)
+		if default is MISSING:
+			return
+		for row, val in enumerate(self._data[column]):
+			if val is MISSING:
+				self.set(row, column, default)
+
+	def remove_column(self, column):
+
+		"""
+		desc:
+			Removes a column, if it exists.
+
+		arguments:
+			column:
+				desc:	The column name.
+				type:	[str, unicode]
+		"""
+
+		if column not in self._data:
+			return
+		self._columns.remove(column)
+		del self._data[column]
+		del self._expressions[column]
+
+	def rename_column(self, from_name, to_name):
+
+		"""
+		desc:
+			Renames a column, if it exists.
+
+		arguments:
+			from_name:
+				desc:	The old column name.
+				type:	[str, unicode]
+			to_name:
+				desc:	The new column name.
+				type:	[str, unicode]
+		"""
+
+		if from_name not in self._data:
+			return
+		if to_name in self._data:
+			raise osexception(u'Column %s already exists' % to_name)
+		self._columns[self._columns.index(from_name)] = to_name
+		self._data[to_name] = self._data.pop(from_name)
+		self._expressions[to_name] = self._expressions.pop(from_name)
+
+	def resize(self, rows):
+
+		"""
+		desc:
+			Changes the number of rows. Rows are removed from the end, or added
+			with undefined cells.
+
+		arguments:
+			rows:
+				desc:	The number of rows.
+				type:	int
+		"""
+
+		if rows < self._rows:
+			for column in self._columns:
+				del self._data[column][rows:]
+				del self._expressions[column][rows:]
+		elif rows > self._rows:
+			for column in self._columns:
+				data = self._data[column]
+				if isinstance(data, array.array):
+					data = self._data[column] = data.tolist()
+				data.extend([MISSING] * (rows - self._rows))
+				self._expressions[column].extend(bytearray(rows - self._rows))
+		self._rows = rows
+
+	def fill(self, rows, default=u''):
+
+		"""
+		desc:
+			Makes sure that the matrix has at least a number of rows, and sets
+			all undefined cells to a default value.
+
+		arguments:
+			rows:
+				desc:	The minimum number of rows.
+				type:	int
+
+		keywords:
+			default:
+				desc:	The value of the undefined cells.
+		"""
+
+		if rows > self._rows:
+			self.resize(rows)
+		for column in self._columns:
+			data = self._data[column]
+			if isinstance(data, array.array) or MISSING not in data:
+				continue
+			for row, val in enumerate(data):
+				if val is MISSING:
+					self.set(row, column, default)
+
+	def take(self, rows):
+
+		"""
+		desc:
+			Creates a new matrix from a selection of rows. Rows can be selected
+			multiple times.
+
+		arguments:
+			rows:
+				desc:	A list of row numbers.
+				type:	list
+
+		returns:
+			desc:	A new matrix.
+			type:	loop_matrix
+		"""
+
+		matrix = loop_matrix()
+		matrix._rows = len(rows)
+		matrix._code = self._code
+		for column in self._columns:
+			data = self._data[column]
+			expressions = self._expressions[column]
+			matrix._columns.append(column)
+			if isinstance(data, array.array):
+				matrix._data[column] = array.array(data.typecode,
+					[data[row] for row in rows])
+			else:
+				matrix._data[column] = [data[row] for row in rows]
+			matrix._expressions[column] = bytearray(expressions[row] \
+				for row in rows)
+		return matrix
+
+	def set_column(self, column, values):
+
+		"""
+		desc:
+			Sets all values of a column at once. The values are typed as in a
+			script, and columns that contain only ints are stored as an array.
+			Rows are added if necessary.
+
+		arguments:
+			column:
+				desc:	The column name.
+				type:	[str, unicode]
+			values:
+				desc:	A list of unicode values, in which undefined cells are
+						`None`.
+				type:	list
+		"""
+
+		if len(values) > self._rows:
+			self.resize(len(values))
+		values = list(values) + [MISSING] * (self._rows - len(values))
+		try:
+			data = array.array(u'l' if py3 else b'l',
+				[int(val) for val in values])
+		except (ValueError, TypeError, OverflowError):
+			# Identical strings are stored only once
+			shared = {}
+			data = []
+			for val in values:
+				if val is not MISSING:
+					typed = shared.get(val, MISSING)
+					if typed is MISSING:
+						typed = shared[val] = auto_type(val)
+					val = typed
+				data.append(val)
+			expressions = bytearray(is_expression(val) for val in data)
+		else:
+			expressions = bytearray(self._rows)
+		if column not in self._data:
+			self._columns.append(column)
+		self._data[column] = data
+		self._expressions[column] = expressions
+
+	def parse_block(self, lines):
+
+		"""
+		desc:
+			Parses a matrix block and replaces the contents of the matrix.
+
+		arguments:
+			lines:
+				desc:	The lines of the block, without the `__matrix__` and
+						`__end__` lines and without indentation. The first line
+						contains the column names.
+				type:	list
+		"""
+
+		self.__init__()
+		if not lines:
+			return
+		columns = [decode_cell(column) for column in lines[0].split(u'\t')]
+		n = len(columns)
+		rows = []
+		for line in lines[1:]:
+			cells = line.split(u'\t')
+			if len(cells) != n:
+				# Trailing empty cells may have been stripped by an editor
+				if len(cells) > n:
+					raise osexception(
+						u'Too many cells in loop matrix row: "%s"' % line)
+				cells += [u''] * (n - len(cells))
+			rows.append(cells)
+		self.resize(len(rows))
+		for column, cells in zip(columns, zip(*rows) if rows else [()] * n):
+			self.set_column(column, [decode_cell(cell) for cell in cells])
+
+	def to_block(self):
+
+		"""
+		returns:
+			desc:	A list with the lines of a matrix block, including the
+					`__matrix__` and `__end__` lines and without indentation,
+					or an empty list if the matrix has no columns.
+			type:	list
+		"""
+
+		if not self._columns:
+			return []
+		lines = [BLOCK_START,
+			u'\t'.join(encode_cell(column) for column in self._columns)]
+		data = [self._data[column] for column in self._columns]
+		for row in range(self._rows):
+			lines.append(u'\t'.join(encode_cell(column[row]) \
+				for column in data))
+		lines.append(BLOCK_END)
+		return lines
@@ -0,0 +1,190 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+
+Reads and writes .osexp archives. An archive is a (typically gzipped) tar
+file that contains the script as `script.opensesame`, and the file pool in the
+`pool` folder. Pool filenames are sanitized to ASCII with `syntax.to_ascii()`.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame import debug
+from libopensesame.exceptions import osexception
+from libopensesame.syntax import syntax
+import io
+import os
+import shutil
+import tarfile
+
+# Files with these extensions are already compressed, and barely become
+# smaller when they are gzipped again.
+COMPRESSED_EXTENSIONS = [u'.ogg', u'.mp3', u'.mp4', u'.m4a', u'.avi',
+	u'.mkv', u'.mov', u'.webm', u'.flv', u'.wmv', u'.mpg', u'.mpeg', u'.png',
+	u'.jpg', u'.jpeg', u'.gif', u'.zip', u'.gz', u'.bz2', u'.xz', u'.7z']
+COMPRESSION_MODES = [u'auto', u'best', u'fast', u'none']
+BUFSIZE = 1048576
+
+def compresslevel(files, compression=u'auto'):
+
+	"""
+	desc:
+		Determines the gzip compression level for an archive.
+
+	arguments:
+		files:
+			desc:	A list of (pool filename, path) tuples.
+			type:	list
+
+	keywords:
+		compression:
+			desc:	'best' for maximum compression, 'fast' for minimal
+					compression, 'none' for an uncompressed tar file, or
+					'auto'. With 'auto', files are stored without compression
+					in a gzip file when most of the data consists of files
+					that are already compressed, and are compressed maximally
+					otherwise. Unlike uncompressed tar files, such gzip files
+					can also be opened by older versions of OpenSesame.
+			type:	[str, unicode]
+
+	returns:
+		desc:	A gzip compression level from 0 (no compression) to 9, or
+				`None` for an uncompressed tar file.
+		type:	[int, NoneType]
+	"""
+
+	if compression == u'none':
+		return None
+	if compression == u'fast':
+		return 1
+	if compression == u'best':
+		return 9
+	compressed = 0
+	total = 0
+	for fname, path in files:
+		size = os.path.getsize(path)
+		total += size
+		if os.path.splitext(fname)[1].lower() in COMPRESSED_EXTENSIONS:
+			compressed += size
+	return 0 if compressed > total / 2 else 9
+
+def write(path, script, files, level=9):
+
+	"""
+	desc:
+		Writes an .osexp archive. Pool files are read directly from their
+		location, and the archive is written to a temporary file in the same
+		folder, which is renamed when it is complete.
+
+	arguments:
+		path:
+			desc:	The path of the archive.
+			type:	unicode
+		script:
+			desc:	The script.
+			type:	unicode
+		files:
+			desc:	A list of (pool filename, path) tuples.
+			type:	list
+
+	keywords:
+		level:
+			desc:	A gzip compression level from 0 (no compression) to 9, or
+					`None` to write an uncompressed tar file.
+			type:	[int, NoneType]
+	"""
+
+	_syntax = syntax(None)
+	tmp_path = u'%s.%d.tmp' % (path, os.getpid())
+	# The archive is opened through a file object, because tarfile doesn't
+	# accept Unicode paths on Python 2.
+	try:
+		with open(tmp_path, u'wb') as fd:
+			if level is not None:
+				tar = tarfile.open(fileobj=fd, mode=u'w:gz',
+					compresslevel=level)
+			else:
+				tar = tarfile.open(fileobj=fd, mode=u'w:')
+			script = safe_encode(script, enc=u'utf-8')
+			info = tarfile.TarInfo(u'script.opensesame')
+			info.size = len(script)
+			info.mtime = os.path.getmtime(tmp_path)
+			tar.addfile(info, io.BytesIO(script))
+			for fname, src in files:
+				info = tar.gettarinfo(src,
+					u'pool/%s' % _syntax.to_ascii(fname))
+				with open(src, u'rb') as src_fd:
+					tar.addfile(info, src_fd)
+			tar.close()
+		if os.path.exists(path):
+			os.remove(path)
+		os.rename(tmp_path, path)
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+def read(path, pool_folder):
+
+	"""
+	desc:
+		Reads an .osexp archive in a single pass, and extracts the pool files
+		directly to the pool folder under their original names.
+
+	arguments:
+		path:
+			desc:	The path of the archive.
+			type:	unicode
+		pool_folder:
+			desc:	The folder to extract the pool files to.
+			type:	unicode
+
+	returns:
+		desc:	The script, or `None` if the file is not an archive (i.e. it
+				is a plain-text script).
+		type:	[unicode, NoneType]
+	"""
+
+	_syntax = syntax(None)
+	script = None
+	with open(path, u'rb') as fd:
+		# The compression (if any) is detected automatically. Members are
+		# read in the order in which they are stored, so the archive is only
+		# decompressed once.
+		try:
+			tar = tarfile.open(fileobj=fd, mode=u'r:*')
+		except tarfile.ReadError:
+			return None
+		for info in tar:
+			if not info.isfile():
+				continue
+			folder, fname = os.path.split(safe_decode(info.name))
+			if info.name == u'script.opensesame':
+				script = safe_decode(tar.extractfile(info).read())
+				continue
+			if folder != u'pool':
+				debug.msg(u'ignoring %s' % info.name, reason=u'warning')
+				continue
+			debug.msg(u"extracting '%s'" % info.name)
+			dst = os.path.join(pool_folder, _syntax.from_ascii(fname))
+			with open(dst, u'wb') as dst_fd:
+				shutil.copyfileobj(tar.extractfile(info), dst_fd, BUFSIZE)
+			os.utime(dst, (info.mtime, info.mtime))
+		tar.close()
+	if script is None:
+		raise osexception(u'%s does not contain script.opensesame' % path)
+	# Normalize newlines, like when the script is read in universal-newline
+	# mode.
+	return script.replace(u'\r\n', u'\n').replace(u'\r', u'\n')
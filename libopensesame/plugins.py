@@ -17,6 +17,7 @@ You should have received a copy of the GNU General Public License
 along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import json
 import os
 import sys
 import yaml
@@ -28,6 +29,11 @@ from libopensesame.py3compat import *
 _plugin_dict = {}
 _folders = {}
 _properties = {}
+_modules = {}
+_classes = {}
+
+# The version of the format of the discovery index
+INDEX_VERSION = 1
 
 # The plug-ins can be either source or bytecode. Usually they will be source,
 # but some distributions (notably the runtime for Android) will automatically
@@ -236,14 +242,50 @@ def list_plugins(filter_disabled=True, _type=u'plugins'):
 	A list of plugins (item_types).
 	"""
 
-	global _plugin_dict
+	discover(_type=_type)
+	return [plugin for plugin in _plugin_dict[_type] \
+		if not (filter_disabled and plugin_disabled(plugin, _type=_type))]
+
+def discover(_type=u'plugins'):
+
+	"""
+	desc: |
+		Discovers all plugins (or extensions), and their folders and
+		properties. This is done only once per process.
+
+		The results are stored in a discovery index in the `.opensesame`
+		folder in the home folder, so that they can be re-used by the next
+		process. The index is only re-used if the plugin folders, the plugins'
+		folders, and their info files have not been modified since, which is
+		checked by comparing modification times. Otherwise, all plugin folders
+		are scanned again.
+
+	keywords:
+		_type:
+			desc:	Indicates whether runtime plugins ('plugins') or GUI
+					extensions ('extensions') should be discovered.
+			type:	[str, unicode]
+	"""
+
+	global _plugin_dict, _folders, _properties
 	if _type in _plugin_dict:
-		return [plugin for plugin in _plugin_dict[_type] \
-			if not (filter_disabled and plugin_disabled(plugin, _type=_type))]
+		return
+	index = _read_index()
+	entry = index.get(_type, None)
+	if entry is not None and _valid_index_entry(entry, _type):
+		for plugin, info in entry[u'plugins']:
+			_folders[plugin] = info[u'folder']
+			# Properties that could not be stored in the index are read from
+			# the info file when they are needed.
+			if info[u'properties'] is not None:
+				_properties[plugin] = info[u'properties']
+		_plugin_dict[_type] = [plugin for plugin, info in entry[u'plugins']]
+		return
+	debug.msg(u'scanning for %s' % _type)
 	plugins = []
 	for folder in plugin_folders(_type=_type):
 		for plugin in os.listdir(folder):
-			if is_plugin(plugin, _type=_type):
+			if _find_plugin_folder(plugin, _type=_type) is not None:
 				_plugin = plugin, plugin_property(plugin, u'priority',
 					_type=_type)
 				if _plugin not in plugins:
@@ -251,8 +293,200 @@ def list_plugins(filter_disabled=True, _type=u'plugins'):
 	# Sort (inversely) by priority
 	plugins.sort(key=lambda p: -p[1])
 	_plugin_dict[_type] = [plugin[0] for plugin in plugins]
-	return [plugin for plugin in _plugin_dict[_type] \
-		if not (filter_disabled and plugin_disabled(plugin, _type=_type))]
+	index[_type] = {
+		u'folders' : _stat(plugin_folders(_type=_type)),
+		u'plugins' : [(plugin, {
+			u'folder' : _folders[plugin],
+			u'properties' : _index_properties(plugin,
+				plugin_properties(plugin, _type=_type)),
+			u'stat' : _stat(_info_files(_folders[plugin]))
+			}) for plugin in _plugin_dict[_type]]
+		}
+	_write_index(index)
+
+def _index_path():
+
+	"""
+	visible: False
+
+	returns:
+		desc:	The path to the discovery index, or `None` if there is no home
+				folder.
+		type:	[unicode, NoneType]
+	"""
+
+	try:
+		return os.path.join(misc.home_folder(), u'.opensesame',
+			u'plugin_index.json')
+	except Exception:
+		return None
+
+def _read_index():
+
+	"""
+	visible: False
+
+	returns:
+		desc:	The discovery index, or an empty dict if no (valid) index is
+				available.
+		type:	dict
+	"""
+
+	path = _index_path()
+	if path is None or not os.path.exists(path):
+		return {}
+	try:
+		with open(path) as fd:
+			index = json.load(fd)
+	except Exception as e:
+		debug.msg(u'failed to read %s: %s' % (path, e), reason=u'warning')
+		return {}
+	if not isinstance(index, dict) or \
+		index.get(u'version', None) != INDEX_VERSION:
+		return {}
+	return index
+
+def _write_index(index):
+
+	"""
+	visible: False
+
+	desc:
+		Writes the discovery index. Errors are ignored, because the index is
+		only used to speed up discovery.
+
+	arguments:
+		index:
+			desc:	The discovery index.
+			type:	dict
+	"""
+
+	path = _index_path()
+	if path is None:
+		return
+	index[u'version'] = INDEX_VERSION
+	# Write to a temporary file first, so that the index doesn't become
+	# corrupt if two processes write it at the same time.
+	tmp_path = u'%s.%d' % (path, os.getpid())
+	try:
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		with open(tmp_path, u'w') as fd:
+			json.dump(index, fd)
+		if os.path.exists(path):
+			os.remove(path)
+		os.rename(tmp_path, path)
+	except Exception as e:
+		debug.msg(u'failed to write %s: %s' % (path, e), reason=u'warning')
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+def _index_properties(plugin, properties):
+
+	"""
+	visible: False
+
+	desc:
+		Checks whether the properties of a plugin can be stored in the
+		discovery index, i.e. whether they are unchanged after being converted
+		to and from json. This is not the case for tuples, for example.
+
+	arguments:
+		plugin:
+			desc:	The plugin name.
+			type:	[str, unicode]
+		properties:
+			desc:	The info dictionary of the plugin.
+			type:	dict
+
+	returns:
+		desc:	The properties, or `None` if they cannot be stored in the
+				index.
+		type:	[dict, NoneType]
+	"""
+
+	try:
+		if json.loads(json.dumps(properties)) == properties:
+			return properties
+	except Exception:
+		pass
+	debug.msg(u'properties of %s cannot be stored in the discovery index' \
+		% plugin)
+	return None
+
+def _valid_index_entry(entry, _type):
+
+	"""
+	visible: False
+
+	arguments:
+		entry:
+			desc:	The discovery index for a plugin type.
+			type:	dict
+		_type:
+			desc:	The plugin type.
+			type:	[str, unicode]
+
+	returns:
+		desc:	True if none of the folders and files in the entry have been
+				modified, False otherwise.
+		type:	bool
+	"""
+
+	try:
+		if _stat(plugin_folders(_type=_type)) != entry[u'folders']:
+			return False
+		for plugin, info in entry[u'plugins']:
+			paths = [path for path, mtime in info[u'stat']]
+			if _stat(paths) != info[u'stat']:
+				return False
+	except Exception:
+		return False
+	return True
+
+def _stat(paths):
+
+	"""
+	visible: False
+
+	arguments:
+		paths:
+			desc:	A list of paths.
+			type:	list
+
+	returns:
+		desc:	A list of [path, modification time] lists. The modification
+				time is `None` for paths that don't exist.
+		type:	list
+	"""
+
+	l = []
+	for path in paths:
+		try:
+			mtime = os.stat(path).st_mtime
+		except OSError:
+			mtime = None
+		l.append([path, mtime])
+	return l
+
+def _info_files(folder):
+
+	"""
+	visible: False
+
+	arguments:
+		folder:
+			desc:	A plugin folder.
+			type:	[str, unicode]
+
+	returns:
+		desc:	A list with the plugin folder and the files from which plugin
+				properties are read.
+		type:	list
+	"""
+
+	return [folder] + [os.path.join(folder, info) \
+		for info in [u'info.yaml', u'info.json', u'info.txt']]
 
 def plugin_folder(plugin, _type=u'plugins'):
 
@@ -266,10 +500,28 @@ def plugin_folder(plugin, _type=u'plugins'):
 	The folder of the plugin
 	"""
 
-	global _folders
-
 	if plugin in _folders:
 		return _folders[plugin]
+	discover(_type=_type)
+	return _folders.get(plugin, None)
+
+def _find_plugin_folder(plugin, _type=u'plugins'):
+
+	"""
+	visible: False
+
+	desc:
+		Finds the folder of a plugin by checking all plugin folders.
+
+	arguments:
+		plugin:		The name of the plugin.
+		_type:		The plugin type (i.e. 'plugins' or 'extensions').
+
+	returns:
+		The folder of the plugin, or `None` if the plugin was not found.
+	"""
+
+	global _folders
 	for folder in plugin_folders(_type=_type):
 		plugin = str(plugin)
 		for tmpl in src_templates + bytecode_templates:
@@ -311,14 +563,28 @@ def plugin_icon_small(plugin, _type=u'plugins'):
 def import_plugin(plugin, _type=u'plugins'):
 
 	"""
-	Imports plugin module
+	Imports plugin module. Each module is imported only once.
 
 	Arguments:
 	plugin -- the name of the plugin
+
+	Returns:
+	The plugin module.
 	"""
 
-	import imp
+	global _modules
 	plugin = str(plugin)
+	if (plugin, _type) not in _modules:
+		_modules[plugin, _type] = _import_plugin(plugin, _type=_type)
+	return _modules[plugin, _type]
+
+def _import_plugin(plugin, _type=u'plugins'):
+
+	"""
+	Imports plugin module without using the cache. See import_plugin().
+	"""
+
+	import imp
 	folder = plugin_folder(plugin, _type=_type)
 	for tmpl in src_templates:
 		if os.path.exists(os.path.join(folder, tmpl % plugin)):
@@ -333,6 +599,18 @@ def import_plugin(plugin, _type=u'plugins'):
 				path = safe_encode(path, enc=misc.filesystem_encoding())
 			return imp.load_compiled(plugin, path)
 
+def add_to_path(folder):
+
+	"""
+	Appends a folder to the Python path, unless it is already in there.
+
+	Arguments:
+	folder -- the folder
+	"""
+
+	if folder not in sys.path:
+		sys.path.append(folder)
+
 def load_plugin(plugin, item_name, experiment, string, prefix=u'',
 	_type=u'plugins'):
 
@@ -353,10 +631,12 @@ def load_plugin(plugin, item_name, experiment, string, prefix=u'',
 	An item (plugin instance).
 	"""
 
-	sys.path.append(plugin_folder(plugin, _type=_type))
-	item_module = import_plugin(plugin, _type=_type)
-	item_class = getattr(item_module, prefix+plugin)
-	item = item_class(item_name, experiment, string)
+	global _classes
+	if (plugin, prefix, _type) not in _classes:
+		add_to_path(plugin_folder(plugin, _type=_type))
+		item_module = import_plugin(plugin, _type=_type)
+		_classes[plugin, prefix, _type] = getattr(item_module, prefix+plugin)
+	item = _classes[plugin, prefix, _type](item_name, experiment, string)
 	return item
 
 def load_extension(ext_name, main_window):
@@ -373,7 +653,7 @@ def load_extension(ext_name, main_window):
 		An extension object.
 	"""
 
-	sys.path.append(plugin_folder(ext_name, _type=u'extensions'))
+	add_to_path(plugin_folder(ext_name, _type=u'extensions'))
 	mod = import_plugin(ext_name, _type=u'extensions')
 	cls = getattr(mod, ext_name)
 	ext = cls(main_window, info=plugin_properties(ext_name,
@@ -20,6 +20,10 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 from libopensesame.py3compat import *
 import libopensesame.python_workspace_api as api
 from libopensesame import debug
+import hashlib
+import marshal
+import os
+import sys
 import types
 import warnings
 
@@ -53,6 +57,8 @@ class python_workspace(object):
 		self.experiment = experiment
 		api.experiment = experiment
 		self._globals = {}
+		self.disk_cache_hits = 0
+		self.disk_cache_misses = 0
 
 	def init_globals(self):
 
@@ -144,6 +150,68 @@ class python_workspace(object):
 			.encode(self.experiment.encoding)
 		return compile(script, u'<string>', u'exec')
 
+	def _compile_cached(self, script):
+
+		"""
+		desc: |
+			Compiles a script into bytecode, like `_compile()`, but stores the
+			bytecode on disk, so that long scripts don't need to be compiled
+			again when the experiment is started again.
+
+			Disk caching is enabled by setting the `python_bytecode_cache`
+			variable to 'yes', and applies only to scripts of at least
+			`python_bytecode_cache_min_size` (default: 10000) characters. The
+			bytecode is stored in a `__pycache__` folder in the experiment
+			folder.
+
+		arguments:
+			script:
+				desc:	A Python script.
+				type:	unicode
+
+		returns:
+			desc:	The compiled script.
+			type:	code
+		"""
+
+		var = self.experiment.var
+		if not isinstance(script, basestring) or \
+			self.experiment.experiment_path is None or \
+			var.get(u'python_bytecode_cache', u'no', [u'yes', u'no']) != \
+			u'yes' or len(script) < var.get(u'python_bytecode_cache_min_size',
+			10000):
+			return self._compile(script)
+		# The bytecode format differs between Python versions
+		key = hashlib.sha1(safe_encode(sys.version + self.experiment.encoding
+			+ script)).hexdigest()
+		path = os.path.join(self.experiment.experiment_path, u'__pycache__',
+			u'opensesame-%s.bytecode' % key)
+		if os.path.exists(path):
+			try:
+				with open(path, u'rb') as fd:
+					bytecode = marshal.load(fd)
+				self.disk_cache_hits += 1
+				return bytecode
+			except Exception as e:
+				debug.msg(u'failed to read %s: %s' % (path, e),
+					reason=u'warning')
+		self.disk_cache_misses += 1
+		bytecode = self._compile(script)
+		# Write to a temporary file first, so that the cache doesn't contain
+		# incomplete files if two experiments are started at the same time.
+		tmp_path = u'%s.%d' % (path, os.getpid())
+		try:
+			if not os.path.isdir(os.path.dirname(path)):
+				os.mkdir(os.path.dirname(path))
+			with open(tmp_path, u'wb') as fd:
+				marshal.dump(bytecode, fd)
+			os.rename(tmp_path, path)
+		except Exception as e:
+			debug.msg(u'failed to write %s: %s' % (path, e), reason=u'warning')
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+		return bytecode
+
 	def _exec(self, bytecode):
 
 		"""
@@ -0,0 +1,167 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame.exceptions import osexception
+import collections
+import threading
+
+class response_buffer(threading.Thread):
+
+	"""
+	desc: |
+		A thread that samples a response device, and stores each sample with
+		a timestamp in a ring buffer. The experiment waits for samples
+		without using the CPU, and samples are timestamped when they arrive,
+		rather than when the experiment gets around to reading them.
+
+		The `sample` function should block until a sample is available, or
+		until a short timeout (so that the thread can be stopped), and return
+		`None` when no sample is available. When the buffer is full, the
+		oldest samples are dropped, and counted in `dropped`.
+
+		A thread cannot be restarted, so a new `response_buffer` should be
+		created each time sampling starts.
+	"""
+
+	def __init__(self, sample, clock, size=4096):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			sample:
+				desc:	A function that returns a sample, or `None`.
+				type:	callable
+			clock:
+				desc:	The clock that is used to timestamp samples.
+				type:	clock
+
+		keywords:
+			size:
+				desc:	The maximum number of samples in the buffer.
+				type:	int
+		"""
+
+		super(response_buffer, self).__init__()
+		self.daemon = True
+		self.sample = sample
+		self.clock = clock
+		self.samples = collections.deque(maxlen=size)
+		self.dropped = 0
+		self.running = False
+		self.error = None
+		self.condition = threading.Condition()
+
+	def start(self):
+
+		"""
+		desc:
+			Starts sampling.
+		"""
+
+		self.running = True
+		super(response_buffer, self).start()
+
+	def stop(self):
+
+		"""
+		desc:
+			Stops sampling, and waits until the thread has finished.
+		"""
+
+		self.running = False
+		if self.is_alive():
+			self.join()
+
+	def run(self):
+
+		"""
+		desc:
+			Runs the sampling loop.
+		"""
+
+		while self.running:
+			try:
+				value = self.sample()
+			except Exception as e:
+				self.error = e
+				break
+			if value is None:
+				continue
+			t = self.clock.time()
+			with self.condition:
+				if len(self.samples) == self.samples.maxlen:
+					self.dropped += 1
+				self.samples.append( (value, t) )
+				self.condition.notify_all()
+		self.running = False
+		# Wake up get(), so that it doesn't wait for samples that never come
+		with self.condition:
+			self.condition.notify_all()
+
+	def flush(self):
+
+		"""
+		desc:
+			Removes all samples from the buffer.
+		"""
+
+		with self.condition:
+			self.samples.clear()
+
+	def get(self, timeout=None):
+
+		"""
+		desc:
+			Gets the oldest sample from the buffer, and waits for a sample if
+			the buffer is empty.
+
+		keywords:
+			timeout:
+				desc:	The maximum time to wait in milliseconds, or `None` to
+						wait indefinitely.
+				type:	[int, float, NoneType]
+
+		returns:
+			desc:	A (value, timestamp) tuple, or `None` if no sample arrived
+					before the timeout.
+			type:	[tuple, NoneType]
+		"""
+
+		if timeout is not None:
+			deadline = self.clock.time() + timeout
+		with self.condition:
+			while not self.samples:
+				if self.error is not None:
+					raise osexception(u'Failed to sample response device',
+						exception=self.error)
+				if not self.running:
+					return None
+				if timeout is None:
+					# Wait in short steps, so that the wait can be
+					# interrupted on Python 2.
+					self.condition.wait(1)
+					continue
+				remaining = deadline - self.clock.time()
+				if remaining <= 0:
+					return None
+				self.condition.wait(remaining/1000.)
+			return self.samples.popleft()
@@ -22,10 +22,17 @@ import re
 import codecs
 import os
 import yaml
+from collections import OrderedDict
 from libopensesame import metadata
 from libopensesame.exceptions import osexception
 from libopensesame.py3compat import *
 
+# The kinds of chunks in a text template
+TEXT_LITERAL = 0
+TEXT_VAR = 1
+TEXT_PYTHON = 2
+TEXT_PYTHON_TEMPLATE = 3
+
 class syntax(object):
 
 	"""
@@ -56,6 +63,17 @@ class syntax(object):
 		# [=10*10]
 		# [\[test\]]
 		self.re_txt_py = re.compile(r'(?<!\\)(\[=.*?[^\\]\])')
+		# A regular expression to match both [variables] and inline Python
+		# statements in templates. Variables can be used inside inline Python
+		# statements, like so: [=[width]*2]. An inline Python statement consists
+		# of escaped brackets, other backslashes, variables, other opening
+		# brackets, and other characters. Only the last character can be a
+		# newline.
+		py_chunk = r'\\[\[\]]|\\(?![\[\]])|\[[_a-zA-Z]+[_a-zA-Z0-9]*\]|' \
+			r'\[(?![_a-zA-Z]+[_a-zA-Z0-9]*\])|[^\\\[\]\n]'
+		self.re_txt_template = re.compile(
+			r'(?<!\\)(?:\[=(?P<py>(?:%s)*(?:%s|\n))\]|' % (py_chunk, py_chunk) +
+			r'\[(?P<var>[_a-zA-Z]+[_a-zA-Z0-9]*)\])')
 		# Catch single equals signs
 		self.re_single_eq = re.compile(r'(?<![=!])(=)(?!=)')
 		# Catch 'never' and 'always'
@@ -268,29 +286,141 @@ class syntax(object):
 		if not isinstance(txt, basestring):
 			return txt
 		txt = safe_decode(txt)
+		# Text without square brackets doesn't contain any references
+		if u'[' not in txt:
+			return self.unescape(txt)
 		if var is None:
 			var = self.experiment.var
 		if round_float:
- 			float_template = u'%%.%sf' % var.round_decimals
-		while True:
-			m = self.re_txt.search(txt)
-			if m is None:
-				break
-			val = var.get(m.group()[1:-1])
-			if round_float and isinstance(val, float):
-				val = float_template % val
+			float_template = u'%%.%sf' % var.round_decimals
+		else:
+			float_template = None
+		template = _text_cache.get(txt)
+		if template is None:
+			template = self.compile_text(txt)
+			_text_cache.add(txt, template)
+		l = []
+		for kind, val in template:
+			if kind == TEXT_LITERAL:
+				l.append(val)
+			elif kind == TEXT_VAR:
+				l.append(self._eval_var(var, val, float_template))
 			else:
-				val = safe_decode(val)
-			txt = txt[:m.start(0)] + val + txt[m.end(0):]
-		# Detect Python inlines [=10*10]
-		while True:
-			m = self.re_txt_py.search(txt)
-			if m is None:
-				break
-			py = self.unescape(m.group()[2:-1])
-			val = self.experiment.python_workspace._eval(py)
-			txt = txt[:m.start(0)] + safe_decode(val) + txt[m.end(0):]
-		return self.unescape(txt)
+				if kind == TEXT_PYTHON_TEMPLATE:
+					val = self.unescape(u''.join([
+						self._eval_var(var, _val, float_template)
+						if _kind == TEXT_VAR else _val for _kind, _val in val]))
+				l.append(safe_decode(
+					self.experiment.python_workspace._eval(val)))
+		return self.unescape(u''.join(l))
+
+	def compile_text(self, txt):
+
+		"""
+		desc:
+			Parses a text string into a template, which can be evaluated
+			quickly by `eval_text()`. Python inlines are compiled to bytecode.
+
+		arguments:
+			txt:
+				desc:	The text to parse.
+				type:	unicode
+
+		returns:
+			desc:	A list of (kind, value) tuples, where kind is one of:
+					TEXT_LITERAL, for which the value is a text chunk;
+					TEXT_VAR, for which the value is a variable name;
+					TEXT_PYTHON, for which the value is bytecode (or Python
+					source if it cannot be compiled, in which case the error is
+					raised during evaluation); TEXT_PYTHON_TEMPLATE, for a
+					Python inline that refers to variables, for which the value
+					is a list of TEXT_LITERAL and TEXT_VAR tuples.
+			type:	list
+		"""
+
+		template = []
+		i = 0
+		for m in self.re_txt_template.finditer(txt):
+			if m.start() > i:
+				template.append( (TEXT_LITERAL, txt[i:m.start()]) )
+			i = m.end()
+			if m.group(u'var') is not None:
+				template.append( (TEXT_VAR, m.group(u'var')) )
+				continue
+			py = m.group(u'py')
+			if self.re_txt.search(py) is not None:
+				template.append( (TEXT_PYTHON_TEMPLATE,
+					self._compile_python_template(py)) )
+				continue
+			py = self.unescape(py)
+			try:
+				py = compile(py, u'<string>', u'eval')
+			except SyntaxError:
+				pass
+			template.append( (TEXT_PYTHON, py) )
+		if i < len(txt):
+			template.append( (TEXT_LITERAL, txt[i:]) )
+		return template
+
+	def _compile_python_template(self, py):
+
+		"""
+		visible: False
+
+		desc:
+			Splits the source of a Python inline into text chunks and variable
+			references.
+
+		arguments:
+			py:
+				desc:	The Python source.
+				type:	unicode
+
+		returns:
+			desc:	A list of TEXT_LITERAL and TEXT_VAR tuples.
+			type:	list
+		"""
+
+		template = []
+		i = 0
+		for m in self.re_txt.finditer(py):
+			template.append( (TEXT_LITERAL, py[i:m.start()]) )
+			template.append( (TEXT_VAR, m.group()[1:-1]) )
+			i = m.end()
+		template.append( (TEXT_LITERAL, py[i:]) )
+		return template
+
+	def _eval_var(self, var, name, float_template=None):
+
+		"""
+		visible: False
+
+		desc:
+			Gets the value of a variable as text.
+
+		arguments:
+			var:
+				desc:	The variable store.
+				type:	var_store
+			name:
+				desc:	The variable name.
+				type:	unicode
+
+		keywords:
+			float_template:
+				desc:	A format string for floats, or `None` to leave floats
+						unrounded.
+				type:	[unicode, NoneType]
+
+		returns:
+			desc:	The value as text.
+			type:	unicode
+		"""
+
+		val = var.get(name)
+		if float_template is not None and isinstance(val, float):
+			return float_template % val
+		return safe_decode(val)
 
 	def quotable_symbol(self, s):
 
@@ -318,7 +448,9 @@ class syntax(object):
 
 		"""
 		desc:
-			Compiles OpenSesame conditional statements.
+			Compiles OpenSesame conditional statements. Compiled statements are
+			cached, so that a statement that is compiled on every trial, such as
+			a run-if statement in a sequence, is translated only once.
 
 			Examples:
 				[width] > 100
@@ -340,70 +472,30 @@ class syntax(object):
 			type:	[str, bytecode]
 		"""
 
+		key = cnd, bytecode
+		if key in _cond_cache:
+			return _cond_cache.get(key)
+		compiled = self._compile_cond(cnd, bytecode=bytecode)
+		_cond_cache.add(key, compiled)
+		return compiled
+
+	def _compile_cond(self, cnd, bytecode=True):
+
+		"""
+		visible: False
+
+		desc:
+			Compiles OpenSesame conditional statements without using the cache.
+			See `compile_cond()`.
+		"""
+
 		# Python conditions `=True` don't have to be evaluated
 		if cnd.startswith(u'='):
 			cnd = cnd[1:]
 		else:
-			# Quote all non-quoted symbols. This can be probably be done through
-			# a clever regular expression, but for now we use a simple loop.
-			while True:
-				in_quote = None
-				in_var = False
-				symbol_start = None
-				for i, ch in enumerate(cnd):
-					# Don't scan within quoted strings
-					if in_quote is None:
-						if ch in u'"\'':
-							in_quote = ch
-							continue
-					elif ch == in_quote:
-							in_quote = None
-							continue
-					if in_quote:
-						continue
-					# Don't scan within variable definitions
-					if ch == u'[':
-						in_var = True
-						continue
-					elif ch == u']':
-						in_var = False
-						continue
-					if in_var:
-						continue
-					# Detect symbols starts, i.e. the first alphanumeric character
-					if ch.isalnum():
-						if symbol_start is None:
-							symbol_start = i
-					# Detect symbol ends, i.e. the first non-alphanumeric character
-					# after an alphanumeric character.
-					elif symbol_start is not None:
-						symbol = cnd[symbol_start:i]
-						symbol_range = symbol_start, i
-						symbol_start = None
-						if not self.quotable_symbol(symbol):
-							continue
-						cnd = cnd[:symbol_range[0]] + u'"' + symbol + u'"' \
-							+ cnd[symbol_range[1]:]
-						break
-				else:
-					# The for-else clause happens when the for loop was not
-					# broken. If no break occurred, then nothing was quoted,
-					# and we don't need to restart the for loop, i.e. we can
-					# break the infinite while. We only need to check that there
-					# was no symbol still being processed, in which case it
-					# needs to be quoted.
-					if symbol_start is not None:
-						symbol = cnd[symbol_start:]
-						if self.quotable_symbol(symbol):
-							cnd = cnd[:symbol_start] + u'"' + symbol + u'"'
-					break
+			cnd = self._quote_symbols(cnd)
 			# Replace [variables] by var.variables
-			while True:
-				m = self.re_txt.search(cnd)
-				if m is None:
-					break
-				cnd = cnd[:m.start()] + u'var.%s' % m.group()[1:-1] \
-					+ cnd[m.end():]
+			cnd = self.re_txt.sub(lambda m: u'var.%s' % m.group()[1:-1], cnd)
 			# Replace single equals signs (=) by doubles (==)
 			cnd = self.re_single_eq.sub(u'==', cnd)
 			# Replace always and never words by True or False
@@ -417,6 +509,68 @@ class syntax(object):
 					u"'%s' is not a valid conditional statement" % cnd)
 		return self.unescape(cnd)
 
+	def _quote_symbols(self, cnd):
+
+		"""
+		visible: False
+
+		desc:
+			Quotes all symbols in a conditional statement that are not quoted
+			already, and that are not variable references, operators, special
+			keywords, or numbers. This is done in a single pass.
+
+		arguments:
+			cnd:
+				desc:	A conditional statement.
+				type:	[str, unicode]
+
+		returns:
+			desc:	The conditional statement with quoted symbols.
+			type:	unicode
+		"""
+
+		l = []
+		copied = 0
+		in_quote = None
+		in_var = False
+		symbol_start = None
+		for i, ch in enumerate(cnd):
+			# Don't scan within quoted strings
+			if in_quote is not None:
+				if ch == in_quote:
+					in_quote = None
+				continue
+			# Don't scan within variable definitions
+			if in_var:
+				if ch == u']':
+					in_var = False
+				continue
+			# Detect symbols starts, i.e. the first alphanumeric character
+			if ch.isalnum():
+				if symbol_start is None:
+					symbol_start = i
+				continue
+			# Detect symbol ends, i.e. the first non-alphanumeric character
+			# after an alphanumeric character.
+			if symbol_start is not None:
+				symbol = cnd[symbol_start:i]
+				if self.quotable_symbol(symbol):
+					l += [cnd[copied:symbol_start], u'"', symbol, u'"']
+					copied = i
+				symbol_start = None
+			if ch in u'"\'':
+				in_quote = ch
+			elif ch == u'[':
+				in_var = True
+		# A symbol may still be open at the end of the statement
+		if symbol_start is not None:
+			symbol = cnd[symbol_start:]
+			if self.quotable_symbol(symbol):
+				l += [cnd[copied:symbol_start], u'"', symbol, u'"']
+				copied = len(cnd)
+		l.append(cnd[copied:])
+		return u''.join(l)
+
 	def unescape(self, s):
 
 		"""
@@ -587,6 +741,90 @@ class syntax(object):
 
 		return re.match(self.re_valid_var_name, s)
 
+class compiled_cache(object):
+
+	"""
+	desc:
+		A cache with a maximum number of entries for compiled statements. When
+		the cache is full, the least recently used entry is removed.
+	"""
+
+	def __init__(self, max_entries):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			max_entries:
+				desc:	The maximum number of entries.
+				type:	int
+		"""
+
+		self.max_entries = max_entries
+		self._entries = OrderedDict()
+
+	def get(self, key):
+
+		"""
+		desc:
+			Gets an entry, and marks it as recently used.
+
+		arguments:
+			key:
+				desc:	A hashable key.
+
+		returns:
+			The entry, or `None` if there is no entry for the key.
+		"""
+
+		if key not in self._entries:
+			return None
+		val = self._entries.pop(key)
+		self._entries[key] = val
+		return val
+
+	def add(self, key, val):
+
+		"""
+		desc:
+			Adds an entry, and removes the least recently used entry if the
+			cache is full.
+
+		arguments:
+			key:
+				desc:	A hashable key.
+			val:
+				desc:	The entry.
+		"""
+
+		self._entries.pop(key, None)
+		self._entries[key] = val
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+
+	def clear(self):
+
+		"""
+		desc:
+			Removes all entries.
+		"""
+
+		self._entries.clear()
+
+	def __contains__(self, key):
+
+		return key in self._entries
+
+	def __len__(self):
+
+		return len(self._entries)
+
+# Compiled conditional statements, by (statement, bytecode) tuples
+_cond_cache = compiled_cache(1000)
+# Text templates, by text
+_text_cache = compiled_cache(1000)
+
 def osreplace(exc):
 
 	"""
@@ -0,0 +1,275 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame.exceptions import osexception
+import mmap
+import struct
+
+# The header consists of a magic string, a sequence number, the size of the
+# records in bytes, the number of records, and a flag that indicates whether
+# some variables did not fit.
+HEADER = struct.Struct(u'<4sQIIB3x')
+MAGIC = b'OSVC'
+NAME = struct.Struct(u'<H')
+INT = struct.Struct(u'<q')
+FLOAT = struct.Struct(u'<d')
+STR = struct.Struct(u'<I')
+
+class var_channel(object):
+
+	"""
+	desc: |
+		A memory-mapped file through which the experiment process shares its
+		variables with the launch process (typically the GUI). The experiment
+		process writes all variables at once, and the launch process reads
+		them without locking and without any communication between the
+		processes.
+
+		The header contains a sequence number, which is odd while the
+		variables are being written. A reader checks that the sequence number
+		is even and unchanged after reading; if not, it tries again.
+
+		Each variable is stored as a record: the length of the name (uint16),
+		the name (utf-8), a type code ('i', 'f', or 's'), and the value as an
+		int64, a float64, or the length (uint32) and contents (utf-8) of a
+		string. Values of other types are stored as strings.
+	"""
+
+	def __init__(self, path, size=None):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			path:
+				desc:	The path to the file.
+				type:	[str, unicode]
+
+		keywords:
+			size:
+				desc:	The size of the file in bytes, to create a new file, or
+						`None` to open an existing file.
+				type:	[int, NoneType]
+		"""
+
+		self.path = path
+		if size is not None:
+			if size <= HEADER.size:
+				raise osexception(u'A var channel should be larger than %d bytes'
+					% HEADER.size)
+			with open(path, u'wb') as fd:
+				fd.write(b'\0' * size)
+		self._fd = open(path, u'r+b')
+		self._mmap = mmap.mmap(self._fd.fileno(), 0)
+		self.size = len(self._mmap)
+		self._seq = 0
+		self._last_read = 0
+		self.truncated = False
+		if size is not None:
+			self._mmap[:HEADER.size] = HEADER.pack(MAGIC, 0, 0, 0, 0)
+
+	def close(self):
+
+		"""
+		desc:
+			Closes the channel. The file is not removed.
+		"""
+
+		if self._mmap is None:
+			return
+		self._mmap.close()
+		self._fd.close()
+		self._mmap = None
+
+	def write_vars(self, var):
+
+		"""
+		desc:
+			Writes all variables of a var_store. Variables that do not fit are
+			left out, and the truncated flag is set.
+
+		arguments:
+			var:
+				desc:	The variables.
+				type:	var_store
+		"""
+
+		names = var.vars()
+		self.write(zip(names, var.snapshot(names, _eval=False)))
+
+	def write(self, items):
+
+		"""
+		desc:
+			Writes variables. Variables that do not fit are left out, and the
+			truncated flag is set.
+
+		arguments:
+			items:
+				desc:	A list of (name, value) tuples.
+				type:	list
+		"""
+
+		records = []
+		nbytes = 0
+		truncated = 0
+		max_bytes = self.size - HEADER.size
+		for name, value in items:
+			record = self._record(name, value)
+			if nbytes + len(record) > max_bytes:
+				truncated = 1
+				continue
+			records.append(record)
+			nbytes += len(record)
+		data = b''.join(records)
+		self._seq += 1
+		self._mmap[:HEADER.size] = HEADER.pack(MAGIC, self._seq, 0, 0, 0)
+		self._mmap[HEADER.size:HEADER.size+nbytes] = data
+		self._seq += 1
+		self._mmap[:HEADER.size] = HEADER.pack(MAGIC, self._seq, nbytes,
+			len(records), truncated)
+
+	def changed(self):
+
+		"""
+		returns:
+			desc:	True if variables have been written since they were last
+					read, False otherwise.
+			type:	bool
+		"""
+
+		magic, seq, nbytes, count, truncated = \
+			HEADER.unpack(self._mmap[:HEADER.size])
+		return seq != self._last_read and seq % 2 == 0
+
+	def read(self, attempts=10):
+
+		"""
+		desc:
+			Reads the variables.
+
+		keywords:
+			attempts:
+				desc:	The number of times to try reading when variables are
+						being written at the same time.
+				type:	int
+
+		returns:
+			desc:	A list of (name, value) tuples, or `None` if no consistent
+					set of variables could be read.
+			type:	[list, NoneType]
+		"""
+
+		for i in range(attempts):
+			magic, seq, nbytes, count, truncated = \
+				HEADER.unpack(self._mmap[:HEADER.size])
+			if magic != MAGIC:
+				raise osexception(u'%s is not a var channel' % self.path)
+			if seq % 2:
+				continue
+			data = self._mmap[HEADER.size:HEADER.size+nbytes]
+			if HEADER.unpack(self._mmap[:HEADER.size])[1] != seq:
+				continue
+			# The header may have been read while it was being written, in
+			# which case the records cannot be parsed, and we try again.
+			try:
+				items = self._parse(data, count)
+			except (struct.error, ValueError):
+				continue
+			self._last_read = seq
+			self.truncated = bool(truncated)
+			return items
+		return None
+
+	def _record(self, name, value):
+
+		"""
+		visible: False
+
+		desc:
+			Encodes a single variable.
+
+		arguments:
+			name:
+				desc:	The variable name.
+				type:	unicode
+			value:	The value.
+
+		returns:
+			desc:	The record.
+			type:	bytes
+		"""
+
+		name = safe_encode(name)
+		if isinstance(value, int) and not isinstance(value, bool) and \
+			-2**63 <= value < 2**63:
+			data = b'i' + INT.pack(value)
+		elif isinstance(value, float):
+			data = b'f' + FLOAT.pack(value)
+		else:
+			value = safe_encode(safe_decode(value, errors=u'replace'),
+				errors=u'replace')
+			data = b's' + STR.pack(len(value)) + value
+		return NAME.pack(len(name)) + name + data
+
+	def _parse(self, data, count):
+
+		"""
+		visible: False
+
+		desc:
+			Decodes records.
+
+		arguments:
+			data:
+				desc:	The records.
+				type:	bytes
+			count:
+				desc:	The number of records.
+				type:	int
+
+		returns:
+			desc:	A list of (name, value) tuples.
+			type:	list
+		"""
+
+		items = []
+		i = 0
+		for j in range(count):
+			length, = NAME.unpack_from(data, i)
+			i += NAME.size
+			name = safe_decode(data[i:i+length])
+			i += length
+			code = data[i:i+1]
+			i += 1
+			if code == b'i':
+				value, = INT.unpack_from(data, i)
+				i += INT.size
+			elif code == b'f':
+				value, = FLOAT.unpack_from(data, i)
+				i += FLOAT.size
+			else:
+				length, = STR.unpack_from(data, i)
+				i += STR.size
+				value = safe_decode(data[i:i+length])
+				i += length
+			items.append( (name, value) )
+		return items
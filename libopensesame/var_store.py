@@ -21,6 +21,9 @@ import warnings
 from libopensesame.py3compat import *
 from libopensesame.exceptions import osexception
 
+# Variable names that have been found to be valid
+_valid_var_names = set()
+
 class var_store(object):
 
 	"""
@@ -84,15 +87,30 @@ class var_store(object):
 		object.__setattr__(self, u'__parent__', parent)
 		object.__setattr__(self, u'__vars__', {})
 		object.__setattr__(self, u'__lock__', None)
+		# Typed values of variables in __vars__, without (__raw__) and with
+		# (__evaluated__) evaluation of variable references. Only str, int,
+		# float, and bool values are cached, and only if they don't contain
+		# variable references, because these may change when other variables
+		# change.
+		object.__setattr__(self, u'__raw__', {})
+		object.__setattr__(self, u'__evaluated__', {})
+		# Increases whenever a variable is set or unset. Variables may be read
+		# from another thread, for example by the heartbeat of the runner, and
+		# this counter is used to avoid that such a thread puts a value in the
+		# cache that has been changed in the meantime.
+		object.__setattr__(self, u'__changes__', 0)
 
 	def check_var_name(self, var):
 
+		is_str = isinstance(var, basestring)
+		if is_str and var in _valid_var_names:
+			return
 		try:
 			self.__item__.experiment
 		except:
 			return
-		if isinstance(var, basestring) and \
-			self.__item__.experiment.syntax.valid_var_name(var):
+		if is_str and self.__item__.experiment.syntax.valid_var_name(var):
+			_valid_var_names.add(var)
 			return
 		raise osexception(u'"%s" is not a valid variable name' % var)
 
@@ -127,6 +145,9 @@ class var_store(object):
 
 		if var in self.__vars__:
 			del self.__vars__[var]
+			object.__setattr__(self, u'__changes__', self.__changes__ + 1)
+			self.__raw__.pop(var, None)
+			self.__evaluated__.pop(var, None)
 		if hasattr(self.__item__, var):
 			warnings.warn(u'var %s is stored as attribute of item %s' \
 				% (var, self.__item__.name))
@@ -153,6 +174,9 @@ class var_store(object):
 		"""
 
 		self.__vars__[var] = val
+		object.__setattr__(self, u'__changes__', self.__changes__ + 1)
+		self.__raw__.pop(var, None)
+		self.__evaluated__.pop(var, None)
 
 	def get(self, var, default=None, _eval=True, valid=None):
 
@@ -187,10 +211,41 @@ class var_store(object):
 		"""
 
 		self.check_var_name(var)
+		cache = self.__evaluated__ if _eval else self.__raw__
+		if valid is None and var in cache:
+			return cache[var]
 		if self.__lock__ == var:
 			raise osexception(
 				u"Recursion detected! Is variable '%s' defined in terms of itself (e.g., 'var = [var]') in item '%s'" \
 				% (var, self.name))
+		if valid is None and var in self.__vars__:
+			changes = self.__changes__
+			val = self.__vars__[var]
+			if isinstance(val, basestring):
+				if _eval and u'[' in val:
+					return self._get(var, default, _eval, valid)
+			elif not isinstance(val, (int, float)):
+				return self._get(var, default, _eval, valid)
+			if _eval:
+				val = self.__item__.syntax.eval_text(val)
+			val = self._typed(val)
+			cache[var] = val
+			# If a variable was set while the value was retrieved, the cached
+			# value may be outdated.
+			if self.__changes__ != changes:
+				cache.pop(var, None)
+			return val
+		return self._get(var, default, _eval, valid)
+
+	def _get(self, var, default, _eval, valid):
+
+		"""
+		visible: False
+
+		desc:
+			Gets an experimental variable without using the cache. See `get()`.
+		"""
+
 		if var in self.__vars__:
 			val = self.__vars__[var]
 		elif hasattr(self.__item__, var):
@@ -212,6 +267,24 @@ class var_store(object):
 			object.__setattr__(self, u'__lock__', var)
 			val = self.__item__.syntax.eval_text(val)
 			object.__setattr__(self, u'__lock__', None)
+		return self._typed(val)
+
+	def _typed(self, val):
+
+		"""
+		visible: False
+
+		desc:
+			Converts a value to the type that is returned by `get()`.
+
+		arguments:
+			val:	A value.
+
+		returns:
+			The value as an int or float if possible, 'yes' or 'no' for bool
+			values, and the value itself otherwise.
+		"""
+
 		if isinstance(val, bool):
 			if val:
 				return u'yes'
@@ -245,6 +318,46 @@ class var_store(object):
 
 		return self.__contains__(var)
 
+	def snapshot(self, names, default=None, _eval=True):
+
+		"""
+		desc:
+			Gets the values of multiple experimental variables at once. This is
+			faster than calling `get()` for each variable separately, and is
+			used by the logger.
+
+		arguments:
+			names:
+				desc:	A list of variables to retrieve.
+				type:	list
+
+		keywords:
+			default:
+				desc:	A default value for variables that don't exist, or
+						`None` for no default value.
+				type:	any
+			_eval:
+				desc:	Determines whether the returned values should be
+						evaluated for variable references.
+				type:	bool
+
+		returns:
+			desc:	A list of values in the same order as `names`.
+			type:	list
+
+		example: |
+			width, height = var.snapshot([u'width', u'height'])
+		"""
+
+		cache = self.__evaluated__ if _eval else self.__raw__
+		values = []
+		for var in names:
+			try:
+				values.append(cache[var])
+			except (KeyError, TypeError):
+				values.append(self.get(var, default=default, _eval=_eval))
+		return values
+
 	def set(self, var, val):
 
 		"""
@@ -408,6 +521,7 @@ class var_store_pickle(var_store):
 			if info[u'alive']:
 				_vars[var] = info[u'value']
 		object.__setattr__(self, u'__vars__', _vars)
+		object.__setattr__(self, u'__changes__', 0)
 
 	def __contains__(self, var):
 
@@ -0,0 +1,279 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame import debug
+from libopensesame.var_store import var_store
+import pickle
+import sys
+import threading
+
+# Values of these types are compared by value. Other values are compared by
+# identity and, if possible, length.
+SCALAR_TYPES = (basestring, bytes, int, float, type(None))
+# Whether values of these types can be pickled depends on their contents, and
+# is therefore checked every time.
+CONTAINER_TYPES = (list, tuple, dict, set, frozenset)
+# Message keys that are used by the protocol
+KEY_VALUES = u'__workspace__'
+KEY_REMOVED = u'__removed__'
+
+class workspace_encoder(object):
+
+	"""
+	desc: |
+		Encodes the Python workspace of the experiment into messages for the
+		launch process (typically the GUI), such that each message contains
+		only the globals that changed since the previous message. The launch
+		process reassembles the workspace with a `workspace_decoder`.
+
+		A global is considered to have changed when its value changed, for
+		int, float, and str values, and for the `var` object; for other
+		values, when it refers to a different object, or when its length
+		changed. Changes to the contents of other objects, such as NumPy
+		arrays, are picked up by a refresh of all globals every
+		`refresh_interval` messages.
+
+		Types for which pickling failed, except for built-in containers, are
+		never pickled again. Values that are larger than `max_value_size`
+		bytes are sent as a short description, and changes that would make a
+		message larger than `max_payload_size` bytes are postponed until the
+		next message.
+	"""
+
+	def __init__(self, max_value_size=100000, max_payload_size=1000000,
+		refresh_interval=10):
+
+		"""
+		desc:
+			Constructor.
+
+		keywords:
+			max_value_size:
+				desc:	The maximum size of a single pickled value in bytes.
+				type:	int
+			max_payload_size:
+				desc:	The maximum size of all pickled values in a message in
+						bytes. At least one changed value is always sent.
+				type:	int
+			refresh_interval:
+				desc:	The number of messages after which all globals are
+						sent again, or 0 to never send all globals again.
+				type:	int
+		"""
+
+		self.max_value_size = max_value_size
+		self.max_payload_size = max_payload_size
+		self.refresh_interval = refresh_interval
+		self._stamps = {}
+		self._sent = set()
+		self._unpicklable_types = set()
+		self._count = 0
+		self._lock = threading.Lock()
+
+	def encode(self, workspace, full=False, exclude=(), **extra):
+
+		"""
+		desc:
+			Creates a message with the globals that changed since the previous
+			message.
+
+		arguments:
+			workspace:
+				desc:	The globals of the Python workspace.
+				type:	dict
+
+		keywords:
+			full:
+				desc:	Indicates whether all globals should be sent,
+						regardless of whether they changed and of
+						`max_payload_size`. This is used when the launch
+						process needs an up-to-date workspace, such as when
+						the experiment is paused or finished.
+				type:	bool
+			exclude:
+				desc:	Globals that should not be sent. They are not reported
+						as removed either, so that the launch process can keep
+						a version that it obtained in another way.
+				type:	[tuple, list, set]
+
+		keyword-dict:
+			extra:	Extra items to add to the message, such as `__heartbeat__`.
+
+		returns:
+			desc:	A message dict, in which KEY_VALUES is a dict with
+					pickled values, and KEY_REMOVED is a list of globals that
+					no longer exist (or can no longer be pickled).
+			type:	dict
+		"""
+
+		with self._lock:
+			refresh = full or (self.refresh_interval > 0 and \
+				self._count % self.refresh_interval == 0)
+			self._count += 1
+			values = {}
+			removed = []
+			payload_size = 0
+			workspace = workspace.copy()
+			for key, value in workspace.items():
+				if key in exclude:
+					continue
+				stamp = self._stamp(value)
+				if not refresh and key in self._stamps and \
+					self._stamps[key] == stamp:
+					continue
+				pickled = self._pickle(value)
+				if pickled is None:
+					self._stamps[key] = stamp
+					if key in self._sent:
+						self._sent.remove(key)
+						removed.append(key)
+					continue
+				# Postpone changes if the payload becomes too large. The stamp
+				# is not updated, so that the value is sent with the next
+				# message.
+				if not full and values and payload_size + len(pickled) > \
+					self.max_payload_size:
+					continue
+				payload_size += len(pickled)
+				values[key] = pickled
+				self._stamps[key] = stamp
+				self._sent.add(key)
+			for key in list(self._stamps.keys()):
+				if key in workspace or key in exclude:
+					continue
+				del self._stamps[key]
+				if key in self._sent:
+					self._sent.remove(key)
+					removed.append(key)
+		msg = {KEY_VALUES : values, KEY_REMOVED : removed}
+		msg.update(extra)
+		return msg
+
+	def _stamp(self, value):
+
+		"""
+		visible: False
+
+		desc:
+			Gets a stamp that changes when the value changes.
+
+		arguments:
+			value:	A value.
+
+		returns:
+			A stamp, which can be compared to other stamps with `==`.
+		"""
+
+		if isinstance(value, SCALAR_TYPES):
+			return type(value), value
+		# The var object changes all the time, but its length usually doesn't.
+		# Its change counter is used rather than its values, because values
+		# such as NumPy arrays cannot be compared with `==`.
+		if isinstance(value, var_store):
+			return type(value), id(value), value.__changes__
+		try:
+			length = len(value)
+		except Exception:
+			length = None
+		return type(value), id(value), length
+
+	def _pickle(self, value):
+
+		"""
+		visible: False
+
+		desc:
+			Pickles a value, or a description of the value if it is too large.
+
+		arguments:
+			value:	A value.
+
+		returns:
+			desc:	A pickled value, or `None` if the value cannot be pickled.
+			type:	[bytes, NoneType]
+		"""
+
+		if type(value) in self._unpicklable_types:
+			return None
+		# The size of objects that own their data, such as NumPy arrays, can
+		# be determined without pickling them.
+		try:
+			size = sys.getsizeof(value)
+		except Exception:
+			size = 0
+		if size <= self.max_value_size:
+			try:
+				pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+			except Exception:
+				if not isinstance(value, CONTAINER_TYPES):
+					self._unpicklable_types.add(type(value))
+				return None
+			if len(pickled) <= self.max_value_size:
+				return pickled
+			size = len(pickled)
+		return pickle.dumps(u'<%s of %d bytes>' % (type(value).__name__,
+			size), pickle.HIGHEST_PROTOCOL)
+
+class workspace_decoder(object):
+
+	"""
+	desc:
+		Reassembles the Python workspace of the experiment from messages that
+		were created by a `workspace_encoder`.
+	"""
+
+	def __init__(self):
+
+		"""
+		desc:
+			Constructor.
+		"""
+
+		self.workspace = {}
+
+	def decode(self, msg):
+
+		"""
+		desc:
+			Applies the changes from a message to the workspace.
+
+		arguments:
+			msg:
+				desc:	A message dict.
+				type:	dict
+
+		returns:
+			desc:	The reassembled workspace. Extra items in the message,
+					such as `__heartbeat__`, are not included.
+			type:	dict
+		"""
+
+		for key in msg.get(KEY_REMOVED, []):
+			self.workspace.pop(key, None)
+		for key, pickled in msg.get(KEY_VALUES, {}).items():
+			# Values that cannot be unpickled, for example because they are
+			# instances of classes that are not available in this process,
+			# are skipped.
+			try:
+				self.workspace[key] = pickle.loads(pickled)
+			except Exception as e:
+				debug.msg(u'failed to unpickle %s: %s' % (key, e))
+				self.workspace.pop(key, None)
+		return self.workspace
@@ -20,6 +20,7 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 from libopensesame.py3compat import *
 import copy
 from libopensesame.loop import loop as loop_runtime
+from libopensesame.loop_matrix import loop_matrix
 from libqtopensesame.items.qtitem import qtitem
 from libqtopensesame.items.qtstructure_item import qtstructure_item
 from libqtopensesame.misc import _
@@ -102,10 +103,9 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 			default = u""
 		if not self.name_valid_and_unique(var_name):
 			return
-		for i in range(self.var.cycles):
-			if i not in self.matrix:
-				self.matrix[i] = {}
-			self.matrix[i][var_name] = default
+		if len(self.matrix) < self.var.cycles:
+			self.matrix.resize(self.var.cycles)
+		self.matrix.add_column(var_name, default)
 		self.refresh_loop_table()
 		self.apply_edit_changes()
 
@@ -118,11 +118,7 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 		A list of variable names
 		"""
 
-		var_list = []
-		for i in self.matrix:
-			for var in self.matrix[i]:
-				if var not in var_list:
-					var_list.append(var)
+		var_list = self.matrix.columns
 		if len(var_list) == 0:
 			return None
 		return var_list
@@ -142,11 +138,7 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 		# Only accept renames from this item
 		if item != self.name:
 			return
-		for i in self.matrix:
-			if from_name in self.matrix[i]:
-				val = self.matrix[i][from_name]
-				del self.matrix[i][from_name]
-				self.matrix[i][to_name] = val
+		self.matrix.rename_column(from_name, to_name)
 
 	def name_valid_and_unique(self, name):
 
@@ -213,10 +205,7 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 			var_list)
 		if ok:
 			var = str(var)
-			for i in self.matrix:
-				if var in self.matrix[i]:
-					del self.matrix[i][var]
-
+			self.matrix.remove_column(var)
 			self.refresh_loop_table()
 			self.apply_edit_changes()
 
@@ -229,14 +218,7 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 		The number of variables in the loop.
 		"""
 
-		l = []
-		c = 0
-		for cycle in self.matrix:
-			for var in self.matrix[cycle]:
-				if var not in l:
-					l.append(var)
-					c += 1
-		return c
+		return len(self.matrix.columns)
 
 	def cycle_count(self):
 
@@ -282,9 +264,8 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 				self.loop_widget.ui.spin_cycles.setValue(self.var.cycles)
 				self.lock_cycles = False
 				return
-		for i in self.matrix.keys():
-			if i >= cycles:
-				del self.matrix[i]
+		if len(self.matrix) > cycles:
+			self.matrix.resize(cycles)
 		self.lock_cycles = False
 		self.var.set(u"cycles", cycles)
 
@@ -311,6 +292,14 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 
 		if self.var.item not in self.experiment.items:
 			s = _(u"<font color='red'>No item to run specified</font>")
+		elif self.var.source == u'file':
+			# The number of rows is only known when the file is read, which
+			# may take a while for large files.
+			s = _(u"<b>%s</b> will be called <b>%s</b> x for each row in <b>%s</b> in <b>%s</b> order") \
+				% (self.var.item, self.var.repeat, self.var.source_file,
+				self.var.order)
+			if self.var.source_file not in self.experiment.pool:
+				s += _(u" <font color='red'><b>(file not in file pool)</b></font>")
 		else:
 			cc = self.call_count()
 			if self.var.order == u'sequential' and self.var.offset != u'yes':
@@ -352,14 +341,6 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 			return
 		self.loop_table.setEnabled(True)
 
-		# Don't clear and resize the table if this is not necessary, because
-		# this makes the cursor jump
-		if self.loop_table.rowCount() != self.var.cycles or \
-			self.loop_table.columnCount() != self.cyclevar_count():
-			self.loop_table.clear()
-			self.loop_table.setRowCount(self.var.cycles)
-			self.loop_table.setColumnCount(self.cyclevar_count())
-
 		# Determine the order in which the columns are displayed
 		column_order = []
 		if self.cyclevar_list() is not None:
@@ -371,24 +352,15 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 				if var not in column_order:
 					column_order.append(var)
 
-		# Create the column headers
-		i = 0
-		for var in column_order:
-			self.loop_table.setHorizontalHeaderItem(i, \
-				QtGui.QTableWidgetItem(var))
-			i += 1
-
-		# Fill the table
-		for cycle in self.matrix:
-			for var in self.matrix[cycle]:
-				col = column_order.index(var)
-				self.loop_table.set_text(cycle, col,
-					safe_decode(self.matrix[cycle][var]))
-
 		# Store the number of cycles and the column order
 		self.var.cycles = max(self.var.cycles, self.cycle_count())
 		self.var.column_order = u";".join(column_order)
 
+		# The table reads the cells from the matrix when they are shown, so
+		# only the table dimensions need to be updated. Undefined cells are
+		# shown as empty.
+		self.loop_table.refresh(column_order, self.var.cycles)
+
 		if lock:
 			self.lock = False
 
@@ -406,9 +378,7 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 
 		if len(d) == 0:
 			for var, val in l:
-				if self.i not in self.matrix:
-					self.matrix[self.i] = {}
-				self.matrix[self.i][var] = val
+				self.matrix.set(self.i, var, val)
 			self.i += 1
 			return
 		var = list(d.keys())[0]
@@ -452,7 +422,7 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 
 			# Then fill the loop table
 			self.i = 0
-			self.matrix = {}
+			self.matrix = loop_matrix()
 			self.wizard_process(var_dict)
 			self.set_cycle_count(len(self.matrix))
 			self.lock = True
@@ -477,6 +447,9 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 		self.auto_add_widget(self.loop_widget.ui.checkbox_offset, u"offset")
 		self.auto_add_widget(self.loop_widget.ui.combobox_item, u"item")
 		self.auto_add_widget(self.loop_widget.ui.edit_break_if, u"break_if")
+		self.auto_add_widget(self.loop_widget.ui.combobox_source, u"source")
+		self.auto_add_widget(self.loop_widget.ui.edit_source_file,
+			u"source_file")
 		self.loop_widget.ui.edit_break_if.setValidator(cond_validator(self,
 			default=u'never'))
 		self.loop_widget.ui.button_add_cyclevar.clicked.connect(
@@ -514,6 +487,13 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 			self.loop_widget.ui.spin_skip.setDisabled(False)
 			self.loop_widget.ui.checkbox_offset.setDisabled(
 				type(self.var.skip) != int or self.var.skip < 1)
+		# When the cycles are read from a file, the loop table is not used
+		from_file = self.var.source == u'file'
+		self.loop_widget.ui.edit_source_file.setEnabled(from_file)
+		self.loop_widget.ui.label_source_file.setEnabled(from_file)
+		for widget in [self.loop_table, self.loop_widget.ui.spin_cycles,
+			self.loop_widget.ui.widget_buttons]:
+			widget.setDisabled(from_file)
 		break_if = self.var.get(u'break_if', _eval=False)
 		if break_if not in [u'never', u''] or \
 			self.var.get(u'offset', _eval=False) == u'yes' or \
@@ -553,34 +533,18 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 		if not ok:
 			return
 
-		self.matrix = {}
-		_row = 0
-		for row in range(self.loop_table.rowCount()):
-			self.matrix[_row] = {}
-			weight = 1
-			for col in range(self.loop_table.columnCount()):
-				var = str(self.loop_table.horizontalHeaderItem(col).text())
-				cell = self.loop_table.item(row, col)
-				if cell is None:
-					val = u''
-				else:
-					val = str(self.loop_table.item(row, col).text())
-				if var == weight_var:
-					try:
-						weight = int(val)
-					except:
-						weight = 1
-				self.matrix[_row][var] = val
-			if weight <= 0:
-				del self.matrix[_row]
-			else:
-				_row += 1
-				while weight > 1:
-					weight -= 1
-					if _row-1 in self.matrix:
-						self.matrix[_row] = self.matrix[_row-1]
-					_row += 1
-		self.set_cycle_count(_row)
+		# All cycles in the table are weighted, including empty ones
+		self.matrix.fill(self.cycle_count())
+		rows = []
+		for row, val in enumerate(self.matrix.column(weight_var)):
+			try:
+				weight = int(val)
+			except:
+				weight = 1
+			# Rows with a weight of zero or less are removed
+			rows += [row] * weight
+		self.matrix = self.matrix.take(rows)
+		self.set_cycle_count(len(rows))
 		self.update()
 
 	def apply_edit_changes(self, dummy=None):
@@ -600,24 +564,11 @@ class loop(qtstructure_item, qtitem, loop_runtime):
 		else:
 			rebuild_item_tree = False
 		self.var.break_if = self.loop_widget.ui.edit_break_if.text()
-		# Walk through the loop table and apply all changes
-		self.matrix = {}
-		for row in range(self.loop_table.rowCount()):
-			self.matrix[row] = {}
-			for col in range(self.loop_table.columnCount()):
-				var = str(self.loop_table.horizontalHeaderItem(col).text())
-				cell = self.loop_table.item(row, col)
-				if cell is None:
-					val = u''
-				else:
-					val = str(self.loop_table.item(row, col).text())
-				val = self.syntax.sanitize(val)
-				self.matrix[row][var] = val
-		row = self.loop_table.currentRow()
-		column = self.loop_table.currentColumn()
+		# The loop table writes changes to the matrix directly. Like in the
+		# table, cells that are not defined become empty.
+		self.matrix.fill(self.loop_table.model().rowCount())
 		self.set_cycle_count(self.loop_widget.ui.spin_cycles.value())
 		self.refresh_loop_table()
-		self.loop_table.setCurrentCell(row, column)
 		super(loop, self).apply_edit_changes()
 		if rebuild_item_tree:
 			self.experiment.build_item_tree()
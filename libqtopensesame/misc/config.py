@@ -100,6 +100,7 @@ class config(object):
 		u"toolbar_size" : 32,
 		u"toolbar_text" : False,
 		u"runner" : u"multiprocess",
+		u"runner_var_channel_size" : 1048576,
 		u"opensesamerun_exec" : u"",
 		u"start_drag_delay" : 300,
 		u"pos" : QtCore.QPoint(200, 200),
@@ -73,7 +73,7 @@ class ExperimentProcess(multiprocessing.Process):
 
 	"""Creates a new process to run an experiment in."""
 
-	def __init__(self, exp, output):
+	def __init__(self, exp, output, var_channel=None):
 
 		"""
 		Constructor.
@@ -82,6 +82,10 @@ class ExperimentProcess(multiprocessing.Process):
 		exp		--	An instance of libopensesame.experiment.experiment
 		output	--	A reference to the queue object created in and used to
 					communicate with the main process.
+
+		Keyword arguments:
+		var_channel	--	The path to a var channel, or None to send variables
+						through the output queue.
 		"""
 
 		multiprocessing.Process.__init__(self)
@@ -96,6 +100,7 @@ class ExperimentProcess(multiprocessing.Process):
 		self.fullscreen = exp.var.fullscreen == u'yes'
 		self.logfile = exp.logfile
 		self.auto_response = exp.auto_response
+		self.var_channel = var_channel
 
 	def run(self):
 
@@ -136,6 +141,8 @@ class ExperimentProcess(multiprocessing.Process):
 		# Run the experiment and catch any Exceptions.
 		e_run = None
 		exp.set_output_channel(self.output)
+		if self.var_channel is not None:
+			exp.set_var_channel(self.var_channel)
 		try:
 			exp.run()
 			print('done!')
@@ -144,7 +151,9 @@ class ExperimentProcess(multiprocessing.Process):
 				e_run = osexception(u'Unexpected error', exception=e)
 			else:
 				e_run = e
-		exp.transmit_workspace()
+		# Send the complete workspace, so that the final state is also
+		# available for objects that were changed in place.
+		exp.transmit_workspace(full=True)
 		# End the experiment and catch any Exceptions. These exceptions are just
 		# printed out and not explicitly passed on to the user, because they are
 		# less important than the run-related exceptions.
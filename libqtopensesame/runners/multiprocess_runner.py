@@ -21,9 +21,13 @@ from libopensesame.py3compat import *
 import os
 import sys
 import time
+import tempfile
 from libqtopensesame.runners import base_runner
+from libqtopensesame.misc.config import cfg
 from PyQt4 import QtGui
 from libopensesame.exceptions import osexception
+from libopensesame.var_store import var_store_pickle
+import libopensesame.var_channel
 
 class multiprocess_runner(base_runner):
 
@@ -45,8 +49,10 @@ class multiprocess_runner(base_runner):
 
 		from libqtopensesame.misc import process, _
 		from libopensesame import misc
+		from libopensesame.workspace_delta import workspace_decoder
 
-		self._workspace_globals = {}
+		decoder = workspace_decoder()
+		self._workspace_globals = decoder.workspace
 		if os.name == u'nt' or (sys.platform == u'darwin' \
 			and not hasattr(sys,"frozen")):
 			# Under Windows and OSX, the multiprocess runner assumes that there
@@ -65,61 +71,113 @@ class multiprocess_runner(base_runner):
 					return osexception(
 						_(u'Failed to copy `opensesame` to `opensesame.py`, which is required for the multiprocess runner. Please copy the file manually, or select a different runner under Preferences.'), exception=e)
 		self.channel = multiprocessing.Queue()
+		# The experimental variables are shared through a memory-mapped file,
+		# so that the experiment process doesn't need to send them through the
+		# queue.
+		if cfg.runner_var_channel_size > 0:
+			fd, path = tempfile.mkstemp(prefix=u'opensesame-', suffix=u'.vars')
+			os.close(fd)
+			var_channel = libopensesame.var_channel.var_channel(path,
+				size=cfg.runner_var_channel_size)
+		else:
+			var_channel = None
 		try:
 			self.exp_process = process.ExperimentProcess(self.experiment,
-				self.channel)
+				self.channel, var_channel=None if var_channel is None \
+				else var_channel.path)
 		except Exception as e:
+			if var_channel is not None:
+				var_channel.close()
+				os.remove(var_channel.path)
 			return osexception(_(u'Failed to initialize experiment process'),
 				exception=e)
 		# Start process!
 		self.exp_process.start()
-		# Wait for experiment to finish.
-		# Listen for incoming messages in the meantime.
-		while self.exp_process.is_alive() or not self.channel.empty():
-			# We need to process the GUI. To make the GUI feel more responsive
-			# during pauses, we refresh the GUI more often when paused.
-			QtGui.QApplication.processEvents()
-			if self.paused:
-				for i in range(25):
-					time.sleep(.01)
-					QtGui.QApplication.processEvents()
-			# Make sure None is not printed. Ugly hack for a bug in the Queue
-			# class?
-			self.console.suppress_stdout()
-			# Wait for messages. Will throw Exception if no message is received
-			# before timeout.
-			try:
-				msg = self.channel.get(True, 0.05)
-			except:
-				continue
-			# Restore connection to stdout
-			self.console.capture_stdout()
-			if isinstance(msg, basestring):
-				sys.stdout.write(safe_decode(msg, errors=u'ignore'))
-				continue
-			# Capture exceptions
-			if isinstance(msg, Exception):
-				return msg
-			# The workspace globals are sent as a dict. A special __pause__ key
-			# indicates whether the experiment should be paused or resumed.
-			if isinstance(msg, dict):
-				self._workspace_globals = msg
-				if u'__heartbeat__' in msg:
-					self.console.set_workspace_globals(msg)
-					self.main_window.extension_manager.fire(u'heartbeat')
-				elif u'__pause__' in msg:
-					if msg[u'__pause__']:
-						self.pause()
-					else:
-						self.resume()
-				continue
-			# Anything that is not a string, not an Exception, and not None is
-			# unexpected
-			return osexception(
-				u"Illegal message type received from child process: %s (%s)" \
-				% (msg, type(msg)))
-		# Return None if experiment finished without problems
-		return None
+		try:
+			# Wait for experiment to finish.
+			# Listen for incoming messages in the meantime.
+			while self.exp_process.is_alive() or not self.channel.empty():
+				# We need to process the GUI. To make the GUI feel more
+				# responsive during pauses, we refresh the GUI more often when
+				# paused.
+				QtGui.QApplication.processEvents()
+				if self.paused:
+					for i in range(25):
+						time.sleep(.01)
+						QtGui.QApplication.processEvents()
+				if var_channel is not None and var_channel.changed():
+					self._read_var_channel(var_channel)
+				# Make sure None is not printed. Ugly hack for a bug in the
+				# Queue class?
+				self.console.suppress_stdout()
+				# Wait for messages. Will throw Exception if no message is
+				# received before timeout.
+				try:
+					msg = self.channel.get(True, 0.05)
+				except:
+					continue
+				# Restore connection to stdout
+				self.console.capture_stdout()
+				if isinstance(msg, basestring):
+					sys.stdout.write(safe_decode(msg, errors=u'ignore'))
+					continue
+				# Capture exceptions
+				if isinstance(msg, Exception):
+					return msg
+				# The changes to the workspace globals are sent as a dict. A
+				# special __pause__ key indicates whether the experiment should
+				# be paused or resumed.
+				if isinstance(msg, dict):
+					self._workspace_globals = decoder.decode(msg)
+					if u'__heartbeat__' in msg:
+						self.console.set_workspace_globals(
+							self._workspace_globals)
+						self.main_window.extension_manager.fire(u'heartbeat')
+					elif u'__pause__' in msg:
+						if msg[u'__pause__']:
+							self.pause()
+						else:
+							self.resume()
+					continue
+				# Anything that is not a string, not an Exception, and not None
+				# is unexpected
+				return osexception(
+					u"Illegal message type received from child process: %s (%s)" \
+					% (msg, type(msg)))
+			# Return None if experiment finished without problems
+			return None
+		finally:
+			if var_channel is not None:
+				var_channel.close()
+				os.remove(var_channel.path)
+
+	def _read_var_channel(self, var_channel):
+
+		"""
+		desc:
+			Reads the experimental variables from the var channel, and makes
+			them available as the `var` object of the workspace globals.
+
+		arguments:
+			var_channel:
+				desc:	The var channel.
+				type:	var_channel
+		"""
+
+		items = var_channel.read()
+		if items is None:
+			return
+		# The sources of the variables are taken from the GUI experiment,
+		# which is the same as the running experiment.
+		inspect = self.experiment.var.inspect()
+		for var, value in items:
+			if var not in inspect:
+				inspect[var] = {u'source' : [u'?']}
+			inspect[var][u'value'] = value
+			inspect[var][u'alive'] = True
+		self._workspace_globals[u'var'] = var_store_pickle(inspect)
+		self.console.set_workspace_globals(self._workspace_globals)
+		self.main_window.extension_manager.fire(u'heartbeat')
 
 	def workspace_globals(self):
 
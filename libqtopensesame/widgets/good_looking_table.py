@@ -21,34 +21,13 @@ from libopensesame.py3compat import *
 
 from PyQt4 import QtCore, QtGui
 
-class good_looking_table(QtGui.QTableWidget):
+class table_actions(object):
 
-	"""Extended the QTableWidget for copy-pasting, etc."""
-
-	def __init__(self, rows, columns=None, icons={}, parent=None):
-
-		"""
-		Constructor.
-
-		Arguments:
-		rows	--	The number of rows.
-
-		Keywords arguments:
-		columns	--	The number of columns or None for no columns. (default=None)
-		icons	--	A dictionary with QIcons for the various actions.
-					(default={})
-		parent	--	The parent QWidget. (default=None)
-		"""
-
-		self.clipboard = QtGui.QApplication.clipboard
-		self.build_context_menu(icons)
-		# If there is only one parameter, this is the parent
-		if columns is None:
-			QtGui.QTableWidget.__init__(self, rows)
-		else:
-			QtGui.QTableWidget.__init__(self, rows, columns, parent)
-		self.setGridStyle(QtCore.Qt.DotLine)
-		self.setAlternatingRowColors(True)
+	"""
+	A mixin for table widgets and views that provides a context menu and
+	keyboard shortcuts for cutting, copying, pasting, and clearing cells. The
+	class that uses it implements copy(), paste(), and _clear().
+	"""
 
 	def build_context_menu(self, icons={}):
 
@@ -114,7 +93,7 @@ class good_looking_table(QtGui.QTableWidget):
 			self.paste()
 			e.ignore()
 		else:
-			QtGui.QTableWidget.keyPressEvent(self, e)
+			super(table_actions, self).keyPressEvent(e)
 
 	def cut(self):
 
@@ -123,6 +102,35 @@ class good_looking_table(QtGui.QTableWidget):
 		self.copy()
 		self._clear()
 
+class good_looking_table(table_actions, QtGui.QTableWidget):
+
+	"""Extended the QTableWidget for copy-pasting, etc."""
+
+	def __init__(self, rows, columns=None, icons={}, parent=None):
+
+		"""
+		Constructor.
+
+		Arguments:
+		rows	--	The number of rows.
+
+		Keywords arguments:
+		columns	--	The number of columns or None for no columns. (default=None)
+		icons	--	A dictionary with QIcons for the various actions.
+					(default={})
+		parent	--	The parent QWidget. (default=None)
+		"""
+
+		self.clipboard = QtGui.QApplication.clipboard
+		self.build_context_menu(icons)
+		# If there is only one parameter, this is the parent
+		if columns is None:
+			QtGui.QTableWidget.__init__(self, rows)
+		else:
+			QtGui.QTableWidget.__init__(self, rows, columns, parent)
+		self.setGridStyle(QtCore.Qt.DotLine)
+		self.setAlternatingRowColors(True)
+
 	def copy(self):
 
 		"""Copies data from the table into the clipboard."""
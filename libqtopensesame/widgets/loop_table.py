@@ -22,13 +22,18 @@ from libopensesame.py3compat import *
 __author__ = "Sebastiaan Mathot"
 __license__ = "GPLv3"
 
-from libqtopensesame.widgets import good_looking_table
+from libqtopensesame.widgets.good_looking_table import table_actions
+from libqtopensesame.widgets.loop_table_model import loop_table_model
 from libqtopensesame.misc import _
 from PyQt4 import QtCore, QtGui
 
-class loop_table(good_looking_table.good_looking_table):
+class loop_table(table_actions, QtGui.QTableView):
 
-	"""The looptable extends the QtTableWidget to allow copying and pasting"""
+	"""
+	The loop table shows the matrix of a loop item through a
+	loop_table_model, so that only the visible cells are rendered. Like the
+	good_looking_table, it supports cutting, copying, and pasting.
+	"""
 
 	def __init__(self, loop, rows, columns, parent=None):
 
@@ -58,28 +63,71 @@ class loop_table(good_looking_table.good_looking_table):
 			self.loop.user_hint_widget.add(
 				_(u'Invalid or variably defined number of cycles: %s' % rows))
 			self.loop.user_hint_widget.refresh()
-			rows = 0
-		good_looking_table.good_looking_table.__init__(self,
-			rows, columns, icons, parent)
-		self.cellChanged.connect(self.apply_changes)
+		self.clipboard = QtGui.QApplication.clipboard
+		self.build_context_menu(icons)
+		QtGui.QTableView.__init__(self, parent)
+		self.setModel(loop_table_model(loop, self))
+		self.setGridStyle(QtCore.Qt.DotLine)
+		self.setAlternatingRowColors(True)
+		self.model().cells_changed.connect(self.apply_changes)
+
+	def selected_range(self):
+
+		"""
+		desc:
+			Gets the first selected range.
+
+		returns:
+			desc:	A (top, left, bottom, right) tuple, or None if nothing is
+					selected.
+			type:	[tuple, NoneType]
+		"""
+
+		selection = self.selectionModel().selection()
+		if selection.isEmpty():
+			return None
+		_range = selection[0]
+		return _range.top(), _range.left(), _range.bottom(), _range.right()
+
+	def copy(self):
+
+		"""Copies data from the table into the clipboard."""
+
+		_range = self.selected_range()
+		if _range is None:
+			return
+		top, left, bottom, right = _range
+		model = self.model()
+		self.clipboard().setText(u'\n'.join(
+			u'\t'.join(model.text(row, column) \
+			for column in range(left, right+1)) \
+			for row in range(top, bottom+1)))
 
 	def paste(self):
 
-		"""Paste data from the clipboard into the table"""
+		"""
+		Pastes data from the clipboard into the table, starting at the current
+		cell. All cells are set at once, directly in the loop matrix.
+		"""
 
-		self.lock = True
-		good_looking_table.good_looking_table.paste(self)
-		self.lock = False
-		self.apply_changes()
+		index = self.currentIndex()
+		if not index.isValid():
+			return
+		selection = str(self.clipboard().mimeData().text())
+		# Spreadsheets end the copied text with a newline
+		if selection.endswith(u'\n'):
+			selection = selection[:-1]
+		self.model().set_cells(index.row(), index.column(),
+			[row.split(u'\t') for row in selection.split(u'\n')])
 
 	def _clear(self):
 
-		"""Clear the table"""
+		"""Clears the selected cells."""
 
-		self.lock = True
-		good_looking_table.good_looking_table._clear(self)
-		self.lock = False
-		self.apply_changes()
+		_range = self.selected_range()
+		if _range is None:
+			return
+		self.model().clear_cells(*_range)
 
 	def apply_changes(self):
 
@@ -92,25 +140,25 @@ class loop_table(good_looking_table.good_looking_table):
 			return
 		self.loop.apply_edit_changes()
 
-	def set_text(self, cycle, col, text):
+	def refresh(self, columns, rows):
 
 		"""
 		desc:
-			Sets text in the loop table in a way that doesn't trigger a
-			cellChanged signal.
+			Updates the table after the matrix has changed, and restores the
+			current cell if the table was reset.
 
 		arguments:
-			cycle:
-				desc:	The row.
-				type:	int
-			col:
-				desc:	The column.
+			columns:
+				desc:	The variable names in the order in which they are
+						shown.
+				type:	list
+			rows:
+				desc:	The number of rows.
 				type:	int
-			text:
-				desc:	The text.
-				type:	unicode
 		"""
 
-		self.blockSignals(True)
-		self.setItem(cycle, col, QtGui.QTableWidgetItem(text))
-		self.blockSignals(False)
+		index = self.currentIndex()
+		self.model().refresh(columns, rows)
+		if index.isValid() and not self.currentIndex().isValid():
+			self.setCurrentIndex(self.model().index(index.row(),
+				index.column()))
@@ -0,0 +1,248 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from PyQt4 import QtCore
+
+class loop_table_model(QtCore.QAbstractTableModel):
+
+	"""
+	desc:
+		A table model on top of the matrix of a loop item. Cells are read from
+		and written to the matrix directly, so that a view only needs to
+		render the cells that are visible, and no copy of the table is kept.
+	"""
+
+	# Emitted once after the user has changed one or more cells
+	cells_changed = QtCore.pyqtSignal()
+
+	def __init__(self, loop, parent=None):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			loop:
+				desc:	The loop item.
+				type:	loop
+
+		keywords:
+			parent:
+				desc:	The parent QObject.
+				type:	[QObject, NoneType]
+		"""
+
+		super(loop_table_model, self).__init__(parent)
+		self.loop = loop
+		self.columns = []
+		self.rows = 0
+
+	def refresh(self, columns, rows):
+
+		"""
+		desc:
+			Updates the model after the matrix has changed. The model is only
+			reset when the columns or the number of rows have changed, so that
+			the selection and the scroll position are otherwise preserved.
+
+		arguments:
+			columns:
+				desc:	The variable names in the order in which they are
+						shown.
+				type:	list
+			rows:
+				desc:	The number of rows.
+				type:	int
+		"""
+
+		if columns != self.columns or rows != self.rows:
+			self.beginResetModel()
+			self.columns = list(columns)
+			self.rows = rows
+			self.endResetModel()
+		elif rows > 0 and len(columns) > 0:
+			self.dataChanged.emit(self.index(0, 0),
+				self.index(rows-1, len(columns)-1))
+
+	def rowCount(self, parent=QtCore.QModelIndex()):
+
+		"""
+		visible: False
+
+		desc:
+			See QAbstractTableModel.
+		"""
+
+		if parent.isValid():
+			return 0
+		return self.rows
+
+	def columnCount(self, parent=QtCore.QModelIndex()):
+
+		"""
+		visible: False
+
+		desc:
+			See QAbstractTableModel.
+		"""
+
+		if parent.isValid():
+			return 0
+		return len(self.columns)
+
+	def data(self, index, role=QtCore.Qt.DisplayRole):
+
+		"""
+		visible: False
+
+		desc:
+			See QAbstractTableModel.
+		"""
+
+		if not index.isValid() or role not in (QtCore.Qt.DisplayRole,
+			QtCore.Qt.EditRole):
+			return None
+		return self.text(index.row(), index.column())
+
+	def setData(self, index, value, role=QtCore.Qt.EditRole):
+
+		"""
+		visible: False
+
+		desc:
+			See QAbstractTableModel.
+		"""
+
+		if not index.isValid() or role != QtCore.Qt.EditRole:
+			return False
+		self.set_cells(index.row(), index.column(), [[str(value)]])
+		return True
+
+	def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+
+		"""
+		visible: False
+
+		desc:
+			See QAbstractTableModel.
+		"""
+
+		if role != QtCore.Qt.DisplayRole:
+			return None
+		if orientation == QtCore.Qt.Horizontal:
+			if section < len(self.columns):
+				return self.columns[section]
+			return None
+		return section + 1
+
+	def flags(self, index):
+
+		"""
+		visible: False
+
+		desc:
+			See QAbstractTableModel.
+		"""
+
+		return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | \
+			QtCore.Qt.ItemIsEditable
+
+	def text(self, row, column):
+
+		"""
+		arguments:
+			row:
+				desc:	The row.
+				type:	int
+			column:
+				desc:	The column.
+				type:	int
+
+		returns:
+			desc:	The text of a cell, which is an empty string for undefined
+					cells.
+			type:	unicode
+		"""
+
+		val = self.loop.matrix.get(row, self.columns[column])
+		if val is None:
+			return u''
+		return safe_decode(val)
+
+	def set_cells(self, row, column, rows):
+
+		"""
+		desc:
+			Sets a block of cells at once, and emits `cells_changed` once.
+			Values are sanitized, and values that fall outside of the table are
+			ignored.
+
+		arguments:
+			row:
+				desc:	The top row of the block.
+				type:	int
+			column:
+				desc:	The left column of the block.
+				type:	int
+			rows:
+				desc:	A list of rows, each of which is a list of values.
+				type:	list
+		"""
+
+		if row < 0 or column < 0:
+			return
+		rows = rows[:max(0, self.rows - row)]
+		right = column - 1
+		for i, cells in enumerate(rows):
+			cells = cells[:max(0, len(self.columns) - column)]
+			for j, val in enumerate(cells):
+				self.loop.matrix.set(row+i, self.columns[column+j],
+					self.loop.syntax.sanitize(val))
+			right = max(right, column + len(cells) - 1)
+		if not rows or right < column:
+			return
+		self.dataChanged.emit(self.index(row, column),
+			self.index(row + len(rows) - 1, right))
+		self.cells_changed.emit()
+
+	def clear_cells(self, top, left, bottom, right):
+
+		"""
+		desc:
+			Sets a block of cells to empty strings, and emits `cells_changed`
+			once.
+
+		arguments:
+			top:
+				desc:	The top row.
+				type:	int
+			left:
+				desc:	The left column.
+				type:	int
+			bottom:
+				desc:	The bottom row.
+				type:	int
+			right:
+				desc:	The right column.
+				type:	int
+		"""
+
+		self.set_cells(top, left, [[u''] * (right - left + 1)] * \
+			(bottom - top + 1))
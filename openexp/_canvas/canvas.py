@@ -18,14 +18,24 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from libopensesame.py3compat import *
+import os
+import stat
 import warnings
 import random
 import pygame
 import math
+try:
+	import numpy
+	from pygame import surfarray
+except ImportError:
+	numpy = None
 from libopensesame.exceptions import osexception
 from libopensesame.html import html
+from libopensesame import debug, misc
 from openexp.backend import backend, configurable
 from openexp.color import color
+from openexp._canvas.stimulus_cache import canvas_cache, image_cache, \
+	surface_size
 
 class canvas(backend):
 
@@ -853,6 +863,144 @@ class canvas(backend):
 
 		raise NotImplementedError()
 
+	@classmethod
+	def cached_image(cls, fname, scale=None):
+
+		"""
+		visible: False
+
+		desc:
+			Gets a decoded image from the image cache, and decodes the image if
+			it is not in the cache yet. Images are identified by their path,
+			modification time, and scaling factor, so that an image is decoded
+			again when the file changes.
+
+		arguments:
+			fname:
+				desc:	The filename of the image.
+				type:	[str, unicode]
+
+		keywords:
+			scale:
+				desc:	The scaling factor of the image, or `None` for the
+						original size.
+				type:	[float, int, NoneType]
+
+		returns:
+			desc:	An image in a backend-specific format, as returned by
+					[_decode_image].
+		"""
+
+		_fname = safe_str(fname, enc=misc.filesystem_encoding())
+		try:
+			st = os.stat(_fname)
+		except OSError:
+			st = None
+		if st is None or not stat.S_ISREG(st.st_mode):
+			raise osexception(u'"%s" does not exist' % fname)
+		key = cls.__name__, os.path.abspath(_fname), st.st_mtime, scale
+		return image_cache.generate(key,
+			lambda: cls._decode_image(fname, scale), sizeof=cls._image_size)
+
+	@classmethod
+	def preload_images(cls, paths):
+
+		"""
+		visible: False
+
+		desc:
+			Decodes images into the image cache, so that they are not decoded
+			while the experiment is running. Files that are not images are
+			skipped, and preloading stops when the image cache is full.
+
+		arguments:
+			paths:
+				desc:	A list of paths.
+				type:	list
+
+		returns:
+			desc:	The number of preloaded images.
+			type:	int
+		"""
+
+		n = 0
+		for path in paths:
+			if os.path.splitext(path)[1].lower() not in image_extensions:
+				continue
+			evictions = image_cache.evictions
+			try:
+				cls.cached_image(path)
+			except osexception as e:
+				debug.msg(u'failed to preload %s: %s' % (path, e),
+					reason=u'warning')
+				continue
+			if image_cache.evictions > evictions:
+				break
+			n += 1
+		return n
+
+	@staticmethod
+	def _decode_image(fname, scale=None):
+
+		"""
+		visible: False
+
+		desc:
+			Decodes an image from file. This function should be re-implemented
+			by back-ends that do not use pygame surfaces.
+
+		arguments:
+			fname:
+				desc:	The filename of the image.
+				type:	[str, unicode]
+
+		keywords:
+			scale:
+				desc:	The scaling factor of the image, or `None` for the
+						original size.
+				type:	[float, int, NoneType]
+
+		returns:
+			desc:	A pygame surface.
+		"""
+
+		_fname = safe_str(fname, enc=misc.filesystem_encoding())
+		try:
+			surface = pygame.image.load(_fname)
+		except pygame.error:
+			raise osexception(
+				u"'%s' is not a supported image format" % fname)
+		if scale is None:
+			return surface
+		size = int(surface.get_width()*scale), int(surface.get_height()*scale)
+		try:
+			return pygame.transform.smoothscale(surface, size)
+		except:
+			debug.msg(u"smooth scaling failed for '%s'" % fname,
+				reason=u"warning")
+			return pygame.transform.scale(surface, size)
+
+	@staticmethod
+	def _image_size(image):
+
+		"""
+		visible: False
+
+		desc:
+			Determines the memory footprint of a decoded image. This function
+			should be re-implemented along with [_decode_image].
+
+		arguments:
+			image:
+				desc:	A decoded image, as returned by [_decode_image].
+
+		returns:
+			desc:	The size in bytes.
+			type:	int
+		"""
+
+		return surface_size(image)
+
 	def gabor(self, x, y, orient, freq, env=u'gaussian', size=96, stdev=12,
 		phase=0, col1=u'white', col2=u'black', bgmode=u'avg'):
 
@@ -1091,6 +1239,10 @@ class canvas(backend):
 			p6[1]+_head_width * head_width * math.sin(angle+math.pi/2))
 		return [p1, p2, p3, p4, p5, p6, p7]
 
+# The file extensions of images that can be preloaded
+image_extensions = [u'.png', u'.jpg', u'.jpeg', u'.bmp', u'.gif', u'.tga',
+	u'.tif', u'.tiff']
+
 # Translation mapping from envelope names
 env_synonyms = {}
 env_synonyms[u"c"] = u"c"
@@ -1117,8 +1269,6 @@ env_synonyms[u"lin"] = u"l"
 env_synonyms[u"ln"] = u"l"
 env_synonyms[u"l"] = u"l"
 
-canvas_cache = {}
-
 def _color(col):
 
 	"""
@@ -1149,11 +1299,193 @@ def _gabor(orient, freq, env=u"gaussian", size=96, stdev=12, phase=0,
 	# Generating a Gabor patch takes quite some time, so keep
 	# a cache of previously generated Gabor patches to speed up
 	# the process.
-	global canvas_cache
-	key = u"gabor_%s_%s_%s_%s_%s_%s_%s_%s_%s" % (orient, freq, env, size,
-		stdev, phase, col1, col2, bgmode)
-	if key in canvas_cache:
-		return canvas_cache[key]
+	key = u"gabor", orient, freq, env, size, stdev, phase, safe_decode(col1), \
+		safe_decode(col2), bgmode
+	if numpy is None:
+		fnc = _gabor_pixelwise
+	else:
+		fnc = _gabor_numpy
+	return canvas_cache.generate(key, lambda: fnc(orient, freq, env, size,
+		stdev, phase, col1, col2, bgmode))
+
+def _noise_patch(env=u"gaussian", size=96, stdev=12, col1=u"white",
+	col2=u"black", bgmode=u"avg"):
+
+	"""
+	desc:
+		Returns a pygame surface containing a noise patch. For arguments,
+		see [canvas.noise_patch].
+	"""
+
+	env = _match_env(env)
+	if numpy is None:
+		fnc = _noise_patch_pixelwise
+	else:
+		fnc = _noise_patch_numpy
+	# Noise is random, so a noise patch is generated anew on every call,
+	# rather than retrieved from the cache. It therefore doesn't need a key.
+	return canvas_cache.generate(None, lambda: fnc(env, size, stdev, col1,
+		col2, bgmode), deterministic=False)
+
+def _gabor_numpy(orient, freq, env, size, stdev, phase, col1, col2, bgmode):
+
+	"""
+	desc:
+		Generates a Gabor patch with whole-array NumPy operations. The
+		envelope should already have been translated with [_match_env]. For
+		other arguments, see [canvas.gabor].
+
+	returns:
+		A pygame surface.
+	"""
+
+	dx, dy = _offsets(size)
+	# Get the coordinates (ux, uy) in the unrotated Gabor patch
+	orient = math.radians(orient)
+	t = numpy.arctan2(dy, dx) + orient
+	r = numpy.hypot(dx, dy)
+	ux = r * numpy.cos(t)
+	uy = r * numpy.sin(t)
+	# Get the amplitude without the envelope (0 .. 1)
+	amp = 0.5 + 0.5 * numpy.cos(2.0 * math.pi * (ux * freq + phase))
+	f = _envelope(env, ux, uy, r, size, stdev)
+	return _blend(amp, f, col1, col2, bgmode)
+
+def _noise_patch_numpy(env, size, stdev, col1, col2, bgmode):
+
+	"""
+	desc:
+		Generates a noise patch with whole-array NumPy operations. The
+		envelope should already have been translated with [_match_env]. For
+		other arguments, see [canvas.noise_patch].
+
+	returns:
+		A pygame surface.
+	"""
+
+	dx, dy = _offsets(size)
+	r = numpy.hypot(dx, dy)
+	# Get the amplitude without the envelope (0 .. 1). The generator is seeded
+	# from the random module, so that random.seed() makes noise patches
+	# reproducible, just like it does for pixelwise noise patches.
+	amp = numpy.random.RandomState(random.getrandbits(32)).random_sample(
+		(size, size))
+	f = _envelope(env, dx, dy, r, size, stdev)
+	return _blend(amp, f, col1, col2, bgmode)
+
+def _offsets(size):
+
+	"""
+	desc:
+		Gives the horizontal and vertical distance of each pixel from the
+		center of a square patch. Arrays are indexed as [x, y], which is the
+		order that is used by `pygame.surfarray`.
+
+	arguments:
+		size:
+			desc:	The size of the patch in pixels.
+			type:	int
+
+	returns:
+		desc:	A (dx, dy) tuple of float arrays with shape (size, size).
+		type:	tuple
+	"""
+
+	d = numpy.arange(size, dtype=float) - 0.5 * size
+	return numpy.meshgrid(d, d, indexing=u'ij')
+
+def _envelope(env, ux, uy, r, size, stdev):
+
+	"""
+	desc:
+		Calculates the envelope (0 .. 1) for each pixel of a patch.
+
+	arguments:
+		env:
+			desc:	A standard envelope name, as returned by [_match_env].
+			type:	unicode
+		ux:
+			desc:	The horizontal coordinates in the unrotated patch.
+			type:	ndarray
+		uy:
+			desc:	The vertical coordinates in the unrotated patch.
+			type:	ndarray
+		r:
+			desc:	The distance from the center.
+			type:	ndarray
+		size:
+			desc:	The size of the patch in pixels.
+			type:	int
+		stdev:
+			desc:	The standard deviation of a gaussian envelope.
+			type:	[int, float]
+
+	returns:
+		desc:	A float array with the same shape as `r`.
+		type:	ndarray
+	"""
+
+	if env == u"g":
+		return numpy.exp(-0.5 * (ux / stdev) ** 2 - 0.5 * (uy / stdev) ** 2)
+	if env == u"l":
+		return numpy.maximum(0, (0.5 * size - r) / (0.5 * size))
+	if env == u"c":
+		return numpy.where(r > 0.5 * size, 0.0, 1.0)
+	return numpy.ones(r.shape)
+
+def _blend(amp, f, col1, col2, bgmode):
+
+	"""
+	desc:
+		Applies an envelope to an amplitude array, blends the two colors
+		accordingly, and copies the result onto a new surface.
+
+	arguments:
+		amp:
+			desc:	The amplitude (0 .. 1) without envelope.
+			type:	ndarray
+		f:
+			desc:	The envelope (0 .. 1).
+			type:	ndarray
+		col1:
+			desc:	A color specification for the peaks.
+		col2:
+			desc:	A color specification for the troughs.
+		bgmode:
+			desc:	"%arg_bgmode"
+			type:	[str, unicode]
+
+	returns:
+		A pygame surface.
+	"""
+
+	if bgmode == u"avg":
+		amp = amp * f + 0.5 * (1.0 - f)
+	else:
+		amp = amp * f
+	col1 = _color(col1)
+	col2 = _color(col2)
+	rgb = numpy.empty(amp.shape + (3,), dtype=numpy.uint8)
+	for i, (c1, c2) in enumerate(zip(
+		(col1.r, col1.g, col1.b), (col2.r, col2.g, col2.b))):
+		rgb[..., i] = numpy.round(c1 * amp + c2 * (1.0 - amp))
+	surface = pygame.Surface(amp.shape)
+	surfarray.blit_array(surface, rgb)
+	return surface
+
+def _gabor_pixelwise(orient, freq, env, size, stdev, phase, col1, col2,
+	bgmode):
+
+	"""
+	desc:
+		Generates a Gabor patch pixel by pixel. This is slow, and is only used
+		when NumPy is not available. The envelope should already have been
+		translated with [_match_env]. For other arguments, see [canvas.gabor].
+
+	returns:
+		A pygame surface.
+	"""
+
 	# Create a surface
 	surface = pygame.Surface( (size, size) )
 	try:
@@ -1203,27 +1535,22 @@ def _gabor(orient, freq, env=u"gaussian", size=96, stdev=12, phase=0,
 				surface.set_at((rx, ry), (round(r), round(g), round(b)))
 			else:
 				px[rx][ry] = round(r), round(g), round(b)
-	canvas_cache[key] = surface
 	del px
 	return surface
 
-def _noise_patch(env=u"gaussian", size=96, stdev=12, col1=u"white",
-	col2=u"black", bgmode=u"avg"):
+def _noise_patch_pixelwise(env, size, stdev, col1, col2, bgmode):
 
 	"""
 	desc:
-		Returns a pygame surface containing a noise patch. For arguments,
-		see [canvas.noise_patch].
+		Generates a noise patch pixel by pixel. This is slow, and is only used
+		when NumPy is not available. The envelope should already have been
+		translated with [_match_env]. For other arguments, see
+		[canvas.noise_patch].
+
+	returns:
+		A pygame surface.
 	"""
 
-	env = _match_env(env)
-	# Generating a noise patch takes quite some time, so keep
-	# a cache of previously generated noise patches to speed up
-	# the process.
-	global canvas_cache
-	key = u"noise_%s_%s_%s_%s_%s_%s" % (env, size, stdev, col1, col2, bgmode)
-	if key in canvas_cache:
-		return canvas_cache[key]
 	# Create a surface
 	surface = pygame.Surface( (size, size) )
 	try:
@@ -1266,7 +1593,6 @@ def _noise_patch(env=u"gaussian", size=96, stdev=12, col1=u"white",
 				surface.set_at((rx, ry), (round(r), round(g), round(b)))
 			else:
 				px[rx][ry] = round(r), round(g), round(b)
-	canvas_cache[key] = surface
 	del px
 	return surface
 
@@ -0,0 +1,257 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+import array
+import io
+import math
+
+NAN = float(u'nan')
+# The fields that are recorded for each show
+FIELDS = [u'show_start', u'onset', u'show_duration', u'prepare_duration',
+	u'prepare_to_show', u'inter_flip_interval', u'dropped_frames']
+NFIELDS = len(FIELDS)
+
+class frame_timing(object):
+
+	"""
+	desc: |
+		Records the timing of each `canvas.show()` in a ring buffer, which is
+		allocated once, so that recording takes very little time.
+
+		For each show, the following is recorded (in milliseconds):
+
+		- show_start: the time at which `show()` was called, which is the
+		  requested onset.
+		- onset: the timestamp that `show()` returned, which is the achieved
+		  onset.
+		- show_duration: the onset minus the requested onset.
+		- prepare_duration: the duration of the last `prepare()` of the
+		  canvas, or NaN if the canvas was not prepared explicitly.
+		- prepare_to_show: the time between the end of the last `prepare()`
+		  and the requested onset. Calls to `prepare()` from within
+		  `show()`, which some backends make, are not timed.
+		- inter_flip_interval: the time between the previous onset and this
+		  onset.
+		- dropped_frames: an estimate of the number of refresh cycles that
+		  were missed. If the show was requested within one refresh period
+		  after the previous onset, the canvas should have appeared on the
+		  next refresh, and the estimate is the number of refresh periods in
+		  inter_flip_interval minus one. Otherwise, the estimate is the
+		  number of refresh periods in show_duration minus one, because a
+		  show normally takes at most one refresh period. In both cases, the
+		  number of refresh periods is rounded, so that jitter of less than
+		  half a refresh period is not counted as a dropped frame.
+
+		Enable frame timing by setting the `canvas_timing` variable to 'yes'.
+		The refresh rate is taken from the `canvas_timing_refresh_rate`
+		variable (default: 60 Hz), and the number of shows that fits in the
+		buffer from `canvas_timing_size` (default: 10000). When the display
+		is closed, the recorded shows are written to `[logfile]-timing.csv`,
+		and a summary to `[logfile]-timing.txt`.
+	"""
+
+	def __init__(self, refresh_rate=60, size=10000):
+
+		"""
+		desc:
+			Constructor.
+
+		keywords:
+			refresh_rate:
+				desc:	The refresh rate of the display in Hz.
+				type:	[int, float]
+			size:
+				desc:	The maximum number of shows that is kept.
+				type:	int
+		"""
+
+		self.refresh_period = 1000. / refresh_rate
+		self.size = size
+		self.count = 0
+		self._buffer = array.array('d', [NAN]) * (size * NFIELDS)
+		self._last_onset = NAN
+
+	def record(self, show_start, onset, prepare_end=None,
+		prepare_duration=None):
+
+		"""
+		desc:
+			Records a single show. When the buffer is full, the oldest show is
+			overwritten.
+
+		arguments:
+			show_start:
+				desc:	The time at which show() was called.
+				type:	float
+			onset:
+				desc:	The timestamp that show() returned.
+				type:	float
+
+		keywords:
+			prepare_end:
+				desc:	The time at which the last prepare() ended, or `None`.
+				type:	[float, NoneType]
+			prepare_duration:
+				desc:	The duration of the last prepare(), or `None`.
+				type:	[float, NoneType]
+		"""
+
+		show_duration = onset - show_start
+		i = (self.count % self.size) * NFIELDS
+		b = self._buffer
+		b[i] = show_start
+		b[i+1] = onset
+		b[i+2] = show_duration
+		if prepare_end is None:
+			b[i+3] = NAN
+			b[i+4] = NAN
+		else:
+			b[i+3] = prepare_duration
+			b[i+4] = show_start - prepare_end
+		inter_flip_interval = onset - self._last_onset
+		b[i+5] = inter_flip_interval
+		if show_start - self._last_onset < self.refresh_period:
+			periods = inter_flip_interval / self.refresh_period
+		else:
+			periods = show_duration / self.refresh_period
+		b[i+6] = max(0, int(round(periods)) - 1)
+		self._last_onset = onset
+		self.count += 1
+
+	def rows(self):
+
+		"""
+		returns:
+			desc:	A list of recorded shows, from old to new, where each show
+					is a list of values in the order of FIELDS.
+			type:	list
+		"""
+
+		n = min(self.count, self.size)
+		first = self.count - n
+		rows = []
+		for j in range(first, self.count):
+			i = (j % self.size) * NFIELDS
+			rows.append(self._buffer[i:i+NFIELDS].tolist())
+		return rows
+
+	def summary(self):
+
+		"""
+		returns:
+			desc:	A plain-text summary with the mean, 95th percentile, and
+					maximum of each duration, and the number of dropped
+					frames.
+			type:	unicode
+		"""
+
+		rows = self.rows()
+		lines = [u'%d shows recorded (%d in total)' % (len(rows), self.count),
+			u'refresh period: %.2f ms' % self.refresh_period, u'',
+			u'%-20s %8s %10s %10s %10s' % (u'', u'n', u'mean', u'p95',
+			u'max')]
+		for i, field in enumerate(FIELDS[2:6]):
+			l = sorted(row[i+2] for row in rows if not math.isnan(row[i+2]))
+			if not l:
+				lines.append(u'%-20s %8d' % (field, 0))
+				continue
+			lines.append(u'%-20s %8d %10.2f %10.2f %10.2f' % (field, len(l),
+				sum(l) / len(l), l[int(math.ceil(.95 * len(l))) - 1], l[-1]))
+		dropped = [row[6] for row in rows]
+		lines += [u'',
+			u'shows with dropped frames: %d' % sum(1 for d in dropped if d),
+			u'estimated dropped frames: %d' % sum(dropped),
+			u'', u'All times are in milliseconds.']
+		return u'\n'.join(lines) + u'\n'
+
+	def write(self, csv_path, summary_path):
+
+		"""
+		desc:
+			Writes the recorded shows and the summary.
+
+		arguments:
+			csv_path:
+				desc:	The path of the csv file with all recorded shows.
+				type:	unicode
+			summary_path:
+				desc:	The path of the summary.
+				type:	unicode
+		"""
+
+		with io.open(csv_path, u'w', encoding=u'utf-8') as fd:
+			fd.write(u','.join(FIELDS) + u'\n')
+			for row in self.rows():
+				fd.write(u','.join(u'NA' if math.isnan(val) else u'%.3f' % val \
+					for val in row) + u'\n')
+		with io.open(summary_path, u'w', encoding=u'utf-8') as fd:
+			fd.write(self.summary())
+
+def timed_class(cls):
+
+	"""
+	desc:
+		Creates a subclass of a canvas backend class, which records the timing
+		of `prepare()` and `show()` in the experiment's `frame_timing`.
+
+	arguments:
+		cls:
+			desc:	A canvas backend class.
+			type:	type
+
+	returns:
+		desc:	A subclass.
+		type:	type
+	"""
+
+	class timed(cls):
+
+		_showing = False
+
+		def prepare(self):
+
+			# Backends that prepare the canvas as part of show() would
+			# otherwise overwrite the timing of the explicit prepare().
+			if self._showing:
+				return cls.prepare(self)
+			t0 = self.experiment.clock.time()
+			ret = cls.prepare(self)
+			self._prepare_end = self.experiment.clock.time()
+			self._prepare_duration = self._prepare_end - t0
+			return ret
+
+		def show(self):
+
+			show_start = self.experiment.clock.time()
+			self._showing = True
+			try:
+				onset = cls.show(self)
+			finally:
+				self._showing = False
+			timing = self.experiment.frame_timing
+			if timing is not None:
+				timing.record(show_start, onset,
+					getattr(self, u'_prepare_end', None),
+					getattr(self, u'_prepare_duration', None))
+			return onset
+
+	timed.__name__ = cls.__name__
+	timed.__doc__ = cls.__doc__
+	return timed
@@ -179,25 +179,7 @@ class legacy(canvas.canvas, legacy_coordinates):
 
 	def image(self, fname, center=True, x=None, y=None, scale=None):
 
-		_fname = safe_str(fname, enc=misc.filesystem_encoding())
-		if not os.path.isfile(_fname):
-			raise osexception(u'"%s" does not exist' % fname)
-		try:
-			surface = pygame.image.load(_fname)
-		except pygame.error:
-			raise osexception(
-				u"'%s' is not a supported image format" % fname)
-		if scale is not None:
-			try:
-				surface = pygame.transform.smoothscale(surface,
-					(int(surface.get_width()*scale),
-					int(surface.get_height()*scale)))
-			except:
-				debug.msg(u"smooth scaling failed for '%s'" % fname,
-					reason=u"warning")
-				surface = pygame.transform.scale(surface,
-					(int(surface.get_width()*scale),
-					int(surface.get_height()*scale)))
+		surface = self.cached_image(fname, scale)
 		size = surface.get_size()
 		x, y = self.to_xy(x, y)
 		if center:
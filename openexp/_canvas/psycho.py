@@ -55,10 +55,19 @@ _registered_fonts = []
 class psycho(canvas.canvas, psycho_coordinates):
 
 	"""
-	desc:
+	desc: |
 		This is a canvas backend built on top of PsychoPy (with Pyglet).
 		For function specifications and docstrings, see
 		`openexp._canvas.canvas`.
+
+		By default, `show()` draws all stimuli one by one right before the
+		flip, so that showing a canvas takes longer as it contains more
+		elements. When the `psychopy_flatten` variable is 'yes', `prepare()`
+		renders all stimuli into a single image, and `show()` draws only this
+		image. When stimuli are added after `prepare()`, the stimuli are drawn
+		one by one again. The time spent flattening is stored as
+		`prepare_time`, and the time spent drawing before the last flip as
+		`draw_time` (both in milliseconds).
 	"""
 
 	# The settings variable is used by the GUI to provide a list of back-end
@@ -88,7 +97,12 @@ class psycho(canvas.canvas, psycho_coordinates):
 			u'name' : u'Suppress warnings',
 			u'description' : u'Set PsychoPy logging level to "critical"',
 			u'default' : u'yes',
-			}
+			},
+		u'psychopy_flatten' : {
+			u'name' : u'Flatten canvas',
+			u'description' : u'Render prepared canvases into a single image',
+			u'default' : u'no',
+			},
 		}
 
 	def __init__(self, experiment, auto_prepare=True, **style_args):
@@ -97,6 +111,12 @@ class psycho(canvas.canvas, psycho_coordinates):
 			**style_args)
 		psycho_coordinates.__init__(self)
 		self.min_penwidth = 1
+		self.flatten = experiment.var.get(u'psychopy_flatten',
+			self.settings[u'psychopy_flatten'][u'default'],
+			[u'yes', u'no']) == u'yes'
+		self.prepare_time = None
+		self.draw_time = None
+		self._flat = None
 		# We need to map the simple font names used by OpenSesame onto the
 		# actual names of the fonts.
 		self.font_map = {
@@ -124,19 +144,56 @@ class psycho(canvas.canvas, psycho_coordinates):
 	def copy(self, canvas):
 
 		self.stim_list = canvas.stim_list + []
+		self._flat = None
 		self.set_config(**canvas.get_config())
 
+	def prepare(self):
+
+		if not self.flatten or len(self.stim_list) < 2 or self._flattened():
+			return
+		t0 = self.experiment.clock.time()
+		# BufferImageStim draws the stimuli onto the back buffer, and captures
+		# the full window.
+		self._flat = visual.BufferImageStim(self.experiment.window,
+			stim=self.stim_list)
+		self._flat_count = len(self.stim_list)
+		self._flat_last = self.stim_list[-1]
+		self.prepare_time = self.experiment.clock.time() - t0
+		debug.msg(u'flattened %d stimuli in %.2f ms' % (self._flat_count,
+			self.prepare_time))
+
 	def show(self):
 
-		for stim in self.stim_list:
-			stim.draw()
+		t0 = self.experiment.clock.time()
+		if self._flattened():
+			self._flat.draw()
+		else:
+			for stim in self.stim_list:
+				stim.draw()
+		self.draw_time = self.experiment.clock.time() - t0
 		self.experiment.window.flip(clearBuffer=True)
 		return self.experiment.clock.time()
 
+	def _flattened(self):
+
+		"""
+		visible: False
+
+		returns:
+			desc:	True if there is a flattened image that contains all
+					stimuli, False otherwise.
+			type:	bool
+		"""
+
+		return self._flat is not None and \
+			len(self.stim_list) == self._flat_count and \
+			self.stim_list[-1] is self._flat_last
+
 	@configurable
 	def clear(self, color=None):
 
 		self.stim_list = []
+		self._flat = None
 		if color is not None:
 			if u'color' in cfg:
 				warnings.warn(u'color is a deprecated style argument for '
@@ -212,7 +269,7 @@ class psycho(canvas.canvas, psycho_coordinates):
 
 	def image(self, fname, center=True, x=None, y=None, scale=None):
 
-		im = Image.open(fname)
+		im = self.cached_image(fname)
 
 		if scale is not None:
 			w = im.size[0] * scale
@@ -224,10 +281,27 @@ class psycho(canvas.canvas, psycho_coordinates):
 		if not center:
 			x += w/2
 			y += h/2
-		stim = visual.ImageStim(win=self.experiment.window, image=fname,
+		stim = visual.ImageStim(win=self.experiment.window, image=im,
 			pos=pos, size=(w,h))
 		self.stim_list.append(stim)
 
+	@staticmethod
+	def _decode_image(fname, scale=None):
+
+		# Images are scaled by PsychoPy, so the scale is ignored here.
+		try:
+			im = Image.open(fname)
+			im.load()
+		except IOError:
+			raise osexception(
+				u"'%s' is not a supported image format" % fname)
+		return im
+
+	@staticmethod
+	def _image_size(image):
+
+		return image.size[0] * image.size[1] * len(image.getbands())
+
 	def gabor(self, x, y, orient, freq, env=u"gaussian", size=96, stdev=12,
 		phase=0, col1=u"white", col2=u'black', bgmode=u'avg'):
 
@@ -0,0 +1,236 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from collections import OrderedDict
+
+# The default memory budget in megabytes
+DEFAULT_SIZE = 128
+
+class stimulus_cache(object):
+
+	"""
+	desc: |
+		A memory-bounded cache for generated stimuli, such as Gabor patches.
+		When the total size of the cached stimuli exceeds the memory budget,
+		the least recently used stimuli are evicted.
+
+		Stimuli are deterministic when the same arguments always give the same
+		result, in which case they can be cached. Non-deterministic stimuli,
+		such as noise patches, are regenerated on every call.
+
+		__Example__:
+
+		~~~ .python
+		cache = stimulus_cache(max_bytes=16*1024**2)
+		surface = cache.generate((u'gabor', 45, .05),
+			lambda: _gabor_numpy(45, .05, ...))
+		~~~
+	"""
+
+	def __init__(self, max_bytes=DEFAULT_SIZE*1024**2):
+
+		"""
+		desc:
+			Constructor.
+
+		keywords:
+			max_bytes:
+				desc:	The memory budget in bytes.
+				type:	int
+		"""
+
+		self.max_bytes = max_bytes
+		self._entries = OrderedDict()
+		self.nbytes = 0
+		self.reset_counters()
+
+	def reset_counters(self):
+
+		"""
+		desc:
+			Resets the hit, miss, eviction, and regeneration counters.
+		"""
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.regenerations = 0
+
+	def clear(self):
+
+		"""
+		desc:
+			Removes all stimuli from the cache. The counters are not reset.
+		"""
+
+		self._entries.clear()
+		self.nbytes = 0
+
+	def get(self, key):
+
+		"""
+		desc:
+			Gets a stimulus from the cache, and marks it as recently used.
+
+		arguments:
+			key:
+				desc:	A hashable key.
+
+		returns:
+			desc:	The cached stimulus, or `None` if the stimulus is not in the
+					cache.
+		"""
+
+		if key not in self._entries:
+			self.misses += 1
+			return None
+		self.hits += 1
+		stim, size = self._entries.pop(key)
+		self._entries[key] = stim, size
+		return stim
+
+	def add(self, key, stim, size=None):
+
+		"""
+		desc:
+			Adds a stimulus to the cache, and evicts the least recently used
+			stimuli if the memory budget is exceeded. Stimuli that are larger
+			than the memory budget are not cached.
+
+		arguments:
+			key:
+				desc:	A hashable key.
+			stim:
+				desc:	The stimulus.
+
+		keywords:
+			size:
+				desc:	The size of the stimulus in bytes, or `None` to
+						determine the size of a pygame surface.
+				type:	[int, NoneType]
+		"""
+
+		if size is None:
+			size = surface_size(stim)
+		if key in self._entries:
+			self.nbytes -= self._entries.pop(key)[1]
+		if size > self.max_bytes:
+			return
+		self._entries[key] = stim, size
+		self.nbytes += size
+		while self.nbytes > self.max_bytes:
+			_stim, _size = self._entries.popitem(last=False)[1]
+			self.nbytes -= _size
+			self.evictions += 1
+
+	def generate(self, key, fnc, deterministic=True, sizeof=None):
+
+		"""
+		desc:
+			Gets a stimulus from the cache, or generates it if it is not
+			cached.
+
+		arguments:
+			key:
+				desc:	A hashable key.
+			fnc:
+				desc:	A function that takes no arguments and returns a newly
+						generated stimulus.
+				type:	callable
+
+		keywords:
+			deterministic:
+				desc:	Indicates whether `fnc` always returns the same
+						stimulus. If not, the stimulus is generated on every
+						call and never cached.
+				type:	bool
+			sizeof:
+				desc:	A function that takes a stimulus and returns its size in
+						bytes, or `None` to determine the size of a pygame
+						surface.
+				type:	[callable, NoneType]
+
+		returns:
+			desc:	A stimulus.
+		"""
+
+		if not deterministic:
+			self.regenerations += 1
+			return fnc()
+		stim = self.get(key)
+		if stim is None:
+			stim = fnc()
+			if sizeof is None:
+				self.add(key, stim)
+			else:
+				self.add(key, stim, size=sizeof(stim))
+		return stim
+
+	def stats(self):
+
+		"""
+		desc:
+			Gives cache statistics.
+
+		returns:
+			desc:	A dict with hits, misses, evictions, regenerations, entries,
+					nbytes, and max_bytes keys.
+			type:	dict
+		"""
+
+		return {
+			u'hits' : self.hits,
+			u'misses' : self.misses,
+			u'evictions' : self.evictions,
+			u'regenerations' : self.regenerations,
+			u'entries' : len(self),
+			u'nbytes' : self.nbytes,
+			u'max_bytes' : self.max_bytes,
+			}
+
+	def __contains__(self, key):
+
+		return key in self._entries
+
+	def __len__(self):
+
+		return len(self._entries)
+
+def surface_size(surface):
+
+	"""
+	desc:
+		Determines the memory footprint of a pygame surface.
+
+	arguments:
+		surface:
+			desc:	A pygame surface.
+
+	returns:
+		desc:	The size in bytes.
+		type:	int
+	"""
+
+	return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+# A single cache for all generated stimuli
+canvas_cache = stimulus_cache()
+# A single cache for all images that have been decoded from file
+image_cache = stimulus_cache()
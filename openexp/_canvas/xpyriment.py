@@ -33,10 +33,16 @@ from openexp._coordinates.xpyriment import xpyriment as xpyriment_coordinates
 class xpyriment(canvas.canvas, xpyriment_coordinates):
 
 	"""
-	desc:
+	desc: |
 		This is a canvas backend built on top of Expyriment.
 		For function specifications and docstrings, see
 		`openexp._canvas.canvas`.
+
+		Stimuli are plotted incrementally: when stimuli have been added since
+		the canvas was last prepared, only the new stimuli are plotted onto
+		the existing surface. The surface is only rebuilt from scratch after
+		`clear()`, or when the stimulus list no longer starts with the stimuli
+		that have been plotted already.
 	"""
 
 	settings = {
@@ -54,6 +60,7 @@ class xpyriment(canvas.canvas, xpyriment_coordinates):
 		xpyriment_coordinates.__init__(self)
 		self.prepared = False
 		self.aa = 10
+		self._canvas = None
 		self.clear()
 
 	def copy(self, canvas):
@@ -64,6 +71,8 @@ class xpyriment(canvas.canvas, xpyriment_coordinates):
 		self.prepared = False
 		self.clear()
 		self.stim_list = [stim.copy() for stim in canvas.stim_list]
+		self._canvas = None
+		self.prepared = False
 		if self.auto_prepare:
 			self.prepare()
 		canvas.prepared = False
@@ -91,15 +100,41 @@ class xpyriment(canvas.canvas, xpyriment_coordinates):
 	def prepare(self):
 
 		if not self.prepared:
-			self._canvas = stimuli.Canvas(
-				self.experiment.expyriment.screen.size,
-				colour=self.background_color.backend_color)
-			for stim in self.stim_list:
-				stim.plot(self._canvas)
+			self._plot()
 			self._canvas.preload()
 			self.prepared = True
 		return self.experiment.time()
 
+	def _plot(self):
+
+		"""
+		visible: False
+
+		desc:
+			Plots all stimuli that have not been plotted yet onto the surface,
+			and creates a new surface first if necessary.
+		"""
+
+		n = self._n_plotted if self._canvas is not None else 0
+		if n > len(self.stim_list) or \
+			(n > 0 and self.stim_list[n-1] is not self._last_plotted):
+			self._canvas = None
+		if self._canvas is None:
+			self._canvas = stimuli.Canvas(
+				self.experiment.expyriment.screen.size,
+				colour=self.background_color.backend_color)
+			n = 0
+		elif n == len(self.stim_list):
+			return
+		# A preloaded surface needs to be unloaded before new stimuli can be
+		# plotted onto it.
+		elif self._canvas.is_preloaded:
+			self._canvas.unload(keep_surface=True)
+		for stim in self.stim_list[n:]:
+			stim.plot(self._canvas)
+		self._n_plotted = len(self.stim_list)
+		self._last_plotted = self.stim_list[-1] if self.stim_list else None
+
 	def show(self):
 
 		if not self.prepared: self.prepare()
@@ -117,6 +152,8 @@ class xpyriment(canvas.canvas, xpyriment_coordinates):
 					DeprecationWarning)
 			self.background_color = color
 		self.stim_list = []
+		self._canvas = None
+		self.prepared = False
 		self.prepare()
 
 	@configurable
@@ -214,40 +251,52 @@ class xpyriment(canvas.canvas, xpyriment_coordinates):
 
 	def image(self, fname, center=True, x=None, y=None, scale=None):
 
+		surface = self.cached_image(fname, scale)
 		x, y = self.to_xy(x, y)
 		if not center:
-			_fname = safe_decode(fname)
-			try:
-				surf = pygame.image.load(_fname)
-			except pygame.error:
-				raise osexception(
-					u"'%s' is not a supported image format" % fname)
-			if scale is None:
-				x += surf.get_width()/2
-				y -= surf.get_height()/2
-			else:
-				x += scale*surf.get_width()/2
-				y -= scale*surf.get_height()/2
-		stim = stimuli.Picture(fname, position=(x,y))
-		if scale is not None: stim.scale( (scale, scale) )
-		self.add_stim(stim)
+			x += surface.get_width()/2
+			y -= surface.get_height()/2
+		self.add_stim(self._surface_stim(surface, (x,y)))
 
 	def gabor(self, x, y, orient, freq, env=u"gaussian", size=96, stdev=12,
 		phase=0, col1=u"white", col2=u"black", bgmode=u"avg"):
 
 		surface = canvas._gabor(orient, freq, env, size, stdev, phase, col1,
 			col2, bgmode)
-		stim = stimuli._visual.Visual(position=self.to_xy((x,y)))
-		stim._surface = surface
-		self.add_stim(stim)
+		self.add_stim(self._surface_stim(surface, self.to_xy((x,y))))
 
 	def noise_patch(self, x, y, env=u"gaussian", size=96, stdev=12,
 		col1=u"white", col2=u"black", bgmode=u"avg"):
 
 		surface = canvas._noise_patch(env, size, stdev, col1, col2, bgmode)
-		stim = stimuli._visual.Visual(position=self.to_xy((x,y)))
-		stim._surface = surface
-		self.add_stim(stim)
+		self.add_stim(self._surface_stim(surface, self.to_xy((x,y))))
+
+	def _surface_stim(self, surface, pos):
+
+		"""
+		visible: False
+
+		desc:
+			Creates a stimulus from a pygame surface. Surfaces may be shared
+			through the stimulus cache, so the stimulus gets a copy, which it
+			can change without affecting the cache.
+
+		arguments:
+			surface:
+				desc:	A pygame surface.
+				type:	Surface
+			pos:
+				desc:	The position in Expyriment coordinates.
+				type:	tuple
+
+		returns:
+			desc:	A stimulus.
+			type:	Canvas
+		"""
+
+		stim = stimuli.Canvas(surface.get_size(), position=pos)
+		stim.set_surface(surface.copy())
+		return stim
 
 	@staticmethod
 	def init_display(experiment):
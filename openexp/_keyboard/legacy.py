@@ -18,6 +18,7 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from libopensesame.py3compat import *
+import math
 import platform
 
 import pygame
@@ -48,10 +49,17 @@ if platform.system() == "Darwin":
 class legacy(keyboard.keyboard):
 
 	"""
-	desc:
+	desc: |
 		This is a keyboard backend built on top of PyGame.
 		For function specifications and docstrings, see
 		`openexp._keyboard.keyboard`.
+
+		`get_key()` sleeps until an event arrives, rather than polling the
+		event queue, so that it doesn't keep the CPU busy. PyGame events can
+		only be processed by the main thread, so this is done with
+		`pygame.event.wait()`, instead of a separate thread. With PyGame 1,
+		which cannot wait with a timeout, the event queue is polled every
+		millisecond.
 	"""
 
 	def __init__(self, experiment, **resp_args):
@@ -87,8 +95,15 @@ class legacy(keyboard.keyboard):
 		keylist = self.keylist
 		timeout = self.timeout
 		while True:
+			if timeout is None:
+				event = wait_event()
+			else:
+				event = wait_event(start_time+timeout-time)
 			time = pygame.time.get_ticks()
-			for event in pygame.event.get():
+			# Process all events in the queue, and not only the one that ended
+			# the wait, so that a key press that is queued behind another
+			# event is not missed when the timeout has passed.
+			for event in [event] + pygame.event.get():
 				if event.type != pygame.KEYDOWN:
 					continue
 				if event.key == pygame.K_ESCAPE:
@@ -143,3 +158,39 @@ class legacy(keyboard.keyboard):
 
 		return str(pygame.key.name(key)).replace(u'[', u'').replace(u']',
 			u'')
+
+def wait_event(timeout=None):
+
+	"""
+	desc:
+		Waits for a PyGame event, without using the CPU.
+
+	keywords:
+		timeout:
+			desc:	The maximum time to wait in milliseconds, or `None` to wait
+					indefinitely. If the timeout is 0 or less, the event queue
+					is polled without waiting.
+			type:	[int, float, NoneType]
+
+	returns:
+		desc:	An event, which has the type `pygame.NOEVENT` if no event
+				arrived before the timeout.
+		type:	Event
+	"""
+
+	if timeout is None:
+		return pygame.event.wait()
+	if timeout <= 0:
+		return pygame.event.poll()
+	# PyGame interprets a timeout of 0 as no timeout, so the timeout is
+	# rounded up to whole milliseconds.
+	timeout = int(math.ceil(timeout))
+	try:
+		return pygame.event.wait(timeout)
+	except TypeError:
+		# PyGame 1 does not accept a timeout
+		pass
+	event = pygame.event.poll()
+	if event.type == pygame.NOEVENT:
+		pygame.time.wait(1)
+	return event
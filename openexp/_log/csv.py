@@ -18,6 +18,7 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from libopensesame.py3compat import *
+from libopensesame import debug
 from openexp._log.log import log
 import codecs
 import os
@@ -25,18 +26,44 @@ import os
 class csv(log):
 
 	"""
-	desc:
+	desc: |
 		For docstrings, see openexp._log.log.
+
+		Rows are kept in a buffer, and when they are written to disk depends
+		on the `log_durability` variable:
+
+		- 'every_row' (default) writes every row to disk right away.
+		- 'batched' writes rows to disk when `log_flush_rows` rows are
+		  pending, when `log_flush_interval` milliseconds have passed since
+		  the last write, at the end of each loop, and when the log is closed.
+		- 'on_close' writes rows to disk only when the log is closed.
+
+		For each write to disk, a (timestamp, duration, rows) tuple is added to
+		`flush_times`, so that you can check whether writing happened during
+		timing-critical periods.
 	"""
 
 	def __init__(self, experiment, path):
 
 		self._log = None
+		self._buffer = []
+		self.flush_times = []
+		self.durability = experiment.var.get(u'log_durability', u'every_row',
+			[u'every_row', u'batched', u'on_close'])
+		self.flush_rows = experiment.var.get(u'log_flush_rows', 100)
+		self.flush_interval = experiment.var.get(u'log_flush_interval', 5000)
 		log.__init__(self, experiment, path)
 
 	def close(self):
 
+		if self._log is None:
+			return
+		self._flush()
 		self._log.close()
+		self._log = None
+		if len(self.flush_times) > 0:
+			debug.msg(u'%d log flushes, max duration = %.2f ms' % (
+				len(self.flush_times), max(t[1] for t in self.flush_times)))
 
 	def open(self, path):
 
@@ -53,27 +80,94 @@ class csv(log):
 		# Open the logfile
 		self._log = codecs.open(self._path, u'w', u'utf-8')
 		self._header_written = False
+		self._last_flush = self.experiment.clock.time()
+
+	def flush(self):
+
+		self._flush()
+
+	def end_block(self):
+
+		if self.durability == u'batched':
+			self.flush()
 
 	def write(self, msg, newline=True):
 
-		self._log.write(safe_decode(msg))
-		if newline:
-			self._log.write(u'\n')
-		# Flush to avoid pending write operations
-		self._log.flush()
-		os.fsync(self._log)
+		self._write(msg, newline)
 
 	def write_vars(self, var_list=None):
 
 		if var_list is None:
 			var_list = self.all_vars()
+		self._write_row(var_list, self.experiment.var.snapshot(var_list,
+			default=u'NA', _eval=False))
+
+	def _flush(self):
+
+		"""
+		visible: False
+
+		desc:
+			Writes the buffered rows to disk.
+		"""
+
+		if len(self._buffer) == 0:
+			return
+		t0 = self.experiment.clock.time()
+		self._log.write(u''.join(self._buffer))
+		# Flush to avoid pending write operations
+		self._log.flush()
+		os.fsync(self._log)
+		self._last_flush = self.experiment.clock.time()
+		self.flush_times.append( (t0, self._last_flush-t0, len(self._buffer)) )
+		self._buffer = []
+
+	def _write(self, msg, newline=True):
+
+		"""
+		visible: False
+
+		desc:
+			Adds a message to the buffer, and writes the buffer to disk if this
+			is required by the durability setting.
+		"""
+
+		msg = safe_decode(msg)
+		if newline:
+			msg += u'\n'
+		self._buffer.append(msg)
+		if self.durability == u'every_row':
+			self._flush()
+		elif self.durability == u'batched' and (
+			len(self._buffer) >= self.flush_rows or
+			self.experiment.clock.time() - self._last_flush \
+			>= self.flush_interval):
+			self._flush()
+
+	def _write_row(self, var_list, values):
+
+		"""
+		visible: False
+
+		desc:
+			Formats a row of values, preceded by a header if none has been
+			written yet, and writes it.
+
+		arguments:
+			var_list:
+				desc:	A list of variable names.
+				type:	list
+			values:
+				desc:	A list of values in the same order as `var_list`.
+				type:	list
+		"""
+
 		if not self._header_written:
 			l = [u'"%s"' % var.replace(u'"', u'\\"') for var in var_list]
-			self.write(u','.join(l))
+			self._write(u','.join(l))
 			self._header_written = True
 		l = []
-		for var in var_list:
-			val = self.experiment.var.get(var, _eval=False, default=u'NA')
+		for val in values:
 			val = safe_decode(val)
 			l.append(u'"%s"' % val.replace(u'"', u'\\"'))
-		self.write(u','.join(l))
+		self._write(u','.join(l))
@@ -0,0 +1,166 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libopensesame.py3compat import *
+from libopensesame import debug
+from libopensesame.exceptions import osexception
+from openexp._log.csv import csv
+import threading
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+class csv_async(csv):
+
+	"""
+	desc: |
+		A csv log that does not block the experiment while writing. Values are
+		retrieved on the experiment thread, and then passed through a bounded
+		queue to a writer thread, which formats and writes them to disk. The
+		output and the durability settings are the same as for the csv log.
+
+		The maximum number of pending messages is set with the
+		`log_queue_size` variable. When the queue is full, the experiment
+		waits until there is room again, and a (timestamp, duration) tuple is
+		added to `backpressure`.
+
+		Select this log by setting the `log_backend` variable to 'csv_async'.
+	"""
+
+	def __init__(self, experiment, path):
+
+		self._queue = None
+		self._thread = None
+		self._error = None
+		self.backpressure = []
+		self.queue_size = experiment.var.get(u'log_queue_size', 1000)
+		csv.__init__(self, experiment, path)
+		# Make sure that the queue is drained, even if the experiment is not
+		# ended properly.
+		experiment.cleanup_functions.append(self.close)
+
+	def open(self, path):
+
+		csv.open(self, path)
+		self._queue = queue.Queue(maxsize=self.queue_size)
+		self._thread = threading.Thread(target=self._writer)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def close(self):
+
+		if self._thread is not None:
+			# The sentinel is put in the queue directly, rather than through
+			# _put(), so that the thread is stopped and the file is closed
+			# even if the thread has failed. The error is raised afterwards.
+			self._queue.put(None)
+			self._thread.join()
+			self._thread = None
+			if len(self.backpressure) > 0:
+				debug.msg(u'log queue was full %d times, max wait = %.2f ms' % (
+					len(self.backpressure),
+					max(t[1] for t in self.backpressure)))
+		csv.close(self)
+		self._check_error()
+
+	def flush(self):
+
+		if self._thread is None:
+			csv.flush(self)
+		else:
+			self._put((self._flush, ))
+
+	def write(self, msg, newline=True):
+
+		self._put((self._write, msg, newline))
+
+	def write_vars(self, var_list=None):
+
+		if var_list is None:
+			var_list = self.all_vars()
+		values = self.experiment.var.snapshot(var_list, default=u'NA',
+			_eval=False)
+		# Mutable values may change before they are written, so they are
+		# converted to strings right away.
+		for i, val in enumerate(values):
+			if not isinstance(val, (basestring, int, float)):
+				values[i] = safe_decode(val)
+		self._put((self._write_row, var_list, values))
+
+	def _put(self, msg):
+
+		"""
+		visible: False
+
+		desc:
+			Puts a message in the queue, and records how long the experiment
+			was blocked if the queue was full.
+
+		arguments:
+			msg:
+				desc:	A (function, arg1, arg2, ...) tuple, or `None` to stop
+						the writer thread.
+		"""
+
+		self._check_error()
+		try:
+			self._queue.put_nowait(msg)
+		except queue.Full:
+			t0 = self.experiment.clock.time()
+			self._queue.put(msg)
+			self.backpressure.append(
+				(t0, self.experiment.clock.time()-t0))
+
+	def _check_error(self):
+
+		"""
+		visible: False
+
+		desc:
+			Raises an exception if the writer thread failed.
+		"""
+
+		if self._error is None:
+			return
+		e = self._error
+		self._error = None
+		raise osexception(u'Failed to write to log', exception=e)
+
+	def _writer(self):
+
+		"""
+		visible: False
+
+		desc:
+			The main loop of the writer thread.
+		"""
+
+		while True:
+			msg = self._queue.get()
+			if msg is None:
+				break
+			# After an error, messages are still taken from the queue, so that
+			# the experiment doesn't block.
+			if self._error is not None:
+				continue
+			try:
+				msg[0](*msg[1:])
+			except Exception as e:
+				self._error = e
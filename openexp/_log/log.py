@@ -81,6 +81,33 @@ class log(object):
 
 		pass
 
+	def flush(self):
+
+		"""
+		desc:
+			Writes all pending log data to disk. Log back-ends that buffer
+			data write it at the latest when the log is closed, so you do not
+			generally need to call this function yourself.
+
+		example: |
+			log.flush()
+		"""
+
+		pass
+
+	def end_block(self):
+
+		"""
+		visible: False
+
+		desc:
+			Indicates that a block of trials (i.e. a loop) has finished. Log
+			back-ends that buffer data can use this as an opportunity to write
+			data to disk outside of timing-critical periods.
+		"""
+
+		pass
+
 	def all_vars(self):
 
 		"""
@@ -0,0 +1,446 @@
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+
+This module can also be used to convert existing csv logfiles to Parquet:
+
+	python -m openexp._log.parquet subject-1.csv [subject-2.csv ...]
+"""
+
+from __future__ import absolute_import
+from libopensesame.py3compat import *
+from libopensesame import debug
+from libopensesame.exceptions import osexception
+from libopensesame.syntax import syntax
+from openexp._log.log import log
+import os
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	raise osexception(
+		u'Failed to import pyarrow, which is required for the parquet log. You can install it with: pip install pyarrow')
+
+class parquet(log):
+
+	"""
+	desc: |
+		A log that writes typed, columnar data to an Apache Parquet file,
+		which is much faster to load than csv. For docstrings, see
+		openexp._log.log.
+
+		The columns are the variables that are passed to the first call to
+		`write_vars()`. Other variables are not logged. Each column is typed
+		as int, float, or string, based on the values in the first block
+		(i.e. loop) of rows; columns that contain only missing values are not
+		typed yet. Each subsequent block is appended to the file as a row
+		group. When a value doesn't fit its column's type, the column is
+		widened (from int to float to string), and the row groups that were
+		already written are rewritten with the new types, so that no values
+		are lost.
+
+		Rows are kept in memory until the end of a block, or until
+		`log_flush_rows` rows (default: 1000) are pending, or until
+		`log_flush_interval` milliseconds (default: 5000) have passed since
+		the last row group was written, whichever comes first. However, a
+		Parquet file is only readable after it has been closed, because the
+		file ends with a description of all row groups. When the experiment
+		crashes or is killed before the log is closed, the file cannot be
+		recovered. Use the csv log if this is a concern.
+
+		Select this log by setting the `log_backend` variable to 'parquet'.
+		A `.csv` extension of the logfile is changed to `.parquet`.
+	"""
+
+	def __init__(self, experiment, path):
+
+		self._writer = None
+		self._columns = None
+		self._rows = []
+		self.flush_rows = experiment.var.get(u'log_flush_rows', 1000)
+		self.flush_interval = experiment.var.get(u'log_flush_interval', 5000)
+		log.__init__(self, experiment, path)
+
+	def close(self):
+
+		self.flush()
+		if self._writer is not None:
+			self._writer.close()
+			self._writer = None
+
+	def open(self, path):
+
+		self.close()
+		# If only a filename is present, we interpret this filename as relative
+		# to the experiment folder, instead of relative to the current working
+		# directory.
+		if os.path.basename(path) == path and \
+			self.experiment.experiment_path is not None:
+			path = os.path.join(self.experiment.experiment_path, path)
+		if path.lower().endswith(u'.csv'):
+			path = path[:-4] + u'.parquet'
+		self._path = path
+		self._columns = None
+		self._rows = []
+		self._last_flush = self.experiment.clock.time()
+
+	def flush(self):
+
+		if len(self._rows) == 0:
+			return
+		if self._writer is None:
+			self._writer = table_writer(self._path, self._columns, self._rows)
+		self._writer.append(self._rows)
+		self._rows = []
+		self._last_flush = self.experiment.clock.time()
+
+	def end_block(self):
+
+		self.flush()
+
+	def write(self, msg, newline=True):
+
+		raise osexception(
+			u'The parquet log does not support text messages. Use write_vars() instead.')
+
+	def write_vars(self, var_list=None):
+
+		if var_list is None:
+			var_list = self.all_vars()
+		if self._columns is None:
+			self._columns = list(var_list)
+			self._index = dict((var, i) for i, var in enumerate(var_list))
+		row = [None] * len(self._columns)
+		var_list = [var for var in var_list if var in self._index]
+		for var, val in zip(var_list, self.experiment.var.snapshot(var_list,
+			default=u'NA', _eval=False)):
+			row[self._index[var]] = val
+		self._rows.append(row)
+		if len(self._rows) >= self.flush_rows or \
+			self.experiment.clock.time() - self._last_flush \
+			>= self.flush_interval:
+			self.flush()
+
+class table_writer(object):
+
+	"""
+	desc:
+		Writes rows of values to a Parquet file. The column types are inferred
+		from the first rows that are appended, and widened when later rows
+		don't fit.
+	"""
+
+	def __init__(self, path, columns, rows):
+
+		"""
+		desc:
+			Constructor.
+
+		arguments:
+			path:
+				desc:	The path of the Parquet file.
+				type:	[str, unicode]
+			columns:
+				desc:	A list of column names.
+				type:	list
+			rows:
+				desc:	A list of rows, which are used to infer the column
+						types. They are not written.
+				type:	list
+		"""
+
+		self._syntax = syntax(None)
+		self.path = path
+		# The file that is being written, which is a temporary file after the
+		# columns have been widened.
+		self._file = path
+		self.schema = self._make_schema(columns,
+			[self._infer_type([row[i] for row in rows])
+			for i in range(len(columns))])
+		self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+	def append(self, rows):
+
+		"""
+		desc:
+			Writes rows to the file as a single row group. If the rows don't fit
+		the column types, the columns are widened first.
+
+		arguments:
+			rows:
+				desc:	A list of rows, where each row is a list of values in
+						the same order as the columns.
+				type:	list
+		"""
+
+		types = [self._widen(field.type,
+			self._infer_type([row[i] for row in rows]))
+			for i, field in enumerate(self.schema)]
+		if types != [field.type for field in self.schema]:
+			self._rewrite(types)
+		arrays = []
+		for i, field in enumerate(self.schema):
+			arrays.append(pyarrow.array([self._cast(row[i], field.type)
+				for row in rows], type=field.type))
+		self._writer.write_table(pyarrow.Table.from_arrays(arrays,
+			schema=self.schema))
+
+	def close(self):
+
+		"""
+		desc:
+			Closes the file.
+		"""
+
+		self._writer.close()
+		if self._file != self.path:
+			if os.path.exists(self.path):
+				os.remove(self.path)
+			os.rename(self._file, self.path)
+			self._file = self.path
+
+	def _infer_type(self, values):
+
+		"""
+		desc:
+			Determines the best-fitting type for a list of values.
+
+		arguments:
+			values:
+				desc:	A list of values.
+				type:	list
+
+		returns:
+			desc:	null if all values are missing, int64 if all values are
+					int, float64 if all values are numeric, and string
+					otherwise.
+			type:	DataType
+		"""
+
+		_type = pyarrow.null()
+		for val in values:
+			if self._is_na(val):
+				continue
+			val = self._auto_type(val)
+			if isinstance(val, float):
+				_type = pyarrow.float64()
+			elif not isinstance(val, int):
+				return pyarrow.string()
+			elif _type == pyarrow.null():
+				_type = pyarrow.int64()
+		return _type
+
+	def _widen(self, type1, type2):
+
+		"""
+		desc:
+			Determines the narrowest type that fits the values of two types.
+
+		arguments:
+			type1:
+				desc:	A column type.
+				type:	DataType
+			type2:
+				desc:	A column type.
+				type:	DataType
+
+		returns:
+			desc:	The widest of both types, in the order null, int64,
+					float64, string.
+			type:	DataType
+		"""
+
+		order = [pyarrow.null(), pyarrow.int64(), pyarrow.float64(),
+			pyarrow.string()]
+		return order[max(order.index(type1), order.index(type2))]
+
+	def _make_schema(self, columns, types):
+
+		"""
+		arguments:
+			columns:
+				desc:	A list of column names.
+				type:	list
+			types:
+				desc:	A list of column types.
+				type:	list
+
+		returns:
+			desc:	A schema.
+			type:	Schema
+		"""
+
+		return pyarrow.schema([pyarrow.field(column, _type)
+			for column, _type in zip(columns, types)])
+
+	def _rewrite(self, types):
+
+		"""
+		desc:
+			Changes the column types, and rewrites the row groups that have
+			already been written with the new types. A Parquet file cannot be
+			appended to, so the row groups are copied to a new file, which is
+			then kept open for writing. The file is moved to its final path
+			when it is closed.
+
+		arguments:
+			types:
+				desc:	A list of column types.
+				type:	list
+		"""
+
+		debug.msg(u'widening columns of %s' % self.path)
+		self._writer.close()
+		src_file = self._file
+		self._file = self.path + u'.tmp' if src_file == self.path \
+			else self.path
+		self.schema = self._make_schema(self.schema.names, types)
+		self._writer = pyarrow.parquet.ParquetWriter(self._file, self.schema)
+		with open(src_file, u'rb') as fd:
+			src = pyarrow.parquet.ParquetFile(fd)
+			for i in range(src.num_row_groups):
+				self._writer.write_table(
+					src.read_row_group(i).cast(self.schema))
+		os.remove(src_file)
+
+	def _cast(self, val, _type):
+
+		"""
+		desc:
+			Casts a value to a column type.
+
+		arguments:
+			val:
+				desc:	A value.
+			_type:
+				desc:	A column type.
+				type:	DataType
+
+		returns:
+			desc:	The value, or `None` for missing values.
+		"""
+
+		if self._is_na(val):
+			return None
+		if _type == pyarrow.string():
+			return safe_decode(val)
+		return self._auto_type(val)
+
+	def _auto_type(self, val):
+
+		"""
+		desc:
+			Casts a value to float, int, or unicode, like `syntax.auto_type()`,
+			but also accepts NaN and infinite values.
+
+		arguments:
+			val:	A value.
+
+		returns:
+			An auto-typed value.
+		"""
+
+		try:
+			return self._syntax.auto_type(val)
+		except (ValueError, OverflowError):
+			return float(val)
+
+	@staticmethod
+	def _is_na(val):
+
+		"""
+		desc:
+			Checks whether a value should be stored as missing.
+
+		arguments:
+			val:	A value.
+
+		returns:
+			desc:	True for `None` and 'NA', False otherwise.
+			type:	bool
+		"""
+
+		return val is None or (isinstance(val, basestring) and val == u'NA')
+
+def convert(src, dst=None, row_group_size=10000):
+
+	"""
+	desc:
+		Converts a logfile that was written by the csv log to a Parquet file.
+
+	arguments:
+		src:
+			desc:	The path to a csv logfile.
+			type:	[str, unicode]
+
+	keywords:
+		dst:
+			desc:	The path to the Parquet file, or `None` to use the csv path
+					with a `.parquet` extension.
+			type:	[str, unicode, NoneType]
+		row_group_size:
+			desc:	The number of rows per row group. The column types are
+					inferred from the first row group.
+			type:	int
+
+	returns:
+		desc:	The path to the Parquet file.
+		type:	unicode
+	"""
+
+	import csv
+	import io
+	import re
+	if dst is None:
+		dst = os.path.splitext(src)[0] + u'.parquet'
+	writer = None
+	# The csv log escapes quotes with a backslash, but doesn't escape
+	# backslashes themselves. Therefore, backslashes that don't precede a quote
+	# are escaped before the lines are parsed, so that they are preserved.
+	escape = re.compile(r'\\(?!")')
+	with io.open(src, encoding=u'utf-8', newline=u'') as fd:
+		reader = csv.reader((escape.sub(r'\\\\', line) for line in fd),
+			escapechar=u'\\', doublequote=False)
+		columns = next(reader)
+		rows = []
+		for row in reader:
+			if len(row) != len(columns):
+				debug.msg(u'skipping malformed row in %s' % src,
+					reason=u'warning')
+				continue
+			rows.append(row)
+			if len(rows) < row_group_size:
+				continue
+			if writer is None:
+				writer = table_writer(dst, columns, rows)
+			writer.append(rows)
+			rows = []
+	if writer is None:
+		writer = table_writer(dst, columns, rows)
+	if len(rows) > 0:
+		writer.append(rows)
+	writer.close()
+	return dst
+
+if __name__ == u'__main__':
+
+	import sys
+	if len(sys.argv) < 2:
+		print(u'Usage: python -m openexp._log.parquet [logfile.csv ...]')
+		sys.exit(1)
+	for src in sys.argv[1:]:
+		print(u'%s -> %s' % (src, convert(safe_decode(src))))
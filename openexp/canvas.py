@@ -19,6 +19,7 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 
 from libopensesame.py3compat import *
 from openexp import backend
+from libopensesame import debug
 import tempfile
 try:
 	import pygame
@@ -28,6 +29,8 @@ import os
 
  # A list of temporary files that should be cleaned up.
 temp_files = []
+# Canvas classes that record frame timing, with backend classes as keys.
+timed_classes = {}
 
 def canvas(experiment, *arglist, **kwdict):
 
@@ -48,6 +51,13 @@ def canvas(experiment, *arglist, **kwdict):
 	"""
 
 	cls = backend.get_backend_class(experiment, u'canvas')
+	# When frame timing is enabled, the canvas records the timing of prepare()
+	# and show(). See openexp._canvas.frame_timing.
+	if getattr(experiment, u'frame_timing', None) is not None:
+		if cls not in timed_classes:
+			from openexp._canvas.frame_timing import timed_class
+			timed_classes[cls] = timed_class(cls)
+		cls = timed_classes[cls]
 	return cls(experiment, *arglist, **kwdict)
 
 def init_display(experiment):
@@ -63,6 +73,13 @@ def init_display(experiment):
 
 	cls = backend.get_backend_class(experiment, u'canvas')
 	cls.init_display(experiment)
+	if experiment.var.get(u'canvas_timing', u'no', [u'yes', u'no']) == u'yes':
+		from openexp._canvas.frame_timing import frame_timing
+		experiment.frame_timing = frame_timing(
+			refresh_rate=experiment.var.get(u'canvas_timing_refresh_rate', 60),
+			size=experiment.var.get(u'canvas_timing_size', 10000))
+	else:
+		experiment.frame_timing = None
 
 def close_display(experiment):
 
@@ -77,6 +94,40 @@ def close_display(experiment):
 
 	cls = backend.get_backend_class(experiment, u'canvas')
 	cls.close_display(experiment)
+	timing = getattr(experiment, u'frame_timing', None)
+	if timing is None:
+		return
+	experiment.frame_timing = None
+	path = experiment.logfile_sibling(u'-timing.txt')
+	try:
+		timing.write(experiment.logfile_sibling(u'-timing.csv'), path)
+	except Exception as e:
+		debug.msg(u'failed to write frame timing: %s' % e, reason=u'warning')
+	else:
+		debug.msg(u'frame timing written to %s' % path)
+
+def preload_images(experiment, paths):
+
+	"""
+	desc:
+		Calls the back-end specific preload_images function, which decodes
+		images into the image cache before they are used.
+
+	arguments:
+		experiment:
+			desc:	The experiment object.
+			type:	experiment
+		paths:
+			desc:	A list of paths. Files that are not images are skipped.
+			type:	list
+
+	returns:
+		desc:	The number of preloaded images.
+		type:	int
+	"""
+
+	cls = backend.get_backend_class(experiment, u'canvas')
+	return cls.preload_images(paths)
 
 def clean_up(verbose=False):
 
@@ -19,9 +19,10 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 
 import unittest
 from opensesame_unittest import backends, compilable, color, syntax, response, \
-	headless
+	headless, parquet_log, loop_matrix, design_file
 
-for mod in (backends, compilable, color, syntax, response, headless):
+for mod in (backends, compilable, color, syntax, response, headless,
+	parquet_log, loop_matrix, design_file):
 	res = unittest.main(mod, exit=False)
 	if len(res.result.errors) > 0 or len(res.result.failures) > 0:
 		exit(1)
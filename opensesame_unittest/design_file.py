@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from libopensesame.design_file import design_file
+from libopensesame.exceptions import osexception
+
+class check_design_file(unittest.TestCase):
+
+	"""
+	desc:
+		Checks whether cycles are correctly read from CSV and TSV design
+		files.
+	"""
+
+	def setUp(self):
+
+		self.folder = tempfile.mkdtemp()
+
+	def tearDown(self):
+
+		shutil.rmtree(self.folder)
+
+	def checkFile(self, fname, data, columns, rows):
+
+		print(u'Checking %s' % fname)
+		path = os.path.join(self.folder, fname)
+		with open(path, u'wb') as fd:
+			fd.write(data)
+		df = design_file(path)
+		try:
+			self.assertEqual(df.columns, columns)
+			self.assertEqual(len(df), len(rows))
+			# Read the rows in reverse order, to check that they can be read
+			# in any order.
+			for i in reversed(range(len(rows))):
+				self.assertEqual(df.row(i), rows[i])
+		finally:
+			df.close()
+
+	def runTest(self):
+
+		"""
+		desc:
+			Walks through the test.
+		"""
+
+		self.checkFile(u'quotes.csv',
+			b'\xef\xbb\xbfitem,text\r\n'
+			b'1,"two\r\nlines"\r\n'
+			b'2,5" screen\r\n'
+			b'3,"a ""quoted"" word"\r\n'
+			b'\r\n'
+			b'4,"=1+1"\r\n'
+			b'5,\xc3\xa9\r\n',
+			[u'item', u'text'],
+			[
+				{u'item' : 1, u'text' : u'two\r\nlines'},
+				{u'item' : 2, u'text' : u'5" screen'},
+				{u'item' : 3, u'text' : u'a "quoted" word'},
+				{u'item' : 4, u'text' : u'=1+1'},
+				{u'item' : 5, u'text' : u'\xe9'},
+			])
+		# Short rows leave variables undefined, and blank lines are skipped
+		self.checkFile(u'design.tsv',
+			b'word\tfrequency\tresponse\n'
+			b'\n'
+			b'cat\t120\tz\n'
+			b'dog, "big"\t98\n'
+			b'\n',
+			[u'word', u'frequency', u'response'],
+			[
+				{u'word' : u'cat', u'frequency' : 120, u'response' : u'z'},
+				{u'word' : u'dog, "big"', u'frequency' : 98},
+			])
+		self.checkFile(u'header_only.csv', b'a,b', [u'a', u'b'], [])
+		# A carriage return inside an unquoted cell cannot be parsed
+		path = os.path.join(self.folder, u'invalid.csv')
+		with open(path, u'wb') as fd:
+			fd.write(b'a,b\n1,2\n3,x\ry\n')
+		df = design_file(path)
+		with self.assertRaises(osexception):
+			len(df)
+		df.close()
+
+if __name__ == '__main__':
+	unittest.main()
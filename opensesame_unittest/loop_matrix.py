@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array
+import unittest
+from libopensesame.experiment import experiment
+from libopensesame.loop import MAX_SETCYCLE_CELLS
+from libopensesame.loop_matrix import loop_matrix
+
+# A loop definition with setcycle lines, as written by older versions
+SETCYCLE_SCRIPT = u'''
+define loop trial_loop
+	set repeat 1
+	set order sequential
+	set item trial
+	set cycles 3
+	setcycle 0 word "cat"
+	setcycle 0 frequency 120
+	setcycle 1 word "two words"
+	setcycle 1 frequency 98
+	setcycle 2 word "=1+1"
+	run trial
+
+define sequence trial
+'''
+
+class check_loop_matrix(unittest.TestCase):
+
+	"""
+	desc:
+		Checks whether the loop matrix is correctly read from and written to
+		scripts.
+	"""
+
+	def checkRoundTrip(self):
+
+		matrix = loop_matrix()
+		values = [
+			(u'text', [u'tab\there', u'new\nline', u'back\\slash', u'',
+				u'""', u'\\N', u'__end__', u'  __end__ ', u'\\__end__']),
+			(u'number', [1, -2, 3, 4, 5, 6, 7, 8, 9]),
+			(u'expression', [u'=1+1', u'=', u'a', None, u'=var.x', None,
+				u'b', u'c', u'd']),
+			]
+		for column, cells in values:
+			for row, val in enumerate(cells):
+				if val is not None:
+					matrix.set(row, column, val)
+		lines = matrix.to_block()
+		print(u'\n'.join(lines))
+		matrix2 = loop_matrix()
+		matrix2.parse_block(lines[1:-1])
+		self.assertEqual(matrix2.columns, matrix.columns)
+		self.assertEqual(len(matrix2), len(values[0][1]))
+		for column, cells in values:
+			self.assertEqual(matrix2.column(column), cells)
+		# Columns of ints are stored compactly, and ints are typed when a
+		# block is parsed.
+		self.assertTrue(isinstance(matrix2._data[u'number'], array.array))
+		# Missing cells are undefined, whereas empty strings are defined.
+		self.assertEqual(matrix2.row(3), {u'text' : u'', u'number' : 4})
+		self.assertEqual(
+			[expression for column, val, expression in matrix2.cells(0)],
+			[False, False, True])
+		self.assertEqual(
+			[expression for column, val, expression in matrix2.cells(1)],
+			[False, False, False])
+		self.assertEqual(eval(matrix2.compiled(u'=1+1')), 2)
+
+	def checkScript(self):
+
+		exp = experiment(string=SETCYCLE_SCRIPT)
+		matrix = exp.items[u'trial_loop'].matrix
+		self.assertEqual(matrix.columns, [u'word', u'frequency'])
+		self.assertEqual(matrix.row(0), {u'word' : u'cat',
+			u'frequency' : 120})
+		self.assertEqual(matrix.row(1), {u'word' : u'two words',
+			u'frequency' : 98})
+		self.assertEqual(matrix.row(2), {u'word' : u'=1+1'})
+		# Small tables are saved as setcycle lines, so that older versions can
+		# read them.
+		matrix.set(0, u'frequency', u'a "quoted" \\ word')
+		script = exp.to_string()
+		self.assertTrue(u'setcycle' in script)
+		self.assertFalse(u'__matrix__' in script)
+		matrix2 = experiment(string=script).items[u'trial_loop'].matrix
+		self.assertEqual(matrix2.row(0), matrix.row(0))
+		# Tables with line breaks are saved as a block. A cell that contains
+		# __end__ must not end the block when the script is read back, also
+		# when it is the only column.
+		matrix.remove_column(u'frequency')
+		matrix.set(1, u'word', u'__end__')
+		matrix.set(2, u'word', u'two\nlines')
+		script = exp.to_string()
+		self.assertTrue(u'__matrix__' in script)
+		exp2 = experiment(string=script)
+		matrix2 = exp2.items[u'trial_loop'].matrix
+		self.assertEqual(matrix2.column(u'word'),
+			[u'cat', u'__end__', u'two\nlines'])
+		self.assertEqual(exp2.items[u'trial_loop'].var.item, u'trial')
+		# Large tables are saved as a block too
+		matrix.set_column(u'word', [u'w%d' % i \
+			for i in range(MAX_SETCYCLE_CELLS + 1)])
+		script = exp.to_string()
+		self.assertTrue(u'__matrix__' in script)
+		self.assertFalse(u'setcycle' in script)
+		matrix2 = experiment(string=script).items[u'trial_loop'].matrix
+		self.assertEqual(len(matrix2), MAX_SETCYCLE_CELLS + 1)
+
+	def runTest(self):
+
+		"""
+		desc:
+			Walks through the test.
+		"""
+
+		self.checkRoundTrip()
+		self.checkScript()
+
+if __name__ == '__main__':
+	unittest.main()
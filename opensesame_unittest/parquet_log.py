@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of OpenSesame.
+
+OpenSesame is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+try:
+	import pyarrow.parquet
+	from openexp._log.parquet import table_writer, convert
+except ImportError:
+	pyarrow = None
+
+@unittest.skipIf(pyarrow is None, u'pyarrow is not installed')
+class check_parquet_log(unittest.TestCase):
+
+	"""
+	desc:
+		Checks whether the parquet log keeps all values, also when a column
+		needs to be widened after the first block, and whether csv logfiles
+		are converted correctly.
+	"""
+
+	def setUp(self):
+
+		self.folder = tempfile.mkdtemp()
+
+	def tearDown(self):
+
+		shutil.rmtree(self.folder)
+
+	def checkWiden(self):
+
+		path = os.path.join(self.folder, u'widen.parquet')
+		columns = [u'response', u'rt', u'count']
+		blocks = [
+			[[u'NA', 500, 1], [None, 510, 2]],
+			[[u'space', 520.5, 3], [u'NA', u'NA', 4]],
+			[[1, 530, u'many']]
+			]
+		writer = table_writer(path, columns, blocks[0])
+		for rows in blocks:
+			writer.append(rows)
+		writer.close()
+		table = pyarrow.parquet.read_table(path)
+		print(table.schema)
+		self.assertEqual(table.num_rows, 5)
+		self.assertEqual(table.column(u'response').to_pylist(),
+			[None, None, u'space', None, u'1'])
+		self.assertEqual(table.column(u'rt').to_pylist(),
+			[500, 510, 520.5, None, 530])
+		self.assertEqual(table.column(u'count').to_pylist(),
+			[u'1', u'2', u'3', u'4', u'many'])
+		self.assertEqual(os.listdir(self.folder), [u'widen.parquet'])
+
+	def checkConvert(self):
+
+		src = os.path.join(self.folder, u'log.csv')
+		with io.open(src, u'w', encoding=u'utf-8') as fd:
+			fd.write(u'"path","text"\n')
+			fd.write(u'"c:\\data\\img.png","say \\"hi\\""\n')
+			fd.write(u'"\\n","a\\\\""\n')
+		table = pyarrow.parquet.read_table(convert(src))
+		self.assertEqual(table.column(u'path').to_pylist(),
+			[u'c:\\data\\img.png', u'\\n'])
+		self.assertEqual(table.column(u'text').to_pylist(),
+			[u'say "hi"', u'a\\"'])
+
+	def runTest(self):
+
+		"""
+		desc:
+			Walks through the test.
+		"""
+
+		self.checkWiden()
+		self.checkConvert()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -85,6 +85,8 @@ class check_syntax(unittest.TestCase):
 		self.checkEvalText(u'\[=10*10]', u'[=10*10]')
 		self.checkEvalText(u'[=u"tést"]', u'tést')
 		self.checkEvalText(u'[="\[test\]"]', u'[test]')
+		self.checkEvalText(u'[=[width]*2] [=[width]+[height]]', u'2048 1792')
+		self.checkEvalText(u'[=len("[width]")]', u'4')
 		self.checkCnd(u'[width] > 100', u'var.width > 100')
 		self.checkCnd(u'always', u'True')
 		self.checkCnd(u'ALWAYS', u'True')
@@ -99,6 +101,11 @@ class check_syntax(unittest.TestCase):
 		self.checkCnd(u'"y\'es" = \'y"es\'', u'"y\'es" == \'y"es\'')
 		self.checkCnd(u'("a b c" = abc) or (x != 10) and ([width] == 100)',
 			u'("a b c" == "abc") or ("x" != 10) and (var.width == 100)')
+		self.checkCnd(u'[response] = left and not [correct] = 0 or x1',
+			u'var.response == "left" and not var.correct == 0 or "x1"')
+		# Compiled statements are cached
+		self.assertTrue(self.exp.syntax.compile_cond(u'[width] > 100') is
+			self.exp.syntax.compile_cond(u'[width] > 100'))
 
 if __name__ == '__main__':
 	unittest.main()
@@ -20,6 +20,7 @@ along with OpenSesame.  If not, see <http://www.gnu.org/licenses/>.
 from libopensesame.py3compat import *
 from libopensesame.exceptions import osexception
 from libopensesame import debug
+from libopensesame.response_buffer import response_buffer
 import serial
 import os
 
@@ -42,6 +43,13 @@ class libsrbox:
 		You need to call [srbox.start] to put the SR Box in sending mode,
 		before calling [srbox.get_button_press] to collect a button press.
 
+		__Note:__
+
+		While the SR Box is in sending mode, its output is read by a
+		separate thread, which timestamps each byte when it arrives. This
+		way, [srbox.get_button_press] can wait for a button press without
+		using the CPU.
+
 		__Function list:__
 
 		%--
@@ -99,6 +107,7 @@ class libsrbox:
 		self.experiment = experiment
 		self._srbox = None
 		self._started = False
+		self._buffer = None
 
 		# If a device has been specified, use it
 		if dev not in (None, "", "autodetect"):
@@ -177,6 +186,10 @@ class libsrbox:
 		self._srbox.flushOutput()
 		self._srbox.flushInput()
 		self._srbox.write('\xA0')
+		# The reader thread blocks for at most 50 ms, so that it can be stopped
+		self._srbox.timeout = .05
+		self._buffer = response_buffer(self._read, self.experiment.clock)
+		self._buffer.start()
 		self._started = True
 
 	def stop(self):
@@ -188,6 +201,9 @@ class libsrbox:
 
 		if not self._started:
 			return
+		self._buffer.stop()
+		self._buffer = None
+		self._srbox.timeout = 0
 		# Write the stop byte and flush the input
 		self._srbox.flushOutput()
 		self._srbox.flushInput()
@@ -232,15 +248,27 @@ class libsrbox:
 				bytemasks.append((buttonnr+1, bytemask))
 		inputbyte0 = None
 		while True:
-			# Get a valid character and convert it to a byte
-			inputchar = self._srbox.read(1)
-			if inputchar == '':
-				continue
+			# Get a character and the time at which it arrived, and convert it
+			# to a byte
+			if timeout is None:
+				sample = self._buffer.get()
+			else:
+				sample = self._buffer.get(
+					timeout=t0+timeout-self.experiment.time())
+			if sample is None:
+				t1 = self.experiment.time()
+				break
+			inputchar, t1 = sample
 			inputbyte1 = ord(inputchar)
 			# Check for a timeout
-			t1 = self.experiment.time()
 			if timeout is not None and t1 - t0 > timeout:
 				break
+			# Characters that arrived before the call only serve as the old
+			# state, so that a button that was already pressed doesn't count
+			# as a state change.
+			if t1 < t0:
+				inputbyte0 = inputbyte1
+				continue
 			# To check for state changes, we need an old and a new state.
 			# Therefore, on the first loop we don't do anything.
 			if require_state_change and inputbyte0 is None:
@@ -270,6 +298,25 @@ class libsrbox:
 			inputbyte0 = inputbyte1
 		return None, t1
 
+	def _read(self):
+
+		"""
+		visible: False
+
+		desc:
+			Reads a single character from the SR Box.
+
+		returns:
+			desc:	A character, or `None` if no character arrived before the
+					serial timeout.
+			type:	[str, NoneType]
+		"""
+
+		inputchar = self._srbox.read(1)
+		if not inputchar:
+			return None
+		return inputchar
+
 	def close(self):
 
 		"""
@@ -278,5 +325,5 @@ class libsrbox:
 			the `srbox` plugin when the experiment finishes.
 		"""
 
+		self.stop()
 		self._srbox.close()
-		self._started = False